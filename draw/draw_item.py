@@ -1,4 +1,4 @@
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Union
 from pathlib import Path
 import numpy as np
 import sys
@@ -6,10 +6,10 @@ import cv2
 
 FILE = Path(__file__).resolve()
 ROOT = FILE.parents[1]  
-OUTPUT_PATH_DEFAULT = ROOT / 'fengshui' / 'output'
 sys.path.insert(0, str(ROOT))   # for import moduls 
 
 from fengshui.item import Item
+from draw.output_sink import OUTPUT_PATH_DEFAULT, OutputSink, DirectorySink, EncodedImage
 
 
 def draw_bounding_boxes(image_path: Optional[Path] = None, 
@@ -70,38 +70,107 @@ def draw_bounding_boxes(image_path: Optional[Path] = None,
 
     return image
 
-def draw_points_line(image: np.ndarray, points_line: List[Tuple[int, int]], color: Tuple[int, int, int] = (0, 255, 0)) -> np.ndarray:
+# Pixels of cv2.circle(image, point, 1, color, -1) around the point (dx, dy): a plus sign
+POINT_OFFSETS = np.array([[0, -1], [-1, 0], [0, 0], [1, 0], [0, 1]], dtype=np.int32)
+
+def draw_points_line(image: np.ndarray, points_line: Union[np.ndarray, List[Tuple[int, int]]], color: Tuple[int, int, int] = (0, 255, 0)) -> np.ndarray:
     """
     Draws a line on the image using the given points.
 
+    Every point is stamped with the radius 1 dot of cv2.circle (POINT_OFFSETS) in one vectorized pixel write,
+    the pixels are the same as one cv2.circle call per point.
+
     Parameters:
     - image (np.ndarray): The image array.
-    - points_line (List[Tuple[int, int]]): List of points representing the line.
-    - color (Tuple[int, int, int]): Color of the points in BGR format. Default is red (0, 0, 255).
+    - points_line (Union[np.ndarray, List[Tuple[int, int]]]): (N, 2) array or list of points representing the line.
+    - color (Tuple[int, int, int]): Color of the points in BGR format. Default is green (0, 255, 0).
 
     Returns:
     - np.ndarray: The image with the line drawn on it.
     """
     image_with_line = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR) if len(image.shape) == 2 else image
-    for point in points_line:
-        cv2.circle(image_with_line, point, 1, color, -1)
-    
+    points = np.asarray(points_line, dtype=np.int32).reshape(-1, 2)
+    if len(points) == 0:
+        return image_with_line
+
+    # (N, 5, 2) dot pixels, the ones outside the image are dropped like cv2 clips them
+    pixels = (points[:, None, :] + POINT_OFFSETS[None, :, :]).reshape(-1, 2)
+    height, width = image_with_line.shape[:2]
+    inside = (pixels[:, 0] >= 0) & (pixels[:, 0] < width) & (pixels[:, 1] >= 0) & (pixels[:, 1] < height)
+    pixels = pixels[inside]
+    image_with_line[pixels[:, 1], pixels[:, 0]] = color
+
     return image_with_line
 
+def draw_pairs(image: np.ndarray, pairs: List[dict], draw_lines: bool = False) -> np.ndarray:
+    """
+    Draws the two items of every pair (and its points line) on the image, in place.
+
+    Parameters:
+    - image (np.ndarray): The image array (BGR).
+    - pairs (List[dict]): Overlap or obstacle results, {'items': [Item, Item], 'points_line': ...}.
+    - draw_lines (bool): Draw the 'points_line' of each pair. Default is False.
+
+    Returns:
+    - np.ndarray: The image with the pairs drawn on it.
+    """
+    for pair in pairs:
+        image = draw_bounding_boxes(item=pair['items'][0], image=image)
+        image = draw_bounding_boxes(item=pair['items'][1], image=image)
+        if draw_lines:
+            image = draw_points_line(points_line=pair['points_line'], image=image)
+    return image
 
-def save_to_image(image: np.ndarray, file_name: str= 'bounding.jpg'):
+
+class PlanRenderer:
+    """
+    Draws the outputs of one floor plan from a single decoded copy of it.
+
+    The plan is taken from the detection results (orig_img) or decoded once on first use, every output
+    is drawn on a copy of it and encoded once when saved into an output sink (files or memory).
+
+    Example:
+    renderer = PlanRenderer(image_path=result.path, image=result.orig_img)
+    renderer.save(renderer.render(obstacle_results, draw_lines=True), 'obstacle_door_to_door_plan.jpg', sink=MemorySink())
+    """
+    def __init__(self, image_path: Optional[Path] = None, image: Optional[np.ndarray] = None):
+        if image is None and image_path is None:
+            raise ValueError("Either image_path or image must be provided.")
+        self.image_path = image_path
+        self._image = image
+
+    @property
+    def image(self) -> np.ndarray:
+        """ The decoded plan (BGR), never drawn on. """
+        if self._image is None:
+            self._image = cv2.imread(str(self.image_path))
+            if self._image is None:
+                raise ValueError("Image could not be loaded. Check the provided path or image array.")
+        return self._image
+
+    def render(self, pairs: List[dict], draw_lines: bool = False) -> np.ndarray:
+        """ A new image of the plan with the pairs drawn on it (see draw_pairs). """
+        return draw_pairs(self.image.copy(), pairs, draw_lines=draw_lines)
+
+    def save(self, image: np.ndarray, file_name: str, sink: Optional[OutputSink] = None) -> Union[Path, EncodedImage]:
+        """ Encodes the image once into the sink. Default sink is a DirectorySink (OUTPUT_PATH_DEFAULT). """
+        sink = DirectorySink() if sink is None else sink
+        return sink.save(image, file_name)
+
+def save_to_image(image: np.ndarray, file_name: str= 'bounding.jpg', output_dir: Optional[Path] = None):
     """
     Saves the given image to the specified file path.
 
     Parameters:
     - image (np.ndarray): The image to be saved.
     - file_name (Optional[str]): The name of the file to save the image as. Default is 'bounding.jpg'.
+    - output_dir (Optional[Path]): Directory to save into, e.g. a request workspace. Default is OUTPUT_PATH_DEFAULT.
 
     Returns:
-    - No return
+    - Path: The saved file path.
     """
-    
-    OUTPUT_PATH_DEFAULT.mkdir(parents=True, exist_ok=True)
-    file_path = OUTPUT_PATH_DEFAULT / file_name
+    output_dir = OUTPUT_PATH_DEFAULT if output_dir is None else Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    file_path = output_dir / file_name
     cv2.imwrite(str(file_path), image)
     return file_path
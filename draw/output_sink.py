@@ -0,0 +1,164 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Union
+from pathlib import Path
+import numpy as np
+import sys
+import cv2
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+OUTPUT_PATH_DEFAULT = ROOT / 'fengshui' / 'output'
+sys.path.insert(0, str(ROOT))   # for import moduls
+
+OUTPUT_FORMAT_DEFAULT = None # None keeps the suffix of the file name (the format of the floor plan)
+OUTPUT_QUALITY_DEFAULT = 95 # JPEG / WebP quality (0 - 100), 95 is the cv2.imwrite default
+
+# Suffix -> cv2 quality flag (PNG is lossless, the quality is ignored).
+# Other suffixes cv2 can write (e.g. '.bmp', '.tif' plans) are encoded without quality
+QUALITY_FLAGS: Dict[str, Optional[int]] = {
+    '.jpg': cv2.IMWRITE_JPEG_QUALITY,
+    '.jpeg': cv2.IMWRITE_JPEG_QUALITY,
+    '.webp': cv2.IMWRITE_WEBP_QUALITY,
+    '.png': None
+}
+
+
+def encode_image(image: np.ndarray, suffix: str = '.jpg', quality: int = OUTPUT_QUALITY_DEFAULT) -> bytes:
+    """
+    Encodes an image in memory.
+
+    Parameters:
+    - image (np.ndarray): The image array (BGR).
+    - suffix (str): Any suffix cv2 can write ('.jpg', '.png', '.webp', '.bmp', '.tif'...). Default is '.jpg'.
+    - quality (int): JPEG / WebP quality, ignored by the other formats. Default is OUTPUT_QUALITY_DEFAULT.
+
+    Returns:
+    - bytes: The encoded image.
+
+    Raises:
+    - ValueError: If the format is not supported or the encoding failed.
+    """
+    suffix = suffix.lower()
+    flag = QUALITY_FLAGS.get(suffix)
+    params = [] if flag is None else [flag, int(quality)]
+    try:
+        ok, buffer = cv2.imencode(suffix, image, params)
+    except cv2.error as e:
+        raise ValueError(f"Unsupported output format '{suffix}'.") from e
+    if not ok:
+        raise ValueError(f"Failed to encode the image as '{suffix}'.")
+    return buffer.tobytes()
+
+
+class EncodedImage:
+    """ One rendered output kept in memory: its file name and encoded bytes. """
+    def __init__(self, name: str, data: bytes):
+        self.name = name
+        self.data = data
+
+    def write(self, output_dir: Path) -> Path:
+        """ Saves the bytes as output_dir / name (no encoding). """
+        file_path = Path(output_dir) / self.name
+        file_path.write_bytes(self.data)
+        return file_path
+
+    def __repr__(self):
+        return f"EncodedImage ('{self.name}', {len(self.data)} bytes)"
+
+# What a sink returns for each saved image
+OutputImage = Union[Path, EncodedImage]
+
+
+class OutputSink(ABC):
+    """
+    Destination of the rendered images: save(image, file_name) encodes the image once and
+    hands the bytes to put(file_name, data), which subclasses implement.
+
+    - format (Optional[str]): 'jpg', 'png' or 'webp'. Default is None (the suffix of the file name).
+    - quality (int): JPEG / WebP quality. Default is OUTPUT_QUALITY_DEFAULT.
+
+    persistent tells whether the saved images outlive the call without being returned (files),
+    images nobody gets back (e.g. the overlap images) are only rendered for a persistent sink.
+    """
+    persistent = False
+
+    def __init__(self, format: Optional[str] = OUTPUT_FORMAT_DEFAULT, quality: int = OUTPUT_QUALITY_DEFAULT):
+        self.format = format
+        self.quality = quality
+
+    def output_name(self, file_name: str) -> str:
+        if self.format is None:
+            return file_name
+        return str(Path(file_name).with_suffix('.' + self.format.lstrip('.')))
+
+    def save(self, image: np.ndarray, file_name: str) -> OutputImage:
+        file_name = self.output_name(file_name)
+        return self.put(file_name, encode_image(image, suffix=Path(file_name).suffix, quality=self.quality))
+
+    @abstractmethod
+    def put(self, file_name: str, data: bytes) -> OutputImage:
+        """ Stores an already encoded image (e.g. from the result cache). """
+
+
+class DirectorySink(OutputSink):
+    """
+    Writes the outputs into a directory.
+
+    A name already used in the directory (two plans with the same file name, two rules with the same classes)
+    gets a '_1', '_2'... suffix instead of overwriting the earlier output. The files are created exclusively,
+    so the names also stay unique across worker processes.
+    """
+    persistent = True
+
+    def __init__(self, output_dir: Optional[Path] = None, format: Optional[str] = OUTPUT_FORMAT_DEFAULT,
+                 quality: int = OUTPUT_QUALITY_DEFAULT):
+        super().__init__(format=format, quality=quality)
+        self.output_dir = OUTPUT_PATH_DEFAULT if output_dir is None else Path(output_dir)
+
+    def put(self, file_name: str, data: bytes) -> Path:
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        file_path = self.output_dir / file_name
+        index = 0
+        while True:
+            try:
+                with open(file_path, 'xb') as file:
+                    file.write(data)
+                return file_path
+            except FileExistsError:
+                index += 1
+                file_path = self.output_dir / f"{Path(file_name).stem}_{index}{Path(file_name).suffix}"
+
+
+class MemorySink(OutputSink):
+    """ Keeps the encoded outputs in memory (EncodedImage), nothing is written to disk. """
+    def put(self, file_name: str, data: bytes) -> EncodedImage:
+        return EncodedImage(file_name, data)
+
+
+OUTPUT_SINKS = {'directory': DirectorySink, 'memory': MemorySink}
+
+def make_sink(kind: str, output_dir: Optional[Path] = None, format: Optional[str] = OUTPUT_FORMAT_DEFAULT,
+              quality: int = OUTPUT_QUALITY_DEFAULT) -> OutputSink:
+    """
+    Output sink by name.
+
+    Parameters:
+    - kind (str): 'memory' or 'directory'.
+    - output_dir (Optional[Path]): Directory of the 'directory' sink. Default is OUTPUT_PATH_DEFAULT.
+    - format (Optional[str]): Output format. Default is None (the suffix of the file name).
+    - quality (int): JPEG / WebP quality. Default is OUTPUT_QUALITY_DEFAULT.
+
+    Returns:
+    - OutputSink: The sink.
+    """
+    if kind not in OUTPUT_SINKS:
+        raise ValueError(f"Unknown output sink '{kind}', expected one of {list(OUTPUT_SINKS)}.")
+    if kind == 'directory':
+        return DirectorySink(output_dir=output_dir, format=format, quality=quality)
+    return OUTPUT_SINKS[kind](format=format, quality=quality)
+
+def output_bytes(output: OutputImage) -> bytes:
+    """ Encoded bytes of an output, whichever sink made it. """
+    if isinstance(output, EncodedImage):
+        return output.data
+    return Path(output).read_bytes()
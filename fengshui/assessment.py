@@ -1,8 +1,13 @@
 from ultralytics.engine.results import Results # type: ignore
-from typing import List, Optional, Dict
-import copy
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from functools import partial
+from typing import List, Optional, Dict, Iterator, Tuple, Union
 from pathlib import Path
+import numpy as np
 import cv2
+import threading
+import logging
 import shutil
 import sys  
 import os 
@@ -15,32 +20,81 @@ sys.path.insert(0, str(ROOT))   # for import moduls
 # Resource
 IMAGES_PATH = ROOT / "images"
 
+# Instrumentation (see metrics.metrics, off until metrics.metrics.enable())
+from metrics.metrics import span, inc
+logger = logging.getLogger(__name__)
+
 # Clean folder
 CLEAN_IMAGES_FOLDER = False
 
 # Vision
 from vision.detect import floor_plan_detect  
+from vision.detect import floor_plan_detect_stream
+from vision.detect import floor_plan_detect_tiled
 from vision.classify import object_orientation_classify
+from vision.classify import classify_orientations, get_cached_orientations
+from vision.registry import get_model, unload_model
+from vision.plan_result import PlanResult
+import vision.classify as classify_settings
 YOLO_RESULTS_PATH = ROOT / 'runs' 
 
 DETECT_MODEL_PATH  = ROOT / 'models' / 'detect_yolov11.pt'
 CLASSIFY_MODEL_PATH = ROOT / 'models' / 'classify_yolov11.pt'
+IN_MEMORY_CROPS = True # Classify crops sliced from the detection image instead of the save_crop files
+CLASSIFY_BATCH_SIZE = 32
+STREAM_DETECTION = True # Detect and assess the images batch by batch (memory bounded by DETECT_BATCH_SIZE)
+DETECT_BATCH_SIZE = 16
+TILED_DETECTION = False # Detect large scans tile by tile at full resolution (see vision.tiling), small objects are not downsampled away
+TILE_SIZE = 1280 # Side of a tile in pixels, also the detection imgsz
+TILE_OVERLAP = 0.2 # Fraction of a tile shared with its neighbour, larger than the biggest object / TILE_SIZE
+TILE_BATCH_SIZE = 8 # Tiles per predict call
+
+# Parallel analysis (after detection, one floor plan per task), 1 analyses in this process.
+# Each call starts its own pool of fresh processes (torch, ultralytics and cv2 imported again in every worker),
+# only worth it for large batches of plans. The metrics (spans, counters) and binarization cache entries of the
+# workers stay in the workers, they are not in this process' metrics.METRICS / obstacle.BIN_CACHE
+ASSESS_WORKERS = 1
+# Fresh worker processes: forking after torch / OpenCV started their threads can deadlock the children
+ASSESS_START_METHOD = 'spawn'
 
 # Fengshui 
-from fengshui.item import Item  # Core class vary important
+from fengshui.item import Item, ItemSet  # Core class vary important
+from fengshui.item import ORIENTATION_CODES
+from fengshui.workspace import Workspace
+from fengshui.rules import Rule, PlanContext, get_rules, plan_classes, DEFAULT_RULE_NAMES
+from fengshui.rules import overlap_key as rule_overlap_key
+from fengshui.result_cache import ResultCache, make_key
+# Whole assessments of already seen plans (same image, models and settings)
+USE_RESULT_CACHE = True
+RESULT_CACHE: Optional[ResultCache] = None # Created on first use (see get_result_cache), not when the module is imported
+_RESULT_CACHE_LOCK = threading.Lock()
+IMAGE_SUFFIXES = ['.jpg', '.jpeg', '.png', '.bmp', '.webp']
 OUTPUT_PATH = ROOT / 'fengshui' / 'output' # Note: In "draw" dir have same default path
 
 # Draw
 from draw.draw_item import draw_bounding_boxes
 from draw.draw_item import save_to_image
 from draw.draw_item import draw_points_line
+from draw.draw_item import PlanRenderer
+from draw.output_sink import OutputSink, OutputImage, make_sink, output_bytes
+OUTPUT_SINK = 'memory' # 'memory' keeps the encoded outputs in memory (EncodedImage), 'directory' writes files
+OUTPUT_FORMAT = None # 'jpg', 'png', 'webp' or None (the format of the floor plan)
+OUTPUT_QUALITY = 95 # JPEG / WebP quality
+OVERLAP_OUTPUT_SUFFIX = '.overlap' # Output key of the overlap image of a rule, e.g. 'door_to_door.overlap' (persistent sinks only)
 
 # Obstical
 from obstacle.obstacle import items_obstacle_detect
+from obstacle.obstacle import pair_obstacle_detect
+import obstacle.obstacle as obstacle_settings
 OBSTACLE_THRESHOLD = 0.5 # 50%
+OBSTACLE_MODE = 'decision' # Only the pairs passing the threshold are reported, so obstructed pairs may stop early
+OBSTACLE_ROI = True # Binarize only the corridor of each pair (see obstacle.ROI_BINARIZATION), no whole plan in the results
 
 # Overlap
 from overlap.overlap import overlap_rate
+from overlap.overlap import overlap_candidates_one_item, overlap_candidates_two_item
+from overlap.overlap import overlap_results_for_pairs
+from overlap.overlap import overlap_rate_arrays, items_to_arrays
 OVERLAP_THRESHOLD = 0.5 # 50% overlap range
 
 # 這裡應該要是 list 對應 oto result 主程式要再修正
@@ -51,21 +105,47 @@ def show_analy_results(result: Dict[str, List]):
 
     for res in result['overlap_result']:
         # Print the names of the two overlapping items
-        print("Item 1 name: {}, Item 2 name: {}".format(res['items'][0].name, res['items'][1].name))
+        logger.info("Item 1 name: %s, Item 2 name: %s", res['items'][0].name, res['items'][1].name)
 
     # items, points_line, bin_image_np_arrary, rate
+    # Note: 'bin_image_np_arrary' is None with OBSTACLE_ROI (only the corridor 'bin_region_np_array' was binarized)
     for res in result['obstacle_result']:
-        print("Item 1 name: {}, Item 2 name: {}".format(res['items'][0].name, res['items'][1].name))
+        logger.info("Item 1 name: %s, Item 2 name: %s", res['items'][0].name, res['items'][1].name)
 
        
 
+def load_models():
+    '''
+        'load_models' is using in server start-up to load and warm up the models once,
+        every later request reuses them through the model registry.
+    '''
+    get_model(DETECT_MODEL_PATH)
+    get_model(CLASSIFY_MODEL_PATH)
+
+def release_models():
+    '''
+        'release_models' frees the models memory, they are loaded again on the next request.
+    '''
+    unload_model(DETECT_MODEL_PATH)
+    unload_model(CLASSIFY_MODEL_PATH)
+
+def get_result_cache() -> ResultCache:
+    '''
+        'get_result_cache' returns the process-wide result cache, the cache directory is only scanned on first use.
+    '''
+    global RESULT_CACHE
+    with _RESULT_CACHE_LOCK:
+        if RESULT_CACHE is None:
+            RESULT_CACHE = ResultCache()
+        return RESULT_CACHE
+
 def clean_folder(folder_path: Path):
     '''
         'clean_folder' is using in server to clean temporary files
     '''
     if folder_path.exists():
         shutil.rmtree(folder_path)
-        print(f"{folder_path} has been deleted.")
+        logger.info("%s has been deleted.", folder_path)
         os.makedirs(folder_path)
 
 def extract_target_xyxy_data(object_name: str, result: Results) -> Optional[List[List[float]]]:
@@ -111,14 +191,14 @@ def init_one_target(object_name: str, result: Results) -> Optional[List[Item]]:
     """
         
     # Get what data we want and create "Item" list
-    orientation_list = object_orientation_classify(root=ROOT, model_path=CLASSIFY_MODEL_PATH, object_name=object_name, result=result)
+    # Labels of the batched pass in run() are looked up, otherwise classify this class now
+    orientation_list = get_cached_orientations(result=result, object_name=object_name)
+    if orientation_list is None:
+        orientation_list = object_orientation_classify(root=ROOT, model_path=CLASSIFY_MODEL_PATH, object_name=object_name, result=result, in_memory=IN_MEMORY_CROPS)
     xyxy_list =  extract_target_xyxy_data(object_name=object_name, result=result)
     item_list = []
     
-    print('orientation_list',len(orientation_list))
-    print('xyxy_list',len(xyxy_list))
-
-    print(orientation_list)
+    logger.debug("%s: %d orientations %s, %d boxes", object_name, len(orientation_list), orientation_list, len(xyxy_list))
     if len(orientation_list) == len(xyxy_list):  # (error detect)
         for index in range(len(orientation_list)):
             item = Item(x1=xyxy_list[index][0],
@@ -132,161 +212,262 @@ def init_one_target(object_name: str, result: Results) -> Optional[List[Item]]:
     else:
         return None # The data don't correspond in length
 
-def save_overlap_to_jpg(overlap_results: Dict[str, any], result: Results):
+def get_plan_renderer(result: Results, context: Optional[PlanContext] = None) -> PlanRenderer:
+    """ Renderer of the floor plan, shared by every rule when a context is given (the plan is decoded once). """
+    if context is not None and context.renderer is not None:
+        return context.renderer
+    renderer = PlanRenderer(image_path=result.path, image=getattr(result, 'orig_img', None))
+    if context is not None:
+        context.renderer = renderer
+    return renderer
+
+def output_file_name(prefix: str, pairs: List[Dict[str, any]], result: Results) -> str:
+    """ e.g. 'obstacle_door_to_door_plan.jpg', named after the last pair. """
+    items = pairs[-1]['items']
+    return prefix + '_' + items[0].name + '_to_' + items[1].name + '_' + Path(result.path).name
+
+def get_output_sink(output_dir: Optional[Path] = None, sink: Optional[OutputSink] = None) -> OutputSink:
+    """ The given sink, else files in output_dir when one is given, else an OUTPUT_SINK sink. """
+    if sink is not None:
+        return sink
+    kind = 'directory' if output_dir is not None else OUTPUT_SINK
+    return make_sink(kind, output_dir=OUTPUT_PATH if output_dir is None else output_dir,
+                     format=OUTPUT_FORMAT, quality=OUTPUT_QUALITY)
+
+def save_overlap_to_jpg(overlap_results: Dict[str, any], result: Results, output_dir: Optional[Path] = None,
+                        renderer: Optional[PlanRenderer] = None, sink: Optional[OutputSink] = None) -> OutputImage:
+
+    # Selet target (decoded once per floor plan by the renderer)
+    renderer = get_plan_renderer(result) if renderer is None else renderer
+    image = renderer.render(overlap_results)
 
-    # Selet target
-    image = cv2.imread(str(result.path))
-    for res in overlap_results:
-        image = draw_bounding_boxes(item=res['items'][0], image=image)
-        image = draw_bounding_boxes(item=res['items'][1], image=image)
-    
     # Init file name (save at ROOT / fengshui / *.jpg)
-    result_path = Path(result.path)
-    sub_name = res['items'][0].name + '_to_' +res['items'][1].name + '_'
-    file_name = 'overlap_' + sub_name + str(result_path.name)
+    return renderer.save(image, file_name=output_file_name('overlap', overlap_results, result), sink=get_output_sink(output_dir, sink))
 
-    save_to_image(image= image, file_name= file_name)
+def save_obstacle_to_jpg(obstacle_results: Dict[str, any], result: Results, output_dir: Optional[Path] = None,
+                         renderer: Optional[PlanRenderer] = None, sink: Optional[OutputSink] = None) -> OutputImage:
 
-def save_obstacle_to_jpg(obstacle_results: Dict[str, any], result: Results):
-
-    # Selet target
-    image = cv2.imread(str(result.path))
-    for res in obstacle_results:
-        image = draw_bounding_boxes(item=res['items'][0], image=image)
-        image = draw_bounding_boxes(item=res['items'][1], image=image)
-        image = draw_points_line(points_line=res['points_line'], image=image)
+    # Selet target (decoded once per floor plan by the renderer)
+    renderer = get_plan_renderer(result) if renderer is None else renderer
+    image = renderer.render(obstacle_results, draw_lines=True)
 
     # Init file name (save at ROOT / fengshui / *.jpg)
-    result_path = Path(result.path)
-    sub_name = res['items'][0].name + '_to_' +res['items'][1].name + '_'
-    file_name = 'obstacle_' + sub_name + str(result_path.name)
-
-    save_dir = save_to_image(image= image, file_name= file_name)
+    save_dir = renderer.save(image, file_name=output_file_name('obstacle', obstacle_results, result), sink=get_output_sink(output_dir, sink))
 
     return save_dir 
 
-def filter_overlap_rate(overlap_results: List[Dict[str, any]]) -> List[Dict[str, any]]:
+def filter_overlap_rate(overlap_results: List[Dict[str, any]], threshold: Optional[float] = None) -> List[Dict[str, any]]:
     """
     Checks the overlap rate and full coverage status for a list of results, 
     and returns a list of eligible results.
 
     Parameters:
     - overlap_results (List[Dict[str, dict]]): A list of dictionaries containing overlap analysis results.
+    - threshold (Optional[float]): Minimum overlap rate. Default is OVERLAP_THRESHOLD.
 
     Returns:
     - List[Dict[str, dict]]: A list of eligible results where full coverage is achieved 
                              or the overlap rate is above the defined threshold.
     """
+    threshold = OVERLAP_THRESHOLD if threshold is None else threshold
     eligibility_list = []
     for res in overlap_results:
-        if res['full_coverage'] or res['rate'] >= OVERLAP_THRESHOLD:
+        if res['full_coverage'] or res['rate'] >= threshold:
             eligibility_list.append(res)
 
     return eligibility_list
 
-def filter_obstacle_rate(obstacle_results: List[Dict[str, any]]):
+def filter_obstacle_rate(obstacle_results: List[Dict[str, any]], threshold: Optional[float] = None):
+    threshold = OBSTACLE_THRESHOLD if threshold is None else threshold
     eligibility_list = []
     for res in obstacle_results:
-        if res['rate'] <= OBSTACLE_THRESHOLD:
+        if res['rate'] <= threshold:
             eligibility_list.append(res)
 
     return eligibility_list
 
-def get_overlap_results_one_item(item_list: List[Item]) -> List[Dict[str, any]]:
-    overlap_results = []
-    # Step 3: Compare each pair of items for overlap
-    for out_index in range(len(item_list)):
-        for inner_index in range(out_index+1, len(item_list)):
-            items = [item_list[out_index], item_list[inner_index]]
-            # {"items": List[Item, Item],"rate": float,"full_coverage": bool}
-            overlap_results.append(overlap_rate(items=items))
-    return overlap_results
+def get_overlap_results_one_item(item_list: List[Item], threshold: Optional[float] = None) -> List[Dict[str, any]]:
+    # Only pairs with intersecting projections (sweep line) can pass filter_overlap_rate,
+    # the others always have rate 0.0 and are skipped (same filtered results, same order).
+    threshold = OVERLAP_THRESHOLD if threshold is None else threshold
+    if threshold > 0:
+        pairs = overlap_candidates_one_item(item_list=item_list)
+    else:
+        pairs = [(out_index, inner_index) for out_index in range(len(item_list)) for inner_index in range(out_index+1, len(item_list))]
 
-def get_overlap_results_two_item(type_one_item_list: List[Item], type_two_item_list: List[Item])-> List[Dict[str, any]]:
-    overlap_results = []
-    # Step 3: Compare each pair of items for overlap
-    for type_one_item in type_one_item_list:
-        for type_two_item in type_two_item_list:
-            items = [type_one_item, type_two_item]
-            # {"items": List[Item, Item],"rate": float,"full_coverage": bool}
-            overlap_results.append(overlap_rate(items=items))
-    return overlap_results
+    # Step 3: Compare each pair of items for overlap (one vectorized call for all pairs)
+    # [{"items": List[Item, Item],"rate": float,"full_coverage": bool}, ...]
+    return overlap_results_for_pairs(items_a=item_list, items_b=item_list, pairs=pairs)
+
+def get_overlap_results_two_item(type_one_item_list: List[Item], type_two_item_list: List[Item], threshold: Optional[float] = None)-> List[Dict[str, any]]:
+    # Same candidate pruning as get_overlap_results_one_item
+    threshold = OVERLAP_THRESHOLD if threshold is None else threshold
+    if threshold > 0:
+        pairs = overlap_candidates_two_item(type_one_item_list=type_one_item_list, type_two_item_list=type_two_item_list)
+    else:
+        pairs = [(one_index, two_index) for one_index in range(len(type_one_item_list)) for two_index in range(len(type_two_item_list))]
+
+    # Step 3: Compare each pair of items for overlap (one vectorized call for all pairs)
+    # [{"items": List[Item, Item],"rate": float,"full_coverage": bool}, ...]
+    return overlap_results_for_pairs(items_a=type_one_item_list, items_b=type_two_item_list, pairs=pairs)
 
 def change_orientation(item_list: List[Item], orientation: str)-> List[Item]:
     # 若不是使用複製則會導致 item 方向會被第二次覆蓋掉物件原始數值導致方向錯誤
     # 針對以檢測出來的結果方向會同步更動受到影響
-    new_item_list = copy.deepcopy(item_list)
-    for item in new_item_list:
-        item.orientation = orientation
-    return new_item_list
+    # New items from an orientation view of the columnar set (no deepcopy, float64 keeps the values exact)
+    return ItemSet.from_items(item_list, dtype=np.float64).with_orientation(orientation).to_items()
+
+# Orientations tried (in this order) for objects without orientation check
+FREE_ORIENTATIONS = ['horizontal', 'vertical']
+
+def get_overlap_results_free_orientation(main_item_list: List[Item],
+                                         free_item_list: Optional[List[Item]] = None,
+                                         main_fixed: bool = False,
+                                         threshold: Optional[float] = None) -> List[Dict[str, any]]:
+    '''
+    Overlap results of the "no orientation check" cases, both orientations in one pass.
+
+    Same results as forcing the free items (and the main items unless main_fixed) to 'horizontal',
+    comparing, forcing them to 'vertical' and comparing again, i.e. horizontal results + vertical results.
+    The coordinates are shared, only the orientation codes differ, so every candidate pair is evaluated
+    under both orientations with a single vectorized call.
 
-# Core function
-def total_object_to_object(objects_name: List[str], result: Results, orient_check: Dict[str, bool]):
-    ''' 
-    FengShui object to object analysis.
-    
     Parameters:
-    - objects_name (List[str]): List of object names to analyze.
-    - result (Results): The results object containing detected objects and their bounding boxes.
-    
+    - main_item_list (List[Item]): First items of each pair.
+    - free_item_list (Optional[List[Item]]): Second items. Default is None (pairs inside main_item_list).
+    - main_fixed (bool): Keep the classified orientation of the main items. Default is False.
+    - threshold (Optional[float]): Overlap threshold the results will be filtered with. Default is OVERLAP_THRESHOLD.
+
     Returns:
-    - Optional[dict]: Analysis result dictionary or None if no data is available.
-    
-    Steps:
-    <Check if result is empty (no data)>
-    1. Check if the number of target objects is valid (1 or 2).
-    2. Format the data for easier use.
-    3. Caculate the overlap rate
-    4. Filter the objects by the threshold and save target to jpg.
-    5. Check if the path is clear if the objects overlap.
-    6. Caculate the obstacle rate
+    - List[Dict[str, any]]: [{"items": List[Item, Item],"rate": float,"full_coverage": bool}, ...]
     '''
+    threshold = OVERLAP_THRESHOLD if threshold is None else threshold
+    one_list = free_item_list is None
+    main_set = ItemSet.from_items(main_item_list, dtype=np.float64)
+    free_set = main_set if one_list else ItemSet.from_items(free_item_list, dtype=np.float64)
+
+    # Items of every orientation pass (new Item objects like change_orientation, the main list itself when fixed)
+    main_items, free_items = {}, {}
+    for orientation in FREE_ORIENTATIONS:
+        main_items[orientation] = main_item_list if main_fixed else main_set.with_orientation(orientation).to_items()
+        free_items[orientation] = main_items[orientation] if one_list else free_set.with_orientation(orientation).to_items()
+
+    # Candidate pairs of any orientation pass
+    pairs = set()
+    for orientation in FREE_ORIENTATIONS:
+        if threshold <= 0:
+            pairs.update((i, j) for i in range(len(main_item_list)) for j in range(len(free_set)) if not one_list or i < j)
+        elif one_list:
+            pairs.update(overlap_candidates_one_item(item_list=main_items[orientation]))
+        else:
+            pairs.update(overlap_candidates_two_item(type_one_item_list=main_items[orientation], type_two_item_list=free_items[orientation]))
+    pairs = sorted(pairs)
+    if len(pairs) == 0:
+        return []
+
+    # (K, orientations) rates in one call
+    main_boxes, main_codes = items_to_arrays(main_set)
+    free_boxes, _ = items_to_arrays(free_set)
+    index_main = np.array([pair[0] for pair in pairs])
+    index_free = np.array([pair[1] for pair in pairs])
+    free_codes = np.array([[ORIENTATION_CODES[orientation] for orientation in FREE_ORIENTATIONS]], dtype=np.int8)
+    main_codes = main_codes[index_main][:, None] if main_fixed else free_codes
+    rates, full_coverages = overlap_rate_arrays(main_boxes[index_main][:, None, :], free_boxes[index_free][:, None, :],
+                                                main_codes, free_codes)
 
     overlap_results = []
+    for orientation_index, orientation in enumerate(FREE_ORIENTATIONS):
+        for (i, j), rate, full_coverage in zip(pairs, rates[:, orientation_index].tolist(), full_coverages[:, orientation_index].tolist()):
+            items = [main_items[orientation][i], free_items[orientation][j]]
+            overlap_results.append({'items': items, 'rate': rate, 'full_coverage': full_coverage})
+    return overlap_results
 
-    # Is result empty (no data)
-    target_cls_list = result.boxes.cls.tolist()
-    objects_name_id = []
+def pair_key(first: Item, second: Item) -> tuple:
+    # Same names and coordinates -> same white boxes and line, whatever the orientation
+    return (first.name, first.x1, first.y1, first.x2, first.y2, second.name, second.x1, second.y1, second.x2, second.y2)
 
-    # Find item id from result.names
-    for name in objects_name:
-        for cls_id in result.names:
-                if result.names[cls_id] == name:
-                    objects_name_id.append(cls_id)
+def obstacle_detect_all(overlap_list: List[Dict[str, any]], image_path: Path, context: Optional[PlanContext] = None,
+                        **scan_params) -> List[Dict[str, any]]:
+    '''
+    items_obstacle_detect for every overlapping pair, in order (scan_params: mode and thresholds of scan_obstacle).
 
-    # Check exist in target_cls_list
-    for name_id in objects_name_id :
-        if target_cls_list.count(name_id) <= 0:
-            return None
+    A pair that passed under several orientations (same coordinates, "no orientation check")
+    is prepared once (white boxes, line) and only scanned once per orientation.
+    With a context, pairs already scanned by another rule of the floor plan are not scanned again.
+    '''
+    obstacles = {} if context is None else context.obstacles
+    # Decision mode results depend on the thresholds, rules with other ones scan again
+    scan_key = tuple(sorted(scan_params.items()))
+
+    # {coordinates of both items: [index in overlap_list, ...]} of the pairs still to scan
+    same_pair_indexes = {}
+    for index, target in enumerate(overlap_list):
+        first, second = target['items']
+        key = pair_key(first, second)
+        if (key, first.orientation, scan_key) not in obstacles:
+            same_pair_indexes.setdefault(key, []).append(index)
+    scans = sum(len(indexes) for indexes in same_pair_indexes.values())
+    inc('obstacle_scans_total', scans)
+    inc('obstacle_scans_reused_total', len(overlap_list) - scans)
+
+    for key, indexes in same_pair_indexes.items():
+        items_per_orientation = [overlap_list[index]['items'] for index in indexes]
+        pair_results = pair_obstacle_detect(image_path=image_path, items_per_orientation=items_per_orientation,
+                                            roi=OBSTACLE_ROI, **scan_params)
+        for items, obstacle_result in zip(items_per_orientation, pair_results):
+            obstacles[(key, items[0].orientation, scan_key)] = obstacle_result
+
+    obstacle_results = []
+    for target in overlap_list:
+        first, second = target['items']
+        key = pair_key(first, second)
+        obstacle_results.append(obstacles[(key, first.orientation, scan_key)])
+    return obstacle_results
+
+def get_target_items(object_name: str, result: Results, context: Optional[PlanContext] = None) -> Optional[List[Item]]:
+    """ init_one_target, done once per class and floor plan when a context is given. """
+    if context is None:
+        return init_one_target(object_name=object_name, result=result)
+    if object_name not in context.items:
+        context.items[object_name] = init_one_target(object_name=object_name, result=result)
+    return context.items[object_name]
+
+def compute_overlap_results(objects_name: List[str], result: Results, orient_check: Dict[str, bool],
+                            threshold: Optional[float] = None, context: Optional[PlanContext] = None) -> Optional[List[Dict[str, any]]]:
+    '''
+    Step 1 to 3 of total_object_to_object: unfiltered overlap results of the candidate pairs.
+    With a context, the results are shared by every rule with the same classes and orientation policy.
+    '''
+    threshold = OVERLAP_THRESHOLD if threshold is None else threshold
+    overlap_key = rule_overlap_key(objects_name, orient_check, threshold)  # Same key as Rule.overlap_key
+    if context is not None and overlap_key in context.overlaps:
+        return context.overlaps[overlap_key]
+
+    overlap_results = []
 
     # Step1 : Check the number of target objects
     if len(objects_name) == 1:
         
         # Stept2 : Format the data for one target
-        item_list = init_one_target(object_name=objects_name[0], result=result)
+        item_list = get_target_items(object_name=objects_name[0], result=result, context=context)
 
         if item_list is None:
-            print("The item_list is None")
+            logger.debug("The item_list is None")
             return None
         
         #if orient_check[objects_name] == False:
         # Step 3: Compare each pair of items for overlap
         if orient_check[objects_name[0]]:
-            overlap_results = get_overlap_results_one_item(item_list=item_list)
+            overlap_results = get_overlap_results_one_item(item_list=item_list, threshold=threshold)
         else:
             # No orientation check means that process need to check both orientation.
-            item_list = change_orientation(item_list= item_list, orientation= 'horizontal')
-            hor_overlap_results = get_overlap_results_one_item(item_list=item_list)
-
-            item_list = change_orientation(item_list= item_list, orientation= 'vertical')
-            ver_overlap_results = get_overlap_results_one_item(item_list=item_list)
-
-            overlap_results = hor_overlap_results + ver_overlap_results
+            # (horizontal results + vertical results, computed in one pass)
+            overlap_results = get_overlap_results_free_orientation(main_item_list=item_list, threshold=threshold)
             
     elif len(objects_name) == 2:
         # Stept2 : Format the data for one target
-        type_one_item_list = init_one_target(object_name=objects_name[0], result=result)
-        type_two_item_list = init_one_target(object_name=objects_name[1], result=result)
+        type_one_item_list = get_target_items(object_name=objects_name[0], result=result, context=context)
+        type_two_item_list = get_target_items(object_name=objects_name[1], result=result, context=context)
 
         #print(type_one_item_list)
         #print(type_two_item_list)
@@ -295,29 +476,22 @@ def total_object_to_object(objects_name: List[str], result: Results, orient_chec
 
         # Both need to check orientation
         if orient_check[objects_name[0]] and orient_check[objects_name[1]]:
-            print("Both need to check orientation")
+            logger.debug("Both need to check orientation")
             overlap_results = get_overlap_results_two_item(type_one_item_list=type_one_item_list, 
-                                                            type_two_item_list=type_two_item_list)
+                                                            type_two_item_list=type_two_item_list,
+                                                            threshold=threshold)
         # Both don't need to check orientation
         elif not orient_check[objects_name[0]] and not orient_check[objects_name[1]]:
-            print("don't need to check orientation")
-            type_one_item_list = change_orientation(item_list= type_one_item_list, orientation= 'horizontal')
-            type_two_item_list = change_orientation(item_list= type_two_item_list, orientation= 'horizontal')
-            hor_overlap_results = get_overlap_results_two_item(type_one_item_list=type_one_item_list, 
-                                                            type_two_item_list=type_two_item_list)
-            print("hor_overlap_results :",hor_overlap_results)
-            type_one_item_list = change_orientation(item_list= type_one_item_list, orientation= 'vertical')
-            type_two_item_list = change_orientation(item_list= type_two_item_list, orientation= 'vertical')
-            ver_overlap_results = get_overlap_results_two_item(type_one_item_list=type_one_item_list, 
-                                                                type_two_item_list=type_two_item_list)  
-            print('ver_overlap_results :',ver_overlap_results )
-
-            overlap_results = hor_overlap_results + ver_overlap_results
+            logger.debug("don't need to check orientation")
+            # horizontal results + vertical results, computed in one pass
+            overlap_results = get_overlap_results_free_orientation(main_item_list=type_one_item_list,
+                                                                   free_item_list=type_two_item_list,
+                                                                   threshold=threshold)
             #print("k_to_e",overlap_results)
 
         # One of them need check orientation
         else:
-            print(' One of them need check orientation')
+            logger.debug("One of them need check orientation")
             if orient_check[objects_name[0]]:
                 main_list = type_one_item_list
                 dependence＿list = type_two_item_list
@@ -325,39 +499,106 @@ def total_object_to_object(objects_name: List[str], result: Results, orient_chec
                 main_list = type_two_item_list
                 dependence＿list = type_one_item_list
 
-            
-            dependence＿list = change_orientation(item_list= dependence＿list, orientation= 'horizontal')
-            hor_overlap_results = get_overlap_results_two_item(type_one_item_list= main_list, 
-                                                                type_two_item_list= dependence＿list)
-            
-            dependence＿list = change_orientation(item_list= dependence＿list, orientation= 'vertical')
-            ver_overlap_results = get_overlap_results_two_item(type_one_item_list= main_list, 
-                                                                type_two_item_list= dependence＿list)
-            overlap_results = hor_overlap_results + ver_overlap_results 
+            # The dependence items take both orientations (horizontal results + vertical results, one pass)
+            overlap_results = get_overlap_results_free_orientation(main_item_list=main_list,
+                                                                   free_item_list=dependence＿list,
+                                                                   main_fixed=True,
+                                                                   threshold=threshold)
     else:
         return None
+
+    inc('pairs_evaluated_total', len(overlap_results))
+    if context is not None:
+        context.overlaps[overlap_key] = overlap_results
+    return overlap_results
+
+# Core function
+def total_object_to_object(objects_name: List[str], result: Results, orient_check: Dict[str, bool], output_dir: Optional[Path] = None,
+                           context: Optional[PlanContext] = None,
+                           overlap_threshold: Optional[float] = None,
+                           obstacle_threshold: Optional[float] = None,
+                           obstacle_mode: Optional[str] = None,
+                           sink: Optional[OutputSink] = None):
+    ''' 
+    FengShui object to object analysis.
+    
+    Parameters:
+    - objects_name (List[str]): List of object names to analyze.
+    - result (Results): The results object containing detected objects and their bounding boxes.
+    - output_dir (Optional[Path]): Where the rendered images go (request workspace). Default is None (see get_output_sink).
+    - context (Optional[PlanContext]): Items, overlaps and obstacle scans shared by the rules of this floor plan. Default is None.
+    - overlap_threshold (Optional[float]): Default is OVERLAP_THRESHOLD.
+    - obstacle_threshold (Optional[float]): Default is OBSTACLE_THRESHOLD.
+    - obstacle_mode (Optional[str]): 'full' or 'decision' scan (see scan_obstacle). Default is OBSTACLE_MODE.
+    - sink (Optional[OutputSink]): Destination of the rendered images, instead of output_dir. Default is None.
+    
+    Returns:
+    - Optional[dict]: Analysis result dictionary or None if no data is available.
+    
+    Steps:
+    <Check if result is empty (no data)>
+    1. Check if the number of target objects is valid (1 or 2).
+    2. Format the data for easier use.
+    3. Caculate the overlap rate
+    4. Filter the objects by the threshold and save target to jpg.
+    5. Check if the path is clear if the objects overlap.
+    6. Caculate the obstacle rate
+    '''
+
+    # Is result empty (no data)
+    target_cls_list = result.boxes.cls.tolist()
+    objects_name_id = []
+
+    # Find item id from result.names
+    for name in objects_name:
+        for cls_id in result.names:
+                if result.names[cls_id] == name:
+                    objects_name_id.append(cls_id)
+
+    # Check exist in target_cls_list
+    for name_id in objects_name_id :
+        if target_cls_list.count(name_id) <= 0:
+            return None
+
+    # Step1 ~ 3 : Items and overlap rate of the candidate pairs
+    with span('overlap'):
+        overlap_results = compute_overlap_results(objects_name=objects_name, result=result, orient_check=orient_check,
+                                                  threshold=overlap_threshold, context=context)
+    if overlap_results is None:
+        return None
     
     # Step4 : Filter the objects by the threshold and save target to jpg.
     # Filter by OVERLAP_THRESHOLD
     # result_dic = {'items': items,'rate': 0.0,'full_coverage': False}
-    have_overlap_list = filter_overlap_rate(overlap_results)
+    have_overlap_list = filter_overlap_rate(overlap_results, threshold=overlap_threshold)
+    inc('pairs_passed_total', len(have_overlap_list), stage='overlap')
 
     # Note: For extract oringinal path need to input "result"  
-    if len(have_overlap_list) > 0:
-        save_overlap_to_jpg(have_overlap_list, result=result)  
+    # The overlap image is not returned, only a sink keeping files (DirectorySink) makes it worth rendering
+    sink = get_output_sink(output_dir, sink)
+    if len(have_overlap_list) > 0 and sink.persistent:
+        with span('drawing'):
+            overlap_image = save_overlap_to_jpg(have_overlap_list, result=result, output_dir=output_dir,
+                                                renderer=get_plan_renderer(result, context), sink=sink)
+        if context is not None:
+            context.overlap_images.append(overlap_image)
     
-    obstacle_results = []
     # Step5 : check obstical rate
-    # target
-    for target in have_overlap_list:
-        obstacle_result = items_obstacle_detect(items= target['items'], image_path= result.path)
-        obstacle_results.append(obstacle_result)
+    # target (a pair passing under both orientations is prepared once and scanned per orientation)
+    obstacle_threshold = OBSTACLE_THRESHOLD if obstacle_threshold is None else obstacle_threshold
+    obstacle_mode = OBSTACLE_MODE if obstacle_mode is None else obstacle_mode
+    with span('obstacle'):
+        obstacle_results = obstacle_detect_all(overlap_list=have_overlap_list, image_path=result.path, context=context,
+                                               mode=obstacle_mode, obstacle_threshold=obstacle_threshold)
     
-    pass_obstacle_results = filter_obstacle_rate(obstacle_results=obstacle_results)
+    pass_obstacle_results = filter_obstacle_rate(obstacle_results=obstacle_results, threshold=obstacle_threshold)
+    inc('pairs_passed_total', len(pass_obstacle_results), stage='obstacle')
 
     image_result_dir = None
     if len(pass_obstacle_results) > 0:
-        image_result_dir = save_obstacle_to_jpg(obstacle_results= pass_obstacle_results, result=result)
+        with span('drawing'):
+            image_result_dir = save_obstacle_to_jpg(obstacle_results= pass_obstacle_results, result=result, output_dir=output_dir,
+                                                    renderer=get_plan_renderer(result, context), sink=sink)
     else:
         return None
 
@@ -369,7 +610,188 @@ def total_object_to_object(objects_name: List[str], result: Results, orient_chec
 
     return all_results
         
-def run():
+def summarize_items(items: List[Item]) -> list:
+    return [[item.name, item.x1, item.y1, item.x2, item.y2, item.orientation] for item in items]
+
+def summarize_rule_result(rule_result: Optional[dict]) -> Optional[dict]:
+    """
+    JSON serializable form of a total_object_to_object result (without images and binarized plans).
+
+    Returns:
+    - Optional[dict]: {'overlap': [[items, rate, full_coverage], ...], 'obstacle': [[items, rate, obstacle_type], ...]},
+                      items being [[name, x1, y1, x2, y2, orientation], ...].
+    """
+    if rule_result is None:
+        return None
+    return {
+        'overlap': [[summarize_items(res['items']), float(res['rate']), bool(res['full_coverage'])] for res in rule_result['overlap_result']],
+        'obstacle': [[summarize_items(res['items']), float(res['rate']), res['obstacle_type']] for res in rule_result['obstacle_result']]
+    }
+
+def assess_plan(result: Results, output_dir: Optional[Path] = None,
+                rules: Optional[List[Rule]] = None, sink: Optional[OutputSink] = None) -> Tuple[Dict[str, Optional[OutputImage]], Dict[str, Optional[dict]]]:
+    """
+    Runs every object to object rule of one floor plan.
+
+    The rules share one PlanContext, so each class is extracted once, rules with the same classes
+    and orientation policy share their overlap results and each pair / orientation is scanned once.
+
+    Note: Module level function so that it can be sent to the worker processes of run().
+
+    Parameters:
+    - result (Results): The detection results of one floor plan (or its PlanResult).
+    - output_dir (Optional[Path]): Where the rendered images go. Default is None (see get_output_sink).
+    - rules (Optional[List[Rule]]): Rules to check. Default is None (DEFAULT_RULE_NAMES).
+    - sink (Optional[OutputSink]): Destination of the rendered images, instead of output_dir. Default is None.
+
+    Returns:
+    - Tuple[Dict[str, Optional[OutputImage]], Dict[str, Optional[dict]]]: Obstacle image (file path or EncodedImage) per rule name (None if nothing was found),
+                                                                    and the summarize_rule_result of each rule.
+                                                                    With a persistent sink the overlap images are also
+                                                                    listed, as '<rule name>.overlap' (OVERLAP_OUTPUT_SUFFIX).
+    """
+    rules = get_rules(DEFAULT_RULE_NAMES) if rules is None else rules
+    context = PlanContext()
+
+    # Object to object analysis
+    outputs, summaries = {}, {}
+    with span('assess_plan'):
+        for rule in rules:
+            overlap_images = len(context.overlap_images)
+            rule_result = total_object_to_object(objects_name=rule.objects_name, result=result, orient_check=rule.orient_check,
+                                                 output_dir=output_dir, context=context, sink=sink,
+                                                 overlap_threshold=rule.overlap_threshold,
+                                                 obstacle_threshold=rule.obstacle_threshold)
+            outputs[rule.name] = None if rule_result is None else rule_result['image_path']
+            if len(context.overlap_images) > overlap_images:
+                outputs[rule.name + OVERLAP_OUTPUT_SUFFIX] = context.overlap_images[-1]
+            summaries[rule.name] = summarize_rule_result(rule_result)
+            inc('rule_results_total', rule=rule.name, found=rule_result is not None)
+
+    return outputs, summaries
+
+def assess_one_result(result: Results, output_dir: Optional[Path] = None, rules: Optional[List[Rule]] = None,
+                      sink: Optional[OutputSink] = None) -> Dict[str, Optional[OutputImage]]:
+    """ Obstacle image per rule name of one floor plan, and the overlap images of a persistent sink (see assess_plan). """
+    return assess_plan(result, output_dir=output_dir, rules=rules, sink=sink)[0]
+
+def assess_batch(results: List[Results], output_dir: Optional[Path], rules: List[Rule],
+                 executor: Optional[ProcessPoolExecutor] = None, sink: Optional[OutputSink] = None) -> List[Tuple[Dict[str, Optional[OutputImage]], Dict[str, Optional[dict]]]]:
+    """
+    Classifies and assesses one batch of detected floor plans, then releases their images.
+
+    Parameters:
+    - results (List[Results]): Detection results of the batch.
+    - output_dir (Optional[Path]): Where the rendered images go. Default is None (see get_output_sink).
+    - rules (List[Rule]): Rules to check.
+    - executor (Optional[ProcessPoolExecutor]): Pool of analysis processes. Default is None (this process).
+    - sink (Optional[OutputSink]): Destination of the rendered images, instead of output_dir. Default is None.
+
+    Returns:
+    - List[Tuple[Dict[str, Optional[OutputImage]], Dict[str, Optional[dict]]]]: assess_plan outputs, in the order of results.
+    """
+    # One batched orientation pass for every image and every class of the rule set, the rules only look the labels up
+    classify_orientations(results=results, model_path=CLASSIFY_MODEL_PATH,
+                          object_names=plan_classes(rules), batch_size=CLASSIFY_BATCH_SIZE, in_memory=IN_MEMORY_CROPS)
+
+    if executor is not None and len(results) > 1:
+        # Workers read the image from its path, only boxes and labels are pickled
+        plans = [PlanResult.from_results(result, keep_image=False) for result in results]
+        plan_outputs = list(executor.map(partial(assess_plan, output_dir=output_dir, rules=rules, sink=sink), plans))  # map keeps the input order
+    else:
+        plan_outputs = [assess_plan(result, output_dir=output_dir, rules=rules, sink=sink) for result in results]
+
+    # The analysis is done, the decoded image is not needed anymore
+    for result in results:
+        result.orig_img = None
+
+    return plan_outputs
+
+def iter_assessments(images_path: Union[Path, List[Path]], output_dir: Optional[Path] = None, rules: Optional[List[Rule]] = None,
+                     workers: Optional[int] = None, stream: Optional[bool] = None, batch_size: Optional[int] = None,
+                     yolo_project: Optional[Path] = None, sink: Optional[OutputSink] = None,
+                     tiled: Optional[bool] = None) -> Iterator[Tuple[PlanResult, Dict[str, Optional[OutputImage]], Dict[str, Optional[dict]]]]:
+    """
+    Detects and assesses every floor plan of a directory, yielding each plan as soon as its batch is done.
+
+    In stream mode the images are detected batch_size at a time and every batch is assessed before the
+    next one is read, so memory stays bounded by the batch size whatever the number of images.
+
+    Parameters:
+    - images_path (Union[Path, List[Path]]): Directory of the floor plans, or the image files.
+    - output_dir (Optional[Path]): Where the rendered images go. Default is None (see get_output_sink).
+    - rules (Optional[List[Rule]]): Rules to check. Default is None (DEFAULT_RULE_NAMES).
+    - workers (Optional[int]): Number of analysis processes, 1 runs in this process. The pool is only started
+                               for a batch of more than one plan (see ASSESS_WORKERS). Default is ASSESS_WORKERS.
+    - stream (Optional[bool]): Batch by batch detection. Default is STREAM_DETECTION.
+    - batch_size (Optional[int]): Images per batch in stream mode. Default is DETECT_BATCH_SIZE.
+    - yolo_project (Optional[Path]): Directory of the YOLO outputs. Default is None (ultralytics 'runs/detect').
+    - sink (Optional[OutputSink]): Destination of the rendered images, instead of output_dir. Default is None.
+    - tiled (Optional[bool]): Tile by tile detection (always batch by batch, nothing saved by YOLO). Default is TILED_DETECTION.
+
+    Returns:
+    - Iterator[Tuple[PlanResult, Dict[str, Optional[OutputImage]], Dict[str, Optional[dict]]]]: (plan without its image, outputs, summaries)
+                                                                                        per floor plan (see assess_plan).
+    """
+    workers = ASSESS_WORKERS if workers is None else workers
+    rules = get_rules(DEFAULT_RULE_NAMES) if rules is None else rules
+    stream = STREAM_DETECTION if stream is None else stream
+    batch_size = DETECT_BATCH_SIZE if batch_size is None else batch_size
+    tiled = TILED_DETECTION if tiled is None else tiled
+
+    # Object detection
+    if tiled:
+        batches = floor_plan_detect_tiled(images_path=images_path, model_path=DETECT_MODEL_PATH, batch_size=batch_size,
+                                          tile_size=TILE_SIZE, overlap=TILE_OVERLAP, tile_batch_size=TILE_BATCH_SIZE)
+    elif stream:
+        batches = floor_plan_detect_stream(images_path=images_path, model_path=DETECT_MODEL_PATH, batch_size=batch_size,
+                                           save_outputs=not IN_MEMORY_CROPS, project=yolo_project)
+    else:
+        results = floor_plan_detect(images_path=images_path, model_path=DETECT_MODEL_PATH,
+                                    save_outputs=not IN_MEMORY_CROPS, project=yolo_project)
+        batches = None if results is None else [results]
+    if batches is None:
+        return
+
+    executor = None
+    try:
+        for batch in batches:
+            if executor is None and workers > 1 and len(batch) > 1:
+                executor = ProcessPoolExecutor(max_workers=min(workers, len(batch)), mp_context=get_context(ASSESS_START_METHOD))
+            plan_outputs = assess_batch(batch, output_dir=output_dir, rules=rules, executor=executor, sink=sink)
+            plans = [PlanResult.from_results(result, keep_image=False) for result in batch]
+            del batch
+            for plan, (outputs, summaries) in zip(plans, plan_outputs):
+                yield plan, outputs, summaries
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+def result_cache_key(image: Union[Path, bytes], rules: List[Rule], tiled: Optional[bool] = None,
+                     sink: Optional[OutputSink] = None) -> str:
+    """
+    Result cache key of one plan: image content, both models and every setting that changes the outputs.
+    The cached images are encoded, so the output format and quality (of the sink, default OUTPUT_FORMAT / OUTPUT_QUALITY) are part of it,
+    and whether the overlap images are rendered (persistent sinks only, see assess_plan).
+    The orientations depend on the crops (in memory slices or re-encoded save_crop files, and their expansion).
+    """
+    tiled = TILED_DETECTION if tiled is None else tiled
+    sink = get_output_sink(sink=sink)
+    output_format, output_quality = sink.format, sink.quality
+    settings = {
+        'rules': [[rule.name, rule.objects_name, rule.orient_check, rule.overlap_threshold, rule.obstacle_threshold] for rule in rules],
+        'binarization_backend': obstacle_settings.BINARIZATION_BACKEND,
+        'tiles': [TILE_SIZE, TILE_OVERLAP] if tiled else None,
+        'crops': [IN_MEMORY_CROPS, classify_settings.CROP_GAIN, classify_settings.CROP_PAD],
+        'output': [output_format, output_quality, sink.persistent]
+    }
+    model_paths = [DETECT_MODEL_PATH, CLASSIFY_MODEL_PATH]
+    # Hashes recorded by the cache, plans already assessed are found even without the weights on disk
+    return make_key(image, model_paths, settings, model_hashes=get_result_cache().model_hashes(model_paths))
+
+def run(workers: Optional[int] = None, workspace: Optional[Workspace] = None, rules: Optional[List[Rule]] = None,
+        stream: Optional[bool] = None, batch_size: Optional[int] = None, sink: Optional[OutputSink] = None,
+        tiled: Optional[bool] = None):
     """
         Main function for Feng Shui conflict detection.
 
@@ -378,36 +800,85 @@ def run():
         2. Conflict Detection: Projects and compares the overlap between two objects to detect conflicts.
         3. Obstacle Detection: Checks for obstacles between the paths of two objects.
 
+        Step 2 and 3 are independent per floor plan and run in a process pool.
+        The images are detected and assessed batch by batch (see iter_assessments).
+
+        With a workspace every file of the request (inputs, YOLO save_dir, outputs) stays in it and
+        nothing shared is deleted. The models are shared by every call of the process, their predict calls
+        are serialized (see vision.registry.model_lock), so concurrent calls are safe but their detection and
+        classification run one after the other (a whole detection stream at a time). A server should use
+        fengshui.service.AssessmentService, which batches the inference of concurrent requests instead.
+        Without a workspace the shared 'images', 'runs' and 'fengshui/output' folders are cleaned and used
+        (one request at a time).
+        With the default OUTPUT_SINK ('memory') the rendered images are returned encoded and never written.
+
+        Args:
+            workers (Optional[int]): Number of analysis processes, 1 runs in this process. Default is ASSESS_WORKERS.
+            workspace (Optional[Workspace]): Private directories of this request. Default is None (shared folders).
+            rules (Optional[List[Rule]]): Rules to check (see fengshui.rules). Default is None (DEFAULT_RULE_NAMES).
+            stream (Optional[bool]): Batch by batch detection. Default is STREAM_DETECTION.
+            batch_size (Optional[int]): Images per batch in stream mode. Default is DETECT_BATCH_SIZE.
+            sink (Optional[OutputSink]): Destination of the rendered images. Default is None (OUTPUT_SINK).
+            tiled (Optional[bool]): Tile by tile detection of large scans. Default is TILED_DETECTION.
+
         Returns:
-            results: The results of the detection processes, including object locations, conflicts, and obstacles.
+            results: Obstacle images (EncodedImage or file path, see output_bytes) per rule name, in plan order.
+                     None if there is no images folder, or no detection model while a plan is not in the result cache.
     """
-    # Delete previous user data
-    clean_folder(YOLO_RESULTS_PATH)
-    clean_folder(OUTPUT_PATH)
-    if CLEAN_IMAGES_FOLDER :
-        clean_folder(IMAGES_PATH)
-    
-    # Object detection
-    results = floor_plan_detect(images_path=IMAGES_PATH, model_path=DETECT_MODEL_PATH)
-    
-    # Object to object analysis
-    door_to_door = ['door']
-    entrance_to_kitchen = ['entrance', 'kitchen']
-    orient_check = {'entrance': True, 'kitchen': False, 'door': True, 'window':True}
+    rules = get_rules(DEFAULT_RULE_NAMES) if rules is None else rules
+
+    if workspace is None:
+        # Delete previous user data
+        clean_folder(YOLO_RESULTS_PATH)
+        clean_folder(OUTPUT_PATH)
+        if CLEAN_IMAGES_FOLDER :
+            clean_folder(IMAGES_PATH)
+        images_path, yolo_project, output_dir = IMAGES_PATH, None, None
+    else:
+        images_path, yolo_project, output_dir = workspace.images_path, workspace.yolo_path, workspace.output_path
 
-    chatbot_images = {
-        'door_to_door':[],
-        'entrance_to_kitchen':[],
-    }
+    if sink is None:
+        sink = make_sink(OUTPUT_SINK, output_dir=OUTPUT_PATH if output_dir is None else output_dir,
+                         format=OUTPUT_FORMAT, quality=OUTPUT_QUALITY)
 
-    for result in results:
-        door_result = total_object_to_object(objects_name=door_to_door, result=result, orient_check=orient_check)
-        if door_result is not None:
-            chatbot_images['door_to_door'].append(door_result['image_path'])
-        
-        entr_result = total_object_to_object(objects_name=entrance_to_kitchen, result=result, orient_check=orient_check)
-        if entr_result is not None:
-            chatbot_images['entrance_to_kitchen'].append( entr_result['image_path'])
+    if not images_path.exists():
+        return None
+
+    # Plans already assessed with the same models and settings skip every model (no load at all when all hit,
+    # the weights are not even needed then)
+    plan_outputs = {}
+    keys = {}
+    sources = images_path
+    if USE_RESULT_CACHE:
+        result_cache = get_result_cache()
+        sources = []
+        for image_path in sorted(path for path in images_path.iterdir() if path.suffix.lower() in IMAGE_SUFFIXES):
+            path = str(image_path.absolute())  # As the result path of predict
+            keys[path] = result_cache_key(image_path, rules, tiled=tiled, sink=sink)
+            cached = result_cache.get(keys[path])
+            if cached is None:
+                sources.append(image_path)
+            else:
+                plan_outputs[path] = {rule_name: None if output is None else sink.put(output.name, output.data)
+                                      for rule_name, output in cached['outputs'].items()}  # Overlap images too (persistent sink)
+
+    if not USE_RESULT_CACHE or len(sources) > 0:
+        if not DETECT_MODEL_PATH.exists():
+            return None
+        for plan, outputs, summaries in iter_assessments(images_path=sources, rules=rules, workers=workers, stream=stream,
+                                                         batch_size=batch_size, yolo_project=yolo_project, sink=sink,
+                                                         tiled=tiled):
+            path = str(Path(plan.path).absolute())
+            plan_outputs[path] = outputs
+            if path in keys:
+                result_cache.put(keys[path], plan, outputs, summaries)
+
+    chatbot_images = {rule.name: [] for rule in rules}
+
+    for path in sorted(plan_outputs):
+        for key in chatbot_images:
+            if plan_outputs[path][key] is not None:
+                chatbot_images[key].append(plan_outputs[path][key])
     
     return  chatbot_images
 
@@ -1,9 +1,19 @@
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Sequence
+import sys
+
+import numpy as np
+
+# Orientation codes of the array based API (ItemSet, overlap batch functions), any other value is invalid
+ORIENTATION_CODES = {'vertical': 0, 'horizontal': 1}
+ORIENTATION_NAMES = {code: name for name, code in ORIENTATION_CODES.items()}
+INVALID_ORIENTATION_CODE = -1
 
 class Item:
     """
     Defines an object's name and its position on the floor plane for "overlap calculation" and "path obstacle detection".
     """
+    __slots__ = ('x1', 'y1', 'x2', 'y2', 'name', 'orientation')
+
     def __init__(self, x1= 0.0, y1= 0.0, x2= 0.0, y2= 0.0, name= None, orientation= None):
         self.x1 = x1
         self.y1 = y1
@@ -36,4 +46,110 @@ class Item:
             raise ValueError(f"Invalid orientation '{self.orientation}'. Orientation must be 'vertical' or 'horizontal'.")
 
     def __repr__(self):
-        return  f"Item ({self.x1}, {self.y1}, {self.x2}, {self.y2},'{self.name}', '{self.orientation}')"
\ No newline at end of file
+        return  f"Item ({self.x1}, {self.y1}, {self.x2}, {self.y2},'{self.name}', '{self.orientation}')"
+
+class ItemSet:
+    """
+    Columnar version of a list of Item: one coordinate array, interned class names and orientation codes.
+
+    Centers, both projections and both lengths are computed once for the whole set, so pair loops
+    only index arrays. 'with_orientation' returns a view sharing every array but the orientation
+    codes (no copy of the items). The default float32 coordinates hold detector outputs exactly
+    (YOLO boxes are float32), use dtype=np.float64 for arbitrary Python floats.
+    """
+    __slots__ = ('coords', 'name_codes', 'names', 'orientation_codes', 'centers', 'x_range', 'y_range', 'widths', 'heights')
+
+    def __init__(self, coords: np.ndarray, name_codes: np.ndarray, names: Sequence[Optional[str]],
+                 orientation_codes: np.ndarray, derived: Optional["ItemSet"] = None):
+        self.coords = coords
+        self.name_codes = name_codes
+        self.names = tuple(names)
+        self.orientation_codes = orientation_codes
+
+        if derived is not None:
+            # View: share the precomputed values of the same coordinates
+            self.centers, self.widths, self.heights = derived.centers, derived.widths, derived.heights
+            self.x_range, self.y_range = derived.x_range, derived.y_range
+            return
+
+        coords64 = coords.astype(np.float64)
+        # Same arithmetic as Item.get_center (int() truncates) and Item.get_length_value (round half to even)
+        self.centers = np.trunc((coords64[:, 0:2] + coords64[:, 2:4]) / 2).astype(np.int64)
+        self.widths = np.round(coords64[:, 2] - coords64[:, 0]).astype(np.int64)
+        self.heights = np.round(coords64[:, 3] - coords64[:, 1]).astype(np.int64)
+        self.x_range = coords[:, 0::2]  # [x1, x2] 'vertical' projection (view)
+        self.y_range = coords[:, 1::2]  # [y1, y2] 'horizontal' projection (view)
+
+    @classmethod
+    def from_items(cls, item_list: List[Item], dtype: type = np.float32) -> "ItemSet":
+        """
+        Builds the set from Item objects.
+
+        Parameters:
+        - item_list (List[Item]): The items.
+        - dtype (type): Coordinate dtype. Default is np.float32.
+
+        Returns:
+        - ItemSet: The columnar items.
+        """
+        coords = np.array([[item.x1, item.y1, item.x2, item.y2] for item in item_list], dtype=dtype).reshape(-1, 4)
+
+        names, name_index = [], {}
+        name_codes = np.empty(len(item_list), dtype=np.int16)
+        for index, item in enumerate(item_list):
+            name = sys.intern(item.name) if isinstance(item.name, str) else item.name
+            if name not in name_index:
+                name_index[name] = len(names)
+                names.append(name)
+            name_codes[index] = name_index[name]
+
+        orientation_codes = np.array([ORIENTATION_CODES.get(item.orientation, INVALID_ORIENTATION_CODE) for item in item_list],
+                                     dtype=np.int8)
+        return cls(coords=coords, name_codes=name_codes, names=names, orientation_codes=orientation_codes)
+
+    def to_items(self) -> List[Item]:
+        """ Converts back to Item objects (coordinates as Python floats). """
+        item_list = []
+        for (x1, y1, x2, y2), name_code, orientation_code in zip(self.coords.tolist(), self.name_codes.tolist(),
+                                                                 self.orientation_codes.tolist()):
+            item_list.append(Item(x1=x1, y1=y1, x2=x2, y2=y2, name=self.names[name_code],
+                                  orientation=ORIENTATION_NAMES.get(orientation_code)))
+        return item_list
+
+    def with_orientation(self, orientation: str) -> "ItemSet":
+        """
+        Same items with another orientation, sharing coordinates and precomputed values.
+
+        Parameters:
+        - orientation (str): 'vertical' or 'horizontal'.
+
+        Returns:
+        - ItemSet: The view.
+        """
+        code = ORIENTATION_CODES.get(orientation, INVALID_ORIENTATION_CODE)
+        orientation_codes = np.full(len(self), code, dtype=np.int8)
+        return ItemSet(coords=self.coords, name_codes=self.name_codes, names=self.names,
+                       orientation_codes=orientation_codes, derived=self)
+
+    def projections(self) -> np.ndarray:
+        """ (N, 2) [min, max] projection of each item in its own orientation (NaN for invalid orientation). """
+        vertical = (self.orientation_codes == ORIENTATION_CODES['vertical'])[:, None]
+        horizontal = (self.orientation_codes == ORIENTATION_CODES['horizontal'])[:, None]
+        return np.where(vertical, self.x_range, np.where(horizontal, self.y_range, np.nan))
+
+    def lengths(self) -> np.ndarray:
+        """ (N,) length of each item in its own orientation (-1 for invalid orientation). """
+        return np.select([self.orientation_codes == ORIENTATION_CODES['vertical'],
+                          self.orientation_codes == ORIENTATION_CODES['horizontal']],
+                         [self.widths, self.heights], default=-1)
+
+    def __len__(self):
+        return len(self.coords)
+
+    def __getitem__(self, index: int) -> Item:
+        x1, y1, x2, y2 = self.coords[index].tolist()
+        return Item(x1=x1, y1=y1, x2=x2, y2=y2, name=self.names[int(self.name_codes[index])],
+                    orientation=ORIENTATION_NAMES.get(int(self.orientation_codes[index])))
+
+    def __repr__(self):
+        return f"ItemSet ({len(self)} items, names={list(self.names)})"
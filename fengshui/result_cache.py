@@ -0,0 +1,268 @@
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+import hashlib
+import threading
+import shutil
+import json
+import time
+import uuid
+import os
+
+import numpy as np
+
+from metrics.metrics import inc
+from draw.output_sink import EncodedImage
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+
+RESULT_CACHE_PATH = ROOT / 'cache' / 'results'
+RESULT_CACHE_MAX_BYTES = 512 * 1024 * 1024 # Rendered images are most of an entry
+RESULT_CACHE_VERSION = 1 # Bump when the assessment output changes for the same inputs
+# {resolved weights path: sha256} of the weights last seen, the keys stay the same when the weights are not on disk
+MODEL_HASHES_FILE = 'models.json'
+MISSING_MODEL_HASH = 'missing'
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def bytes_sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def file_sha256(file_path: Path) -> str:
+    """ sha256 of a file, read by chunks. """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# {(resolved path, mtime ns, size): sha256} model weights are hashed once per process and version
+_MODEL_HASHES: Dict[Tuple, str] = {}
+_MODEL_HASHES_LOCK = threading.Lock()
+
+def model_sha256(model_path: Path) -> str:
+    """ sha256 of a weights file, memoized by path, modification time and size ('missing' if there is no file). """
+    model_path = Path(model_path).resolve()
+    if not model_path.exists():
+        return MISSING_MODEL_HASH
+    stat = os.stat(model_path)
+    key = (str(model_path), stat.st_mtime_ns, stat.st_size)
+    with _MODEL_HASHES_LOCK:
+        if key not in _MODEL_HASHES:
+            _MODEL_HASHES[key] = file_sha256(model_path)
+        return _MODEL_HASHES[key]
+
+def make_key(image: Union[Path, bytes], model_paths: List[Path], settings: Dict[str, Any],
+             model_hashes: Optional[List[str]] = None) -> str:
+    """
+    Content address of one assessment.
+
+    Parameters:
+    - image (Union[Path, bytes]): The floor plan file or its encoded bytes.
+    - model_paths (List[Path]): Weights files the result depends on.
+    - settings (Dict[str, Any]): JSON serializable settings (rules, thresholds, backends).
+    - model_hashes (Optional[List[str]]): Hashes of model_paths (see ResultCache.model_hashes). Default is None (model_sha256).
+
+    Returns:
+    - str: sha256 hex digest.
+    """
+    image_hash = bytes_sha256(image) if isinstance(image, (bytes, bytearray)) else file_sha256(image)
+    content = {
+        'version': RESULT_CACHE_VERSION,
+        'image': image_hash,
+        'models': [model_sha256(model_path) for model_path in model_paths] if model_hashes is None else list(model_hashes),
+        'settings': settings
+    }
+    return bytes_sha256(json.dumps(content, sort_keys=True).encode())
+
+
+class ResultCache:
+    """
+    On-disk cache of whole assessments, addressed by make_key.
+
+    One directory per entry holds the boxes and orientation labels ('plan.npz'), the rule outputs and
+    the compact overlap / obstacle results ('meta.json') and the rendered images. Entries are written
+    to a temporary directory and renamed, so readers never see half an entry. The least recently used
+    entries are removed when the cache grows over max_bytes.
+
+    The size of the cache is scanned once at start, then kept as a running total of the stored entries,
+    the directory is only scanned again when the total goes over max_bytes (entries stored by other
+    processes are counted at that point).
+    """
+    def __init__(self, cache_dir: Path = RESULT_CACHE_PATH, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total_bytes = sum(size for _, size, _ in self.entries())
+
+    def entry_dir(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / key
+
+    def get(self, key: str, output_dir: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+        """
+        Look an assessment up.
+
+        Parameters:
+        - key (str): From make_key.
+        - output_dir (Optional[Path]): Write the rendered images there. Default is None (EncodedImage in memory).
+
+        Returns:
+        - Optional[Dict[str, Any]]: None on a miss (also when the entry is evicted while being read), otherwise
+            'outputs' (Dict[str, Optional[Union[EncodedImage, Path]]], image per rule name like assess_one_result),
+            'summaries' (compact overlap / obstacle results per rule name),
+            'boxes' (xyxy, cls, conf arrays), 'names' and 'orientation_labels'.
+        """
+        entry_dir = self.entry_dir(key)
+        meta_path = entry_dir / 'meta.json'
+        try:
+            meta = json.loads(meta_path.read_text())
+            with np.load(entry_dir / 'plan.npz') as plan:
+                boxes = {name: plan[name] for name in ('xyxy', 'cls', 'conf')}
+                labels = plan['labels'].tolist()
+            # Read now: once get returns, the entry may be evicted by another thread or process
+            images = {rule_name: None if file_name is None else EncodedImage(file_name, (entry_dir / file_name).read_bytes())
+                      for rule_name, file_name in meta['outputs'].items()}
+            os.utime(meta_path)  # Recently used
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            inc('cache_requests_total', cache='result', result='miss')
+            return None
+
+        outputs = images
+        if output_dir is not None:
+            outputs = {rule_name: None if image is None else image.write(output_dir) for rule_name, image in images.items()}
+
+        with self._lock:
+            self.hits += 1
+        inc('cache_requests_total', cache='result', result='hit')
+        return {
+            'outputs': outputs,
+            'summaries': meta['summaries'],
+            'boxes': boxes,
+            'names': {int(cls_id): name for cls_id, name in meta['names'].items()},
+            'orientation_labels': [label if label != '' else None for label in labels]
+        }
+
+    def put(self, key: str, plan, outputs: Dict[str, Any], summaries: Dict[str, Any]):
+        """
+        Store one assessment.
+
+        Parameters:
+        - key (str): From make_key.
+        - plan (PlanResult): Detection result of the plan (boxes, names and orientation labels).
+        - outputs (Dict[str, Optional[Union[Path, EncodedImage]]]): Rendered image per rule name (assess_one_result),
+                                                                   a file or an in-memory draw.output_sink.EncodedImage.
+        - summaries (Dict[str, Any]): JSON serializable results per rule name.
+        """
+        entry_dir = self.entry_dir(key)
+        if entry_dir.exists():
+            return
+
+        temp_dir = self.cache_dir / f".tmp_{uuid.uuid4().hex}"
+        temp_dir.mkdir(parents=True)
+        try:
+            labels = getattr(plan, 'orientation_labels', None) or [None] * len(plan.boxes)
+            np.savez_compressed(temp_dir / 'plan.npz', xyxy=plan.boxes.xyxy, cls=plan.boxes.cls, conf=plan.boxes.conf,
+                                labels=np.array(['' if label is None else label for label in labels], dtype=str))
+
+            output_names = {}
+            for rule_name, output_path in outputs.items():
+                if output_path is None:
+                    output_names[rule_name] = None
+                    continue
+                file_name = Path(output_path).name if isinstance(output_path, (str, Path)) else output_path.name
+                if file_name in output_names.values():
+                    file_name = f"{rule_name}_{file_name}"  # Rules with the same classes
+                output_names[rule_name] = file_name
+                if isinstance(output_path, (str, Path)):
+                    shutil.copyfile(output_path, temp_dir / file_name)
+                else:  # EncodedImage
+                    (temp_dir / file_name).write_bytes(output_path.data)
+
+            meta = {'outputs': output_names, 'summaries': summaries,
+                    'names': {str(cls_id): name for cls_id, name in plan.names.items()}, 'created': time.time()}
+            (temp_dir / 'meta.json').write_text(json.dumps(meta))
+            size = sum(file.stat().st_size for file in temp_dir.iterdir())
+
+            entry_dir.parent.mkdir(parents=True, exist_ok=True)
+            os.rename(temp_dir, entry_dir)
+        except OSError:
+            # Another process stored the same key first
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            return
+
+        with self._lock:
+            self._total_bytes += size
+            over = self._total_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def entries(self) -> List[Tuple[float, int, Path]]:
+        """ (last use time, size in bytes, directory) of every entry. """
+        entries = []
+        for entry_dir in self.cache_dir.glob('*/*'):
+            meta_path = entry_dir / 'meta.json'
+            if not meta_path.exists():
+                continue
+            size = sum(file.stat().st_size for file in entry_dir.iterdir())
+            entries.append((meta_path.stat().st_mtime, size, entry_dir))
+        return entries
+
+    def model_hashes(self, model_paths: List[Path]) -> List[str]:
+        """
+        model_sha256 of the weights files. The hash of every file found is recorded in the cache (MODEL_HASHES_FILE),
+        a missing file gets the hash it had when last seen, so the stored assessments are still found without the weights.
+
+        Parameters:
+        - model_paths (List[Path]): Weights files.
+
+        Returns:
+        - List[str]: sha256 per file, MISSING_MODEL_HASH for a file never seen.
+        """
+        names = [str(Path(model_path).resolve()) for model_path in model_paths]
+        hashes = [model_sha256(model_path) for model_path in model_paths]
+        hashes_path = self.cache_dir / MODEL_HASHES_FILE
+        with self._lock:
+            try:
+                known = json.loads(hashes_path.read_text())
+            except (OSError, ValueError):
+                known = {}
+            seen = {name: model_hash for name, model_hash in zip(names, hashes) if model_hash != MISSING_MODEL_HASH}
+            if any(known.get(name) != model_hash for name, model_hash in seen.items()):
+                known.update(seen)
+                try:
+                    self.cache_dir.mkdir(parents=True, exist_ok=True)
+                    temp_path = self.cache_dir / f".tmp_{uuid.uuid4().hex}.json"
+                    temp_path.write_text(json.dumps(known))
+                    os.replace(temp_path, hashes_path)
+                except OSError:
+                    pass  # Not recorded, only a later run without the weights misses
+        return [known.get(name, model_hash) if model_hash == MISSING_MODEL_HASH else model_hash
+                for name, model_hash in zip(names, hashes)]
+
+    def evict(self):
+        """ Remove the least recently used entries until the cache fits in max_bytes (scans the whole cache). """
+        with self._lock:
+            entries = sorted(self.entries(), key=lambda entry: entry[0])
+            total = sum(size for _, size, _ in entries)
+            for _, size, entry_dir in entries:
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                total -= size
+            self._total_bytes = total
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        with self._lock:
+            self._total_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        entries = self.entries()
+        return {'entries': len(entries), 'bytes': sum(size for _, size, _ in entries), 'hits': self.hits, 'misses': self.misses}
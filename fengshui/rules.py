@@ -0,0 +1,100 @@
+from typing import List, Optional, Dict, Tuple
+
+# Default thresholds (same values as fengshui.assessment)
+OVERLAP_THRESHOLD_DEFAULT = 0.5 # 50% overlap range
+OBSTACLE_THRESHOLD_DEFAULT = 0.5 # 50%
+
+
+def overlap_key(objects_name: List[str], orient_check: Dict[str, bool], overlap_threshold: float) -> Tuple:
+    """ Checks with the same key share the same (unfiltered) overlap results (see PlanContext.overlaps). """
+    return (tuple(objects_name),
+            tuple(orient_check[object_name] for object_name in objects_name),
+            overlap_threshold > 0)
+
+class Rule:
+    """
+    Declarative object to object Feng Shui check.
+
+    - name (str): Key of the rule in the results, e.g. 'door_to_door'.
+    - objects_name (List[str]): One class (pairs inside the class) or two classes (pairs across them).
+    - orient_check (Dict[str, bool]): Per class, True uses the classified orientation,
+                                      False tries both orientations.
+    - overlap_threshold (float): Minimum projection overlap rate (or full coverage) of a pair.
+    - obstacle_threshold (float): Maximum obstacle rate of a pair to be reported.
+
+    Example:
+    register_rule(Rule(name='bed_to_door', objects_name=['bed', 'door'], orient_check={'bed': False, 'door': True}))
+    """
+    def __init__(self, name: str, objects_name: List[str], orient_check: Dict[str, bool],
+                 overlap_threshold: float = OVERLAP_THRESHOLD_DEFAULT,
+                 obstacle_threshold: float = OBSTACLE_THRESHOLD_DEFAULT):
+        if len(objects_name) not in (1, 2):
+            raise ValueError(f"Rule '{name}' must name 1 or 2 classes, got {objects_name}.")
+        for object_name in objects_name:
+            if object_name not in orient_check:
+                raise ValueError(f"Rule '{name}' has no orientation policy for '{object_name}'.")
+
+        self.name = name
+        self.objects_name = list(objects_name)
+        self.orient_check = {object_name: orient_check[object_name] for object_name in objects_name}
+        self.overlap_threshold = overlap_threshold
+        self.obstacle_threshold = obstacle_threshold
+
+    def overlap_key(self) -> Tuple:
+        """ Rules with the same key share the same (unfiltered) overlap results. """
+        return overlap_key(self.objects_name, self.orient_check, self.overlap_threshold)
+
+    def __repr__(self):
+        return f"Rule ('{self.name}', {self.objects_name}, {self.orient_check})"
+
+
+RULE_REGISTRY: Dict[str, Rule] = {}
+
+def register_rule(rule: Rule) -> Rule:
+    """ Adds (or replaces) a rule by its name. """
+    RULE_REGISTRY[rule.name] = rule
+    return rule
+
+def get_rules(names: Optional[List[str]] = None) -> List[Rule]:
+    """
+    Rules by name, in the given order.
+
+    Parameters:
+    - names (Optional[List[str]]): Rule names. Default is None (every registered rule, registration order).
+
+    Returns:
+    - List[Rule]: The rules.
+    """
+    if names is None:
+        return list(RULE_REGISTRY.values())
+    return [RULE_REGISTRY[name] for name in names]
+
+def plan_classes(rules: List[Rule]) -> List[str]:
+    """ Every class the rule set reads, each once (classify / extract them once per floor plan). """
+    object_names = []
+    for rule in rules:
+        for object_name in rule.objects_name:
+            if object_name not in object_names:
+                object_names.append(object_name)
+    return object_names
+
+
+class PlanContext:
+    """
+    Work shared by all the rules of one floor plan: items of each class, overlap results
+    of each (classes, orientation policy), obstacle results of each pair, orientation and scan settings,
+    the renderer holding the decoded plan (draw.draw_item.PlanRenderer) and the overlap images saved so far.
+    """
+    def __init__(self):
+        self.items: Dict[str, Optional[list]] = {}
+        self.overlaps: Dict[Tuple, list] = {}
+        self.obstacles: Dict[Tuple, dict] = {}
+        self.renderer = None
+        self.overlap_images: list = []
+
+
+register_rule(Rule(name='door_to_door', objects_name=['door'], orient_check={'door': True}))
+register_rule(Rule(name='entrance_to_kitchen', objects_name=['entrance', 'kitchen'], orient_check={'entrance': True, 'kitchen': False}))
+
+# Rules of run() when none are given
+DEFAULT_RULE_NAMES = ['door_to_door', 'entrance_to_kitchen']
@@ -0,0 +1,302 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Union
+from pathlib import Path
+import contextvars
+import logging
+import asyncio
+import time
+import sys
+import os
+
+import numpy as np
+import cv2
+
+# Path arrangement
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+sys.path.insert(0, str(ROOT))   # for import moduls
+
+from fengshui.assessment import DETECT_MODEL_PATH, CLASSIFY_MODEL_PATH, CLASSIFY_BATCH_SIZE
+from fengshui.assessment import load_models, assess_plan
+from fengshui.assessment import get_result_cache, result_cache_key
+from fengshui.assessment import OUTPUT_FORMAT, OUTPUT_QUALITY
+from fengshui.assessment import TILED_DETECTION, TILE_SIZE, TILE_OVERLAP, TILE_BATCH_SIZE
+from fengshui.rules import Rule, get_rules, plan_classes, DEFAULT_RULE_NAMES
+from fengshui.workspace import Workspace
+from vision.classify import classify_orientations
+from vision.registry import get_model, model_lock
+from vision.plan_result import PlanResult
+from vision.batching import MicroBatcher
+from vision.tiling import detect_tiled
+from draw.output_sink import MemorySink, OutputImage, output_bytes
+from metrics.metrics import span, inc, trace
+
+logger = logging.getLogger(__name__)
+
+# Requests analysed at the same time (each one holds a decoded plan in memory)
+SERVICE_MAX_CONCURRENT = 8
+# Requests accepted but still waiting for a slot, more are rejected with ServiceBusy
+SERVICE_MAX_PENDING = 32
+# Seconds for one request, from submission to result
+SERVICE_TIMEOUT = 60.0
+# Threads of the CPU stages (decode, overlap, obstacles, drawing)
+SERVICE_CPU_WORKERS = os.cpu_count() or 1
+# Detection micro batches: plans of concurrent requests share one predict call
+SERVICE_DETECT_BATCH_SIZE = 8
+SERVICE_DETECT_MAX_WAIT_MS = 10.0
+
+
+class ServiceBusy(Exception):
+    """ Raised by AssessmentService.assess when the pending queue is full (backpressure). """
+
+
+def decode_image(image_path: Path) -> np.ndarray:
+    """ Decode the floor plan once (BGR, as ultralytics loads it). """
+    image = cv2.imdecode(np.fromfile(str(image_path), dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Failed to load image from {image_path}")
+    return image
+
+def detect_images(images: List[np.ndarray]) -> list:
+    """ One detection call for a micro batch of decoded floor plans. """
+    with span('detection'), model_lock(DETECT_MODEL_PATH):
+        results = get_model(DETECT_MODEL_PATH).predict(images, verbose=False)
+    inc('images_detected_total', len(images))
+    return results
+
+def detect_tiles(tiles: List[np.ndarray]) -> list:
+    """ One detection call for a micro batch of tiles (of one or more plans), at the tile resolution. """
+    with span('detection'), model_lock(DETECT_MODEL_PATH):
+        return get_model(DETECT_MODEL_PATH).predict(tiles, imgsz=TILE_SIZE, verbose=False)
+
+def to_plan(result, image_path: Path) -> PlanResult:
+    """ Detection result of one plan, keeping the image and pointing to its file. """
+    plan = PlanResult.from_results(result, keep_image=True)
+    plan.path = str(image_path)  # The assessment reads the plan file again (binarization)
+    return plan
+
+def classify_plan(plan: PlanResult, rules: List[Rule]):
+    """ Orientation labels of every box the rules need. """
+    classify_orientations(results=[plan], model_path=CLASSIFY_MODEL_PATH,
+                          object_names=plan_classes(rules), batch_size=CLASSIFY_BATCH_SIZE)
+
+def read_outputs(outputs: Dict[str, Optional[OutputImage]]) -> Dict[str, Optional[bytes]]:
+    return {name: None if output is None else output_bytes(output) for name, output in outputs.items()}
+
+def cached_outputs(image_path: Path, rules: List[Rule], tiled: Optional[bool] = None) -> Tuple[str, Optional[Dict[str, Optional[bytes]]]]:
+    """ (result cache key, encoded images of a previous assessment of the same plan or None). """
+    key = result_cache_key(image_path, rules, tiled=tiled)
+    cached = get_result_cache().get(key)
+    return key, None if cached is None else read_outputs(cached['outputs'])
+
+def analyse_plan(plan: PlanResult, rules: List[Rule], cache_key: Optional[str] = None) -> Dict[str, Optional[bytes]]:
+    """ Overlap, obstacle and drawing stages, returns the encoded image of each rule (None if nothing was found). """
+    # Encoded in memory, the images are not written to the workspace and read back
+    outputs, summaries = assess_plan(plan, rules=rules, sink=MemorySink(format=OUTPUT_FORMAT, quality=OUTPUT_QUALITY))
+    plan.orig_img = None  # Analysis done, release the decoded image
+    if cache_key is not None:
+        get_result_cache().put(cache_key, plan, outputs, summaries)
+    return read_outputs(outputs)
+
+
+class AssessmentService:
+    """
+    Asyncio entry point of the assessment for a chatbot server.
+
+    Detection goes through a MicroBatcher (the plans of concurrent requests share one predict call),
+    orientation classification runs on one inference thread (one shared, warm model per weights file, a YOLO
+    predictor is not thread-safe), decoding, overlap, obstacles and drawing run on a CPU thread pool,
+    so the CPU stages of some requests overlap with the inference of others.
+    At most max_concurrent requests are analysed at once, max_pending more may wait for a slot and
+    the next ones are rejected at once with ServiceBusy. Each request has its own Workspace.
+
+    In tiled mode (large scans, see vision.tiling) every tile is submitted to the MicroBatcher on its own,
+    so the tiles of one plan and those of concurrent requests share the predict calls.
+
+    With metrics enabled (metrics.metrics.enable()) the stage spans of each request are collected and logged
+    at debug level, and metrics.metrics.METRICS.to_prometheus() can back a /metrics endpoint.
+
+    Note: a timed out request stops waiting, but a stage already running in a thread finishes in the background,
+    the workspace of the request is removed once it is done.
+
+    Example:
+    async with AssessmentService() as service:
+        images = await service.assess(upload_bytes, 'plan.jpg')   # {'door_to_door': b'...', ...}
+    """
+    def __init__(self,
+                 max_concurrent: int = SERVICE_MAX_CONCURRENT,
+                 max_pending: int = SERVICE_MAX_PENDING,
+                 timeout: Optional[float] = SERVICE_TIMEOUT,
+                 cpu_workers: int = SERVICE_CPU_WORKERS,
+                 rules: Optional[List[Rule]] = None,
+                 base_dir: Optional[Path] = None,
+                 detect_batch_size: int = SERVICE_DETECT_BATCH_SIZE,
+                 detect_max_wait_ms: float = SERVICE_DETECT_MAX_WAIT_MS,
+                 use_cache: bool = True,
+                 tiled: bool = TILED_DETECTION):
+        self.max_concurrent = max_concurrent
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.rules = get_rules(DEFAULT_RULE_NAMES) if rules is None else rules
+        self.base_dir = base_dir
+        self.use_cache = use_cache
+        self.tiled = tiled
+
+        self._inference_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='fengshui-inference')
+        self._cpu_executor = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix='fengshui-cpu')
+        self._detector = MicroBatcher(detect_tiles if tiled else detect_images, max_batch_size=detect_batch_size, max_wait_ms=detect_max_wait_ms)
+        self._slots = None  # asyncio.Semaphore, created in the running loop
+        self._admitted = 0 # Waiting or active requests
+        self._active = 0
+        self.counters = {'completed': 0, 'failed': 0, 'rejected': 0, 'timeouts': 0}
+
+    async def start(self):
+        """ Loads and warms up the models once, before the first request. """
+        await asyncio.get_running_loop().run_in_executor(self._inference_executor, load_models)
+
+    async def close(self):
+        """ Waits for the running stages and stops the threads. """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._detector.close)
+        await loop.run_in_executor(None, self._inference_executor.shutdown)
+        await loop.run_in_executor(None, self._cpu_executor.shutdown)
+
+    async def __aenter__(self) -> "AssessmentService":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """ Waiting and active requests, the request counters and the detection batches (MicroBatcher.stats). """
+        return {'waiting': self._admitted - self._active, 'active': self._active, **self.counters,
+                'detection': self._detector.stats()}
+
+    async def assess(self, source: Union[Path, bytes], file_name: Optional[str] = None,
+                     timeout: Optional[float] = None) -> Dict[str, Optional[bytes]]:
+        """
+        Assess one floor plan.
+
+        Parameters:
+        - source (Union[Path, bytes]): Image file or encoded image bytes (e.g. a chat upload).
+        - file_name (Optional[str]): Name of the plan (used in the output names). Default is None.
+        - timeout (Optional[float]): Seconds for this request. Default is the service timeout.
+
+        Returns:
+        - Dict[str, Optional[bytes]]: Encoded result image per rule name, None if nothing was found.
+
+        Raises:
+        - ServiceBusy: Too many requests are already waiting.
+        - asyncio.TimeoutError: The request took longer than the timeout.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+
+        # Admission is decided before the first await, so a burst of requests sees the queue fill up
+        if self._admitted >= self.max_concurrent + self.max_pending:
+            self.counters['rejected'] += 1
+            inc('requests_total', status='rejected')
+            raise ServiceBusy(f"{self._admitted - self._active} requests are already waiting.")
+
+        timeout = self.timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+
+        self._admitted += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=timeout)
+            self._active += 1
+            try:
+                remaining = None if deadline is None else max(deadline - loop.time(), 0)
+                outputs = await asyncio.wait_for(self._assess(source, file_name), timeout=remaining)
+            finally:
+                self._active -= 1
+                self._slots.release()
+        except asyncio.TimeoutError:
+            self.counters['timeouts'] += 1
+            inc('requests_total', status='timeout')
+            raise
+        except Exception:
+            self.counters['failed'] += 1
+            inc('requests_total', status='failed')
+            raise
+        finally:
+            self._admitted -= 1
+        self.counters['completed'] += 1
+        inc('requests_total', status='completed')
+        return outputs
+
+    def _submit(self, executor: ThreadPoolExecutor, function, *args) -> Future:
+        # run_in_executor does not carry the context, the stage spans would miss the trace of the request
+        context = contextvars.copy_context()
+        return executor.submit(context.run, function, *args)
+
+    def _run(self, executor: ThreadPoolExecutor, function, *args) -> asyncio.Future:
+        return asyncio.wrap_future(self._submit(executor, function, *args))
+
+    def _predict_tiles(self, tiles: List[np.ndarray]) -> list:
+        futures = [self._detector.submit(tile) for tile in tiles]
+        return [future.result() for future in futures]
+
+    async def _assess(self, source: Union[Path, bytes], file_name: Optional[str]) -> Dict[str, Optional[bytes]]:
+        with trace(file_name or 'upload') as request_trace, span('request'):
+            try:
+                return await self._assess_stages(source, file_name)
+            finally:
+                if request_trace.spans:
+                    logger.debug("request %s: %.1f ms, %s", request_trace.name, (time.perf_counter() - request_trace.start) * 1000,
+                                 {stage: round(seconds * 1000, 1) for stage, seconds in request_trace.totals().items()})
+
+    async def _assess_stages(self, source: Union[Path, bytes], file_name: Optional[str]) -> Dict[str, Optional[bytes]]:
+        workspace = Workspace(base_dir=self.base_dir)
+        stage = None  # Thread stage of this request (the stages run one after the other)
+
+        def run_stage(executor: ThreadPoolExecutor, function, *args) -> asyncio.Future:
+            nonlocal stage
+            stage = self._submit(executor, function, *args)
+            return asyncio.wrap_future(stage)
+
+        try:
+            image_path = await run_stage(self._cpu_executor, workspace.add_image, source, file_name)
+
+            # A plan assessed before (same content, models and rules) is answered from the result cache
+            cache_key = None
+            if self.use_cache:
+                cache_key, outputs = await run_stage(self._cpu_executor, cached_outputs, image_path, self.rules, self.tiled)
+                if outputs is not None:
+                    return outputs
+
+            image = await run_stage(self._cpu_executor, decode_image, image_path)
+
+            with span('detection_wait'):
+                if self.tiled:
+                    # Waits for the tiles on a CPU thread, TILE_BATCH_SIZE tiles of this plan are queued at a time
+                    plan = await run_stage(self._cpu_executor, detect_tiled, image, self._predict_tiles, str(image_path),
+                                           TILE_SIZE, TILE_OVERLAP, TILE_BATCH_SIZE)
+                else:
+                    result = await asyncio.wrap_future(self._detector.submit(image))
+                    plan = to_plan(result, image_path)
+            await run_stage(self._inference_executor, classify_plan, plan, self.rules)
+
+            return await run_stage(self._cpu_executor, analyse_plan, plan, self.rules, cache_key)
+        finally:
+            if stage is not None and not stage.done():
+                # Cancelled (timeout) while a stage still uses the files: remove them when it is done,
+                # in its thread, so the timed out request returns at once
+                stage.add_done_callback(lambda _: workspace.cleanup())
+            else:
+                # Shielded, a cancellation arriving now does not skip the cleanup
+                await asyncio.shield(self._run(self._cpu_executor, workspace.cleanup))
+
+
+if __name__ == "__main__":
+
+    async def main(image_paths: List[Path]):
+        async with AssessmentService() as service:
+            outputs = await asyncio.gather(*[service.assess(image_path) for image_path in image_paths], return_exceptions=True)
+            for image_path, output in zip(image_paths, outputs):
+                print(image_path.name, output if isinstance(output, Exception) else {name: image is not None for name, image in output.items()})
+            print(service.stats())
+
+    asyncio.run(main(sorted((ROOT / 'images').glob('*.jpg'))))
@@ -0,0 +1,87 @@
+from pathlib import Path, PureWindowsPath
+from typing import Optional, Union
+import tempfile
+import shutil
+import uuid
+
+
+def safe_file_name(file_name: str) -> str:
+    """
+    Last component of a user supplied file name, so it can not point outside a directory.
+
+    Parameters:
+    - file_name (str): Name of an upload, e.g. '../../plan.jpg' or 'C:\\plans\\plan.jpg'.
+
+    Returns:
+    - str: The bare name ('plan.jpg').
+
+    Raises:
+    - ValueError: If nothing usable is left ('', '.', '..').
+    """
+    name = PureWindowsPath(file_name).name  # Splits on '/' and '\\', drops drives and roots
+    if name in ('', '.', '..'):
+        raise ValueError(f"Invalid image file name '{file_name}'.")
+    return name
+
+
+class Workspace:
+    """
+    Private directories of one request: input images, YOLO save_dir and rendered outputs.
+
+    Every request gets its own temporary root, so concurrent requests in one process never
+    read or delete each other's files. Use it as a context manager, the whole root is removed
+    on exit (read the outputs before leaving the block).
+
+    Example:
+    with Workspace() as workspace:
+        workspace.add_image(upload_bytes, 'plan.jpg')
+        chatbot_images = run(workspace=workspace)
+    """
+    def __init__(self, base_dir: Optional[Path] = None, keep: bool = False):
+        if base_dir is not None:
+            Path(base_dir).mkdir(parents=True, exist_ok=True)
+        self.root = Path(tempfile.mkdtemp(prefix='fengshui_', dir=base_dir))
+        self.images_path = self.root / 'images'
+        self.yolo_path = self.root / 'runs'
+        self.output_path = self.root / 'output'
+        self.keep = keep
+
+        self.images_path.mkdir()
+        self.output_path.mkdir()
+
+    def add_image(self, source: Union[Path, bytes], file_name: Optional[str] = None) -> Path:
+        """
+        Puts one floor plan into the workspace inputs.
+
+        Parameters:
+        - source (Union[Path, bytes]): Image file to copy, or the encoded image bytes.
+        - file_name (Optional[str]): Name inside the workspace, only its last component is used (see safe_file_name).
+                                     Default is the source name (or a random .jpg name for bytes).
+
+        Returns:
+        - Path: Path of the image inside the workspace.
+
+        Raises:
+        - ValueError: If file_name has no usable name.
+        """
+        if isinstance(source, (bytes, bytearray)):
+            file_path = self.images_path / (f"{uuid.uuid4().hex}.jpg" if file_name is None else safe_file_name(file_name))
+            file_path.write_bytes(source)
+        else:
+            file_path = self.images_path / safe_file_name(Path(source).name if file_name is None else file_name)
+            shutil.copyfile(source, file_path)
+        return file_path
+
+    def cleanup(self):
+        """ Removes the whole workspace (no-op when keep is True). """
+        if not self.keep:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    def __enter__(self) -> "Workspace":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()
+
+    def __repr__(self):
+        return f"Workspace ('{self.root}')"
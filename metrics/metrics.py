@@ -0,0 +1,234 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from contextlib import contextmanager
+import contextvars
+import threading
+import bisect
+import json
+import math
+import time
+
+# Off by default: every hook is one attribute check, turn on with enable() (server start-up, benchmarks)
+METRICS_ENABLED = False
+
+# Prefix of the exported metric names
+METRICS_NAMESPACE = 'fengshui'
+
+# Upper bounds (seconds) of the span histograms, +Inf is added on export
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Histogram of every span, labelled by stage
+SPAN_METRIC = 'stage_seconds'
+
+
+class Histogram:
+    """ Count of the observed values per bucket (not cumulative), their sum and count. """
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # Last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[float, int]]:
+        """ (upper bound, observations <= bound) per bucket, Prometheus style. """
+        total, result = 0, []
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class RequestTrace:
+    """ Spans recorded while the trace is active in the current context, e.g. one service request. """
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.spans: List[Tuple[str, float, float]] = []  # (stage, start offset, seconds)
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, start: float, seconds: float):
+        with self._lock:
+            self.spans.append((stage, start - self.start, seconds))
+
+    def totals(self) -> Dict[str, float]:
+        """ Seconds per stage, slowest first. """
+        totals: Dict[str, float] = {}
+        for stage, _, seconds in self.spans:
+            totals[stage] = totals.get(stage, 0.0) + seconds
+        return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+_CURRENT_TRACE: contextvars.ContextVar = contextvars.ContextVar('fengshui_trace', default=None)
+
+
+class _Span:
+    __slots__ = ('registry', 'stage', 'labels', 'start')
+
+    def __init__(self, registry: "MetricsRegistry", stage: str, labels: Dict[str, Any]):
+        self.registry = registry
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        seconds = time.perf_counter() - self.start
+        self.registry.observe(SPAN_METRIC, seconds, stage=self.stage, **self.labels)
+        if exc_type is not None:
+            self.registry.inc('stage_errors_total', stage=self.stage)
+        trace = _CURRENT_TRACE.get()
+        if trace is not None:
+            trace.add(self.stage, self.start, seconds)
+        return False
+
+class _NullSpan:
+    """ Shared span of a disabled registry: no clock read, no allocation. """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+
+class MetricsRegistry:
+    """
+    Counters, histograms and timing spans of the pipeline, exported as JSON or Prometheus text.
+
+    Every metric is identified by its name and labels. When the registry is disabled, inc / observe
+    return at once and span returns a shared no-op context manager.
+    Note: metrics recorded in worker processes (run() with workers > 1) stay in those processes, the stage spans
+    of the analysis (overlap, obstacle, drawing) are then missing here.
+
+    Example:
+    with span('binarization', backend='exact'):
+        floor_plan = floor_plan_binarization(image_path)
+    inc('pairs_evaluated_total', len(pairs), rule='door_to_door')
+    print(METRICS.to_prometheus())
+    """
+    def __init__(self, enabled: bool = METRICS_ENABLED, namespace: str = METRICS_NAMESPACE):
+        self.enabled = enabled
+        self.namespace = namespace
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._histograms: Dict[Tuple[str, Tuple], Histogram] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]) -> Tuple[str, Tuple]:
+        return (name, tuple(sorted((key, str(value)) for key, value in labels.items())))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """ Adds value to a counter. """
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **labels):
+        """ Records one value in a histogram (buckets are fixed by the first observation). """
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def span(self, stage: str, **labels):
+        """ Context manager timing a stage into the SPAN_METRIC histogram (and the current RequestTrace). """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, stage, labels)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns:
+        - Dict[str, Any]: {'counters': [{'name', 'labels', 'value'}], 'histograms': [{'name', 'labels', 'count', 'sum', 'buckets'}]}.
+        """
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = [{'name': name, 'labels': dict(labels), 'count': histogram.count, 'sum': histogram.sum,
+                           'buckets': [['+Inf' if bound == math.inf else bound, count] for bound, count in histogram.cumulative()]}
+                          for (name, labels), histogram in sorted(self._histograms.items())]
+        return {'counters': counters, 'histograms': histograms}
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot())
+
+    def to_prometheus(self) -> str:
+        """ Prometheus text exposition format (version 0.0.4). """
+        def label_text(labels: Dict[str, str], extra: Optional[Tuple[str, str]] = None) -> str:
+            pairs = list(labels.items()) + ([extra] if extra is not None else [])
+            if len(pairs) == 0:
+                return ''
+            escaped = [(key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for key, value in pairs]
+            return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+        snapshot = self.snapshot()
+        lines, typed = [], set()
+        for counter in snapshot['counters']:
+            name = f"{self.namespace}_{counter['name']}"
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{label_text(counter['labels'])} {counter['value']}")
+        for histogram in snapshot['histograms']:
+            name = f"{self.namespace}_{histogram['name']}"
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            for bound, count in histogram['buckets']:
+                lines.append(f"{name}_bucket{label_text(histogram['labels'], ('le', str(bound)))} {count}")
+            lines.append(f"{name}_sum{label_text(histogram['labels'])} {histogram['sum']}")
+            lines.append(f"{name}_count{label_text(histogram['labels'])} {histogram['count']}")
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+# Process-wide registry used by the hooks of every module
+METRICS = MetricsRegistry()
+
+def enable(enabled: bool = True):
+    METRICS.enabled = enabled
+
+def span(stage: str, **labels):
+    return METRICS.span(stage, **labels)
+
+def inc(name: str, value: float = 1, **labels):
+    METRICS.inc(name, value, **labels)
+
+def observe(name: str, value: float, **labels):
+    METRICS.observe(name, value, **labels)
+
+@contextmanager
+def trace(name: str) -> Iterator[RequestTrace]:
+    """
+    Collects the spans of one request (this context and the contexts copied from it, see contextvars).
+    Spans are only recorded while the registry is enabled.
+
+    Example:
+    with trace('plan.jpg') as request_trace:
+        assess_plan(result)
+    logger.info("%s %s", request_trace.name, request_trace.totals())
+    """
+    request_trace = RequestTrace(name)
+    token = _CURRENT_TRACE.set(request_trace)
+    try:
+        yield request_trace
+    finally:
+        _CURRENT_TRACE.reset(token)
@@ -0,0 +1,102 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Hashable, Tuple
+import threading
+import os
+
+import numpy as np
+
+from metrics.metrics import inc
+
+# 256 MB is enough for ~16 plans of 4000 x 4000 pixels (uint8)
+CACHE_MAX_BYTES_DEFAULT = 256 * 1024 * 1024
+
+
+class BinarizationCache:
+    """
+    LRU cache of binarized floor plans, evicted by total memory size (bytes).
+
+    Entries are keyed by the resolved image path, its modification time and the binarization
+    parameters, so an edited or replaced file is binarized again. Cached arrays are read-only;
+    callers that need to draw on a floor plan must work on a copy.
+    """
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES_DEFAULT):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(image_path: Path, params: Dict[str, Hashable]) -> Tuple:
+        """ Key = (resolved path, mtime in ns, sorted parameters). """
+        path = Path(image_path).resolve()
+        mtime = os.stat(path).st_mtime_ns
+        return (str(path), mtime, tuple(sorted(params.items())))
+
+    def get(self, image_path: Path, loader: Callable[..., np.ndarray], **params) -> np.ndarray:
+        """
+        Return the cached array for (image_path, params), calling loader(image_path, **params) on a miss.
+
+        Parameters:
+        - image_path (Path): Path to the floor plan image.
+        - loader (Callable): Function producing the array, e.g. floor_plan_binarization.
+        - params: Keyword arguments forwarded to the loader, also part of the cache key.
+
+        Returns:
+        - np.ndarray: Read-only cached array.
+        """
+        key = self.make_key(image_path, params)
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                inc('cache_requests_total', cache='binarization', result='hit')
+                return cached
+            self.misses += 1
+        inc('cache_requests_total', cache='binarization', result='miss')
+
+        # Load outside the lock so other images are not blocked by a slow binarization
+        array = loader(image_path, **params)
+        array.setflags(write=False)
+        self._put(key, array)
+        return array
+
+    def _put(self, key: Tuple, array: np.ndarray):
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key).nbytes
+
+            # Arrays bigger than the whole budget are returned but never stored
+            if array.nbytes > self.max_bytes:
+                return
+
+            self._entries[key] = array
+            self.current_bytes += array.nbytes
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
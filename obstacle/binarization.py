@@ -0,0 +1,237 @@
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import time
+
+import numpy as np
+from PIL import Image
+import cv2
+
+# Backend of floor_plan_binarization when none is given
+BINARIZATION_BACKEND_DEFAULT = 'exact'
+
+# 'fast' backend: the bilateral filter runs on the plan downscaled by this factor
+FAST_SCALE_DEFAULT = 0.25
+
+# 'adaptive' backend: neighbourhood (odd, pixels) and offset of the local gaussian mean
+ADAPTIVE_BLOCK_SIZE_DEFAULT = 51
+ADAPTIVE_OFFSET_DEFAULT = 10
+
+
+def decode_gray(image_path: Path) -> np.ndarray:
+    """
+    Decode an image straight to grayscale (no color image in memory, correct RGB weights).
+
+    Parameters:
+    - image_path (Path): Path to the image file.
+
+    Returns:
+    - np.ndarray: Grayscale image (uint8).
+    """
+    try:
+        # np.fromfile + imdecode also reads paths that cv2.imread can not (non ASCII names)
+        image = cv2.imdecode(np.fromfile(str(image_path), dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    except Exception as e:
+        raise ValueError(f"Failed to load image from {image_path}: {e}")
+
+    if image is None:
+        raise ValueError(f"Failed to load image from {image_path}")
+    return image
+
+def decode_legacy(image_path: Path) -> np.ndarray:
+    """
+    Decode an image the way the original pipeline did: PIL (RGB order) then COLOR_BGR2GRAY.
+
+    The red and blue weights are swapped, it is kept only so that the 'exact' backend
+    reproduces the original binarized plans pixel for pixel.
+
+    Parameters:
+    - image_path (Path): Path to the image file.
+
+    Returns:
+    - np.ndarray: Grayscale image (uint8).
+    """
+    try:
+        pil_image = Image.open(image_path)
+        image = np.array(pil_image)
+    except Exception as e:
+        raise ValueError(f"Failed to load image from {image_path}: {e}")
+
+    if image is None:
+        raise ValueError(f"Failed to load image from {image_path}")
+
+    # Check if the image is already grayscale or not
+    if len(image.shape) == 3:  # If image has 3 channels, it's a color image
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+def morphology_threshold(image: np.ndarray, threshold: Optional[int] = None) -> np.ndarray:
+    """
+    3x3 erode then dilate, then the binary threshold (Otsu when threshold is None).
+
+    Parameters:
+    - image (np.ndarray): Filtered grayscale image.
+    - threshold (Optional[int]): Gray value above which a pixel becomes white (255). Default is None (Otsu).
+
+    Returns:
+    - np.ndarray: Binarized image.
+    """
+    kernel = np.ones((3, 3), np.uint8)
+    img_erode = cv2.erode(image, kernel)
+    img_dilate = cv2.dilate(img_erode, kernel)
+
+    if threshold is None:
+        ret, result = cv2.threshold(img_dilate, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    else:
+        ret, result = cv2.threshold(img_dilate, threshold, 255, cv2.THRESH_BINARY)
+    return result
+
+
+def binarize_exact(image_path: Path, diameter: int = 10, sigma_color: float = 100, sigma_space: float = 1000,
+                   threshold: int = 70) -> np.ndarray:
+    """ Original pipeline: legacy decode, full resolution bilateral filter, morphology, fixed threshold. """
+    image = decode_legacy(image_path)
+    blur = cv2.bilateralFilter(image, diameter, sigma_color, sigma_space)
+    return morphology_threshold(blur, threshold)
+
+def exact_filter_padding(diameter: int = 10, sigma_space: float = 1000) -> int:
+    """ Pixels around an output pixel read by the exact pipeline (bilateral radius + 3x3 erode + 3x3 dilate). """
+    # OpenCV derives the radius from sigma_space when the diameter is not positive
+    radius = diameter // 2 if diameter > 0 else round(sigma_space * 1.5)
+    return radius + 1 + 1
+
+def binarize_exact_region(image: np.ndarray, box: Tuple[int, int, int, int], diameter: int = 10, sigma_color: float = 100,
+                          sigma_space: float = 1000, threshold: int = 70) -> np.ndarray:
+    """
+    The exact pipeline on one region of a decoded plan, identical to the same region of the whole plan.
+
+    The region is filtered with exact_filter_padding pixels of context (the filters of the whole plan
+    see the same pixels, and the same border reflection where the region touches the plan border).
+
+    Parameters:
+    - image (np.ndarray): Whole plan from decode_legacy.
+    - box (Tuple[int, int, int, int]): Region (x_min, y_min, x_max, y_max), inclusive, inside the plan.
+    - diameter, sigma_color, sigma_space, threshold: As binarize_exact.
+
+    Returns:
+    - np.ndarray: Binarized region, shape (y_max - y_min + 1, x_max - x_min + 1).
+    """
+    height, width = image.shape[:2]
+    x_min, y_min, x_max, y_max = box
+    pad = exact_filter_padding(diameter, sigma_space)
+
+    pad_x_min, pad_y_min = max(0, x_min - pad), max(0, y_min - pad)
+    pad_x_max, pad_y_max = min(width - 1, x_max + pad), min(height - 1, y_max + pad)
+    padded = image[pad_y_min:pad_y_max + 1, pad_x_min:pad_x_max + 1]
+
+    blur = cv2.bilateralFilter(padded, diameter, sigma_color, sigma_space)
+    result = morphology_threshold(blur, threshold)
+    return result[y_min - pad_y_min:y_max - pad_y_min + 1, x_min - pad_x_min:x_max - pad_x_min + 1].copy()
+
+def binarize_fast(image_path: Path, diameter: int = 10, sigma_color: float = 100, sigma_space: float = 1000,
+                  threshold: int = 70, scale: float = FAST_SCALE_DEFAULT) -> np.ndarray:
+    """
+    Bilateral filter on the downscaled plan (diameter and sigma_space scaled with it), upsampled back
+    before the morphology and the fixed threshold. The filter cost drops with scale ** 2 * diameter ** 2.
+    """
+    image = decode_gray(image_path)
+    height, width = image.shape[:2]
+    if scale >= 1:
+        return morphology_threshold(cv2.bilateralFilter(image, diameter, sigma_color, sigma_space), threshold)
+
+    small = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+    small_blur = cv2.bilateralFilter(small, max(3, round(diameter * scale)), sigma_color, sigma_space * scale)
+    blur = cv2.resize(small_blur, (width, height), interpolation=cv2.INTER_LINEAR)
+    return morphology_threshold(blur, threshold)
+
+def binarize_otsu(image_path: Path, diameter: int = 10, sigma_color: float = 100, sigma_space: float = 1000,
+                  threshold: Optional[int] = None) -> np.ndarray:
+    """ Light 3x3 median instead of the bilateral filter, threshold picked per plan by Otsu (threshold is ignored). """
+    image = decode_gray(image_path)
+    blur = cv2.medianBlur(image, 3)
+    return morphology_threshold(blur, None)
+
+def binarize_adaptive(image_path: Path, diameter: int = 10, sigma_color: float = 100, sigma_space: float = 1000,
+                      threshold: Optional[int] = None,
+                      block_size: int = ADAPTIVE_BLOCK_SIZE_DEFAULT,
+                      offset: float = ADAPTIVE_OFFSET_DEFAULT) -> np.ndarray:
+    """ Local gaussian mean threshold (robust to uneven scans and gray backgrounds), then the morphology. """
+    image = decode_gray(image_path)
+    blur = cv2.medianBlur(image, 3)
+    kernel = np.ones((3, 3), np.uint8)
+    img_dilate = cv2.dilate(cv2.erode(blur, kernel), kernel)
+    return cv2.adaptiveThreshold(img_dilate, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, block_size, offset)
+
+
+BINARIZATION_BACKENDS: Dict[str, Callable[..., np.ndarray]] = {}
+
+def register_backend(name: str, backend: Callable[..., np.ndarray]) -> Callable[..., np.ndarray]:
+    """ Adds (or replaces) a binarization backend, backend(image_path, **params) -> binarized image. """
+    BINARIZATION_BACKENDS[name] = backend
+    return backend
+
+def get_backend(name: str) -> Callable[..., np.ndarray]:
+    if name not in BINARIZATION_BACKENDS:
+        raise ValueError(f"Unknown binarization backend '{name}', expected one of {list(BINARIZATION_BACKENDS)}.")
+    return BINARIZATION_BACKENDS[name]
+
+register_backend('exact', binarize_exact)
+register_backend('fast', binarize_fast)
+register_backend('otsu', binarize_otsu)
+register_backend('adaptive', binarize_adaptive)
+
+
+def parity_report(image_paths: List[Path], backends: Optional[List[str]] = None, reference: str = 'exact',
+                  **params) -> Dict[str, Dict[str, float]]:
+    """
+    Compares backends with the reference backend on the same plans.
+
+    Parameters:
+    - image_paths (List[Path]): Floor plans to binarize.
+    - backends (Optional[List[str]]): Backends to compare. Default is None (every registered backend).
+    - reference (str): Backend taken as ground truth. Default is 'exact'.
+    - params: Binarization parameters given to every backend.
+
+    Returns:
+    - Dict[str, Dict[str, float]]: Per backend:
+        'agreement' (share of pixels equal to the reference),
+        'black_iou' (intersection over union of the black pixels),
+        'seconds' (mean time per plan) and 'speedup' (reference seconds / seconds).
+    """
+    backends = list(BINARIZATION_BACKENDS) if backends is None else backends
+    names = [reference] + [name for name in backends if name != reference]
+
+    outputs = {name: [] for name in names}
+    seconds = {name: 0.0 for name in names}
+    for image_path in image_paths:
+        for name in names:
+            start = time.perf_counter()
+            outputs[name].append(get_backend(name)(image_path, **params))
+            seconds[name] += time.perf_counter() - start
+
+    report = {}
+    for name in names:
+        equal, total, intersection, union = 0, 0, 0, 0
+        for bin_image, reference_image in zip(outputs[name], outputs[reference]):
+            equal += int(np.count_nonzero(bin_image == reference_image))
+            total += bin_image.size
+            black, reference_black = bin_image == 0, reference_image == 0
+            intersection += int(np.count_nonzero(black & reference_black))
+            union += int(np.count_nonzero(black | reference_black))
+
+        mean_seconds = seconds[name] / max(len(image_paths), 1)
+        report[name] = {
+            'agreement': equal / total if total > 0 else 1.0,
+            'black_iou': intersection / union if union > 0 else 1.0,
+            'seconds': mean_seconds,
+            'speedup': (seconds[reference] / seconds[name]) if seconds[name] > 0 else 0.0
+        }
+    return report
+
+
+if __name__ == "__main__":
+
+    ROOT = Path(__file__).resolve().parents[1]
+    image_paths = sorted((ROOT / 'test' / 'val_images').glob('*.*'))
+    for name, res in parity_report(image_paths).items():
+        print(f"{name:10s} agreement {res['agreement']:.4f}  black IoU {res['black_iou']:.4f}  "
+              f"{res['seconds'] * 1000:.1f} ms/plan  x{res['speedup']:.1f}")
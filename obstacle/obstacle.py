@@ -1,7 +1,6 @@
 from pathlib import Path
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Union, Iterator, Optional
 import numpy as np
-from PIL import Image
 import cv2
 import sys
 
@@ -11,19 +10,48 @@ ROOT = FILE.parents[1]
 sys.path.insert(0, str(ROOT))  # for import modules
 
 from fengshui.item import Item  # Core class, very important
-
-def apply_white_boxes(floor_plan: np.ndarray, items: List[Item]) -> np.ndarray:
+from obstacle.bin_cache import BinarizationCache
+from obstacle.binarization import get_backend, BINARIZATION_BACKEND_DEFAULT
+from obstacle.binarization import decode_legacy, binarize_exact_region
+from metrics.metrics import span, inc
+
+# Binarized floor plans shared by every pair of the same image (one binarization per plan and run)
+BIN_CACHE = BinarizationCache()
+
+# Binarization backend of the obstacle detection (deployment setting, see obstacle.binarization.parity_report)
+BINARIZATION_BACKEND = BINARIZATION_BACKEND_DEFAULT
+
+# Binarize only the corridor of each pair (same rates, 'exact' backend only), opt-in per call (roi=True).
+# The scan results then hold the corridor ('bin_region_np_array') and no whole plan ('bin_image_np_arrary' is None),
+# by default they keep the whole binarized plan
+ROI_BINARIZATION = False
+
+# Obstacle type cutoffs ("Loose Detection, Strict Evaluation", see scan_obstacle)
+UNIDIRECTIONAL_THRESHOLD_DEFAULT = 0.5 # look from the small item
+BIDIRECTIONAL_THRESHOLD_DEFAULT = 0.5 # look from the big item
+OBSTACLE_THRESHOLD_DEFAULT = 0.5 # Pairs above it fail the assessment filter
+
+# 'full': exact rates for reporting, 'decision': stop scanning once the outcome is proven
+SCAN_MODES = ('full', 'decision')
+SCAN_CHUNK_SIZE = 256 # Line points per step of the decision mode
+
+def apply_white_boxes(floor_plan: np.ndarray, items: List[Item],
+                      origin: Tuple[int, int] = (0, 0),
+                      plan_shape: Optional[Tuple[int, int]] = None) -> np.ndarray:
     """
     Apply white boxes on the floor plan image for each item's bounding box with a 2% margin.
 
     Parameters:
     - floor_plan (np.ndarray): The binarized floor plan image where obstacles are to be highlighted.
     - items (List[Item]): List of items whose bounding boxes are to be expanded and applied as white boxes on the floor plan.
+    - origin (Tuple[int, int]): (x, y) of floor_plan in the whole plan when it is a region. Default is (0, 0).
+    - plan_shape (Optional[Tuple[int, int]]): (height, width) of the whole plan. Default is None (floor_plan is the whole plan).
 
     Returns:
     - np.ndarray: The updated floor plan image with white boxes applied over the specified items.
     """
-    height, width = floor_plan.shape[:2]
+    height, width = floor_plan.shape[:2] if plan_shape is None else plan_shape[:2]
+    origin_x, origin_y = origin
 
     for item in items:
         # Get the bounding box coordinates from the Item object
@@ -40,52 +68,101 @@ def apply_white_boxes(floor_plan: np.ndarray, items: List[Item]) -> np.ndarray:
         x_max = min(width, x_max + x_margin)
         y_max = min(height, y_max + y_margin)
 
-        # Set the pixels in the expanded bounding box area to white
+        # Set the pixels in the expanded bounding box area to white (region coordinates)
+        x_min, x_max = max(0, x_min - origin_x), max(0, x_max - origin_x)
+        y_min, y_max = max(0, y_min - origin_y), max(0, y_max - origin_y)
         floor_plan[y_min:y_max, x_min:x_max] = 255
 
     return floor_plan
 
 
-def floor_plan_binarization(image_path: Path) -> np.ndarray:
+def floor_plan_binarization(image_path: Path,
+                            diameter: int = 10,
+                            sigma_color: float = 100,
+                            sigma_space: float = 1000,
+                            threshold: int = 70,
+                            backend: str = BINARIZATION_BACKEND_DEFAULT,
+                            **backend_params) -> np.ndarray:
     """
     Binarize the floor plan image.
 
     Parameters:
     - image_path (Path): Path to the image file.
+    - diameter (int): Pixel neighborhood diameter of the bilateral filter.
+    - sigma_color (float): Bilateral filter sigma in the color space.
+    - sigma_space (float): Bilateral filter sigma in the coordinate space.
+    - threshold (int): Gray value above which a pixel becomes white (255).
+    - backend (str): 'exact' (original pipeline), 'fast', 'otsu' or 'adaptive' (see obstacle.binarization). Default is 'exact'.
+    - backend_params: Extra parameters of the backend, e.g. scale for 'fast'.
 
     Returns:
     - np.ndarray: Binarized image.
     """
-    try:
-        pil_image = Image.open(image_path)
-        image = np.array(pil_image)
-    except Exception as e:
-        raise ValueError(f"Failed to load image from {image_path}: {e}")
+    with span('binarization', backend=backend):
+        return get_backend(backend)(image_path, diameter=diameter, sigma_color=sigma_color,
+                                    sigma_space=sigma_space, threshold=threshold, **backend_params)
 
-    if image is None:
-        raise ValueError(f"Failed to load image from {image_path}")
+def get_binarized_floor_plan(image_path: Path, use_cache: bool = True, **params) -> np.ndarray:
+    """
+    Return a writable binarized floor plan, binarizing each image only once per run.
 
-    # Check if the image is already grayscale or not
-    if len(image.shape) == 3:  # If image has 3 channels, it's a color image
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    Parameters:
+    - image_path (Path): Path to the image file.
+    - use_cache (bool): Look up / store the result in BIN_CACHE. Default is True.
+    - params: Binarization parameters forwarded to floor_plan_binarization (backend defaults to BINARIZATION_BACKEND).
+
+    Returns:
+    - np.ndarray: Private copy of the binarized image (safe for apply_white_boxes).
+    """
+    # The backend is always part of the cache key
+    params.setdefault('backend', BINARIZATION_BACKEND)
+    if not use_cache:
+        return floor_plan_binarization(image_path, **params)
 
-    # Apply bilateral filter
-    blur = cv2.bilateralFilter(image, 10, 100, 1000)
+    return BIN_CACHE.get(image_path, floor_plan_binarization, **params).copy()
 
-    # Apply morphological operations
-    kernel = np.ones((3, 3), np.uint8)
-    img_erode = cv2.erode(blur, kernel)
-    img_dilate = cv2.dilate(img_erode, kernel)
 
-    # Apply threshold to binarize the image
-    ret, result = cv2.threshold(img_dilate, 70, 255, cv2.THRESH_BINARY)
+def bresenham_line(x0: int, y0: int, x1: int, y1: int) -> np.ndarray:
+    """
+    Generate points in a line from (x0, y0) to (x1, y1) using Bresenham's algorithm.
 
-    return result
+    The i-th step moves one pixel along the major axis, and the minor axis offset is
+    floor((2 * i * d_minor + d_major) / (2 * d_major)), which is the closed form of the
+    error term of bresenham_line_reference (same pixels, same order).
 
+    Parameters:
+    - x0, y0, x1, y1 (int): Coordinates of the start and end points.
 
-def bresenham_line(x0: int, y0: int, x1: int, y1: int) -> List[Tuple[int, int]]:
+    Returns:
+    - np.ndarray: (N, 2) int32 array of (x, y) points in the line.
     """
-    Generate points in a line from (x0, y0) to (x1, y1) using Bresenham's algorithm.
+    x0, y0, x1, y1 = int(x0), int(y0), int(x1), int(y1)
+    dx = abs(x1 - x0)
+    dy = abs(y1 - y0)
+    sx = 1 if x0 < x1 else -1
+    sy = 1 if y0 < y1 else -1
+
+    major = max(dx, dy)
+    steps = np.arange(major + 1, dtype=np.int64)
+    if major == 0:
+        minor_steps = steps
+    elif dx >= dy:
+        minor_steps = (2 * steps * dy + dx) // (2 * dx)
+    else:
+        minor_steps = (2 * steps * dx + dy) // (2 * dy)
+
+    points = np.empty((major + 1, 2), dtype=np.int32)
+    if dx >= dy:
+        points[:, 0] = x0 + sx * steps
+        points[:, 1] = y0 + sy * minor_steps
+    else:
+        points[:, 0] = x0 + sx * minor_steps
+        points[:, 1] = y0 + sy * steps
+    return points
+
+def bresenham_line_reference(x0: int, y0: int, x1: int, y1: int) -> List[Tuple[int, int]]:
+    """
+    Generate points in a line from (x0, y0) to (x1, y1) using Bresenham's algorithm (pure Python reference of bresenham_line).
 
     Parameters:
     - x0, y0, x1, y1 (int): Coordinates of the start and end points.
@@ -112,10 +189,122 @@ def bresenham_line(x0: int, y0: int, x1: int, y1: int) -> List[Tuple[int, int]]:
             y0 += sy
     return points
 
-def points_check(floor_plan: np.ndarray, points_line: List[Tuple[int, int]], scan_range: int, orientation: str) -> int:
+class LineScanner:
+    """
+    Counts black points in the scan window of every point of a line in O(1) per point.
+
+    The black-pixel mask of the rows (vertical orientation) or columns (horizontal orientation)
+    crossed by the line is turned into prefix sums once, so each window count is a single
+    subtraction and every scan range of the same line reuses them.
+    """
+    def __init__(self, floor_plan: np.ndarray, points_line: Union[np.ndarray, List[Tuple[int, int]]], orientation: str):
+        points = np.asarray(points_line, dtype=np.int64).reshape(-1, 2)
+        self.orientation = orientation
+        self.size = len(points)
+
+        if orientation == 'vertical':
+            # Scan along x on the row of each point
+            lines, self.positions = points[:, 1], points[:, 0]
+            self.limit = floor_plan.shape[1]
+            take = lambda index: floor_plan[index, :]
+        elif orientation == 'horizontal':
+            # Scan along y on the column of each point
+            lines, self.positions = points[:, 0], points[:, 1]
+            self.limit = floor_plan.shape[0]
+            take = lambda index: floor_plan[:, index].T
+        else:
+            self.size = 0  # Unknown orientation never counts black points
+            return
+
+        self.lines = lines
+        self.take = take
+        self.prefix = None # Built on the first full scan
+
+    def _build_prefix(self):
+        unique_lines, self.line_index = np.unique(self.lines, return_inverse=True)
+        black = self.take(unique_lines) == 0
+        self.prefix = np.zeros((len(unique_lines), self.limit + 1), dtype=np.int32)
+        np.cumsum(black, axis=1, dtype=np.int32, out=self.prefix[:, 1:])
+
+    def window_counts(self, scan_range: int) -> np.ndarray:
+        """
+        Number of black points in the window of each point.
+
+        Parameters:
+        - scan_range (int): Range to scan around each point.
+
+        Returns:
+        - np.ndarray: Black point count per point of the line, in line order.
+        """
+        if self.size == 0:
+            return np.zeros(0, dtype=np.int32)
+        if self.prefix is None:
+            self._build_prefix()
+
+        half_range = round(scan_range / 2)
+        left = np.maximum(self.positions - half_range, 0)
+        right = np.minimum(self.positions + half_range, self.limit - 1)  # Inclusive end inside the image
+        # Clipping keeps empty windows (negative scan range) at a count <= 0
+        counts = self.prefix[self.line_index, np.clip(right + 1, 0, self.limit)] - self.prefix[self.line_index, np.minimum(left, self.limit)]
+        return np.maximum(counts, 0)
+
+    def max_black_points(self, scan_range: int) -> int:
+        """ Maximum number of black points found along the scan range. """
+        counts = self.window_counts(scan_range)
+        return int(counts.max()) if len(counts) > 0 else 0
+
+    def iter_chunk_max(self, scan_range: int, chunk_size: int = SCAN_CHUNK_SIZE) -> Iterator[int]:
+        """
+        Maximum black point count of each chunk of the line, in line order.
+
+        Every chunk only sums the band of its own windows, so a caller that stops
+        early never reads the rest of the line.
+
+        Parameters:
+        - scan_range (int): Range to scan around each point.
+        - chunk_size (int): Points per chunk. Default is SCAN_CHUNK_SIZE.
+
+        Returns:
+        - Iterator[int]: One maximum per chunk (the maximum of all of them is max_black_points).
+        """
+        half_range = round(scan_range / 2)
+        for start in range(0, self.size, chunk_size):
+            positions = self.positions[start:start + chunk_size]
+            unique_lines, line_index = np.unique(self.lines[start:start + chunk_size], return_inverse=True)
+            left = np.maximum(positions - half_range, 0)
+            right = np.minimum(positions + half_range, self.limit - 1)
+
+            # Prefix sums of the band [low, high] covering the windows of the chunk
+            low = min(int(left.min()), self.limit - 1)
+            high = max(int(right.max()), low)
+            black = self.take(unique_lines)[:, low:high + 1] == 0
+            prefix = np.zeros((len(unique_lines), high - low + 2), dtype=np.int32)
+            np.cumsum(black, axis=1, dtype=np.int32, out=prefix[:, 1:])
+
+            # Clipping keeps empty windows (negative scan range) at a count <= 0
+            width = high - low + 1
+            counts = prefix[line_index, np.clip(right + 1 - low, 0, width)] - prefix[line_index, np.clip(left - low, 0, width)]
+            yield max(int(counts.max()), 0)
+
+def points_check(floor_plan: np.ndarray, points_line: Union[np.ndarray, List[Tuple[int, int]]], scan_range: int, orientation: str) -> int:
     """
     Check points along the line for obstacles and count black points.
 
+    Parameters:
+    - floor_plan (np.ndarray): Binarized floor plan image.
+    - points_line (Union[np.ndarray, List[Tuple[int, int]]]): (N, 2) array or list of points in the line.
+    - scan_range (int): Range to scan around each point.
+    - orientation (str): Orientation of the scan ('vertical' or 'horizontal').
+
+    Returns:
+    - int: Maximum number of black points found along the scan range.
+    """
+    return LineScanner(floor_plan, points_line, orientation).max_black_points(scan_range)
+
+def points_check_reference(floor_plan: np.ndarray, points_line: List[Tuple[int, int]], scan_range: int, orientation: str) -> int:
+    """
+    Check points along the line for obstacles and count black points (pure Python reference of points_check).
+
     Parameters:
     - floor_plan (np.ndarray): Binarized floor plan image.
     - points_line (List[Tuple[int, int]]): List of points in the line.
@@ -145,36 +334,174 @@ def points_check(floor_plan: np.ndarray, points_line: List[Tuple[int, int]], sca
         max_black_point = max(max_black_point, black_point_counter)
     return max_black_point
 
-def items_obstacle_detect(image_path: Path, items: List[Item]) -> Dict[str, any]:
+def pair_points_line(items: List[Item]) -> np.ndarray:
+    """ Bresenham line between the centers of the two items. """
+    start = items[0].get_center()
+    end = items[1].get_center()
+    return bresenham_line(int(start['center_X']), int(start['center_Y']), int(end['center_X']), int(end['center_Y']))
+
+def corridor_box(points_line: np.ndarray, items_per_orientation: List[List[Item]], plan_shape: Tuple[int, int]) -> Tuple[int, int, int, int]:
     """
-    Detect obstacles between two items on the floor plan.
+    Bounding box of every pixel the scans of the pair can read: the line, widened by half of the
+    largest scan range along x (vertical scans) and / or y (horizontal scans), clipped to the plan.
+
+    Parameters:
+    - points_line (np.ndarray): Line of the pair.
+    - items_per_orientation (List[List[Item]]): The pair once per orientation that will be scanned.
+    - plan_shape (Tuple[int, int]): (height, width) of the whole plan.
+
+    Returns:
+    - Tuple[int, int, int, int]: (x_min, y_min, x_max, y_max), inclusive.
+    """
+    height, width = plan_shape[:2]
+    half_x, half_y = 0, 0
+    for items in items_per_orientation:
+        half_range = max(round(max(items[0].get_length_value(), items[1].get_length_value()) / 2), 0)
+        if items[0].orientation == 'vertical':
+            half_x = max(half_x, half_range)
+        elif items[0].orientation == 'horizontal':
+            half_y = max(half_y, half_range)
+
+    points = np.asarray(points_line).reshape(-1, 2)
+    x_min = min(max(int(points[:, 0].min()) - half_x, 0), width - 1)
+    y_min = min(max(int(points[:, 1].min()) - half_y, 0), height - 1)
+    x_max = max(min(int(points[:, 0].max()) + half_x, width - 1), x_min)
+    y_max = max(min(int(points[:, 1].max()) + half_y, height - 1), y_min)
+    return x_min, y_min, x_max, y_max
+
+def get_decoded_floor_plan(image_path: Path) -> np.ndarray:
+    """ Read-only grayscale plan of the exact pipeline, decoded once per image (BIN_CACHE). """
+    return BIN_CACHE.get(image_path, lambda path, stage: decode_legacy(path), stage='decoded')
+
+def prepare_pair_floor_plan(image_path: Path, items: List[Item],
+                            items_per_orientation: Optional[List[List[Item]]] = None,
+                            roi: Optional[bool] = None) -> Tuple[np.ndarray, np.ndarray, Optional[Tuple[int, int]]]:
+    """
+    Binarized floor plan with the two items cleaned to white, and the line between their centers.
+
+    In ROI mode only the corridor of the pair (corridor_box) is binarized: its pixels are the same
+    as in the whole binarized plan, so every scan gives the same result at a cost proportional
+    to the corridor size.
 
     Parameters:
     - image_path (Path): Path to the floor plan image.
     - items (List[Item]): List of two items to check between.
+    - items_per_orientation (Optional[List[List[Item]]]): Orientations that will be scanned. Default is None ([items]).
+    - roi (Optional[bool]): Binarize only the corridor. Default is None (ROI_BINARIZATION, 'exact' backend only).
 
     Returns:
-    - Dict[str, Any]: Dictionary containing the binarized image array, points line, and obstacle rate.
+    - Tuple[np.ndarray, np.ndarray, Optional[Tuple[int, int]]]: (floor plan or corridor, points line in plan coordinates,
+                                                                 (x, y) origin of the corridor, None for the whole floor plan).
+    """
+    roi = ROI_BINARIZATION if roi is None else roi
+    points_line = pair_points_line(items)
+
+    if not roi or BINARIZATION_BACKEND != 'exact':
+        floor_plan = get_binarized_floor_plan(image_path)
+        # Clean Items area to white"
+        floor_plan = apply_white_boxes(floor_plan=floor_plan, items=items)
+        return floor_plan, points_line, None
+
+    image = get_decoded_floor_plan(image_path)
+    box = corridor_box(points_line, [items] if items_per_orientation is None else items_per_orientation, image.shape)
+    with span('binarization', backend='exact_roi'):
+        floor_plan = binarize_exact_region(image, box)
+    origin = (box[0], box[1])
+    floor_plan = apply_white_boxes(floor_plan=floor_plan, items=items, origin=origin, plan_shape=image.shape)
+    return floor_plan, points_line, origin
+
+def classify_obstacle(look_from_small_rate: float, look_from_big_rate: float,
+                      unidirectional_threshold: float = UNIDIRECTIONAL_THRESHOLD_DEFAULT,
+                      bidirectional_threshold: float = BIDIRECTIONAL_THRESHOLD_DEFAULT) -> str:
+    """
+    Obstacle type of a pair from its two points of view.
+
+    Parameters:
+    - look_from_small_rate (float): Rate scanned with the big item length (view of the small item).
+    - look_from_big_rate (float): Rate scanned with the small item length (view of the big item).
+    - unidirectional_threshold (float): Small item view rate of an obstacle. Default is UNIDIRECTIONAL_THRESHOLD_DEFAULT.
+    - bidirectional_threshold (float): Big item view rate of an obstacle. Default is BIDIRECTIONAL_THRESHOLD_DEFAULT.
+
+    Returns:
+    - str: 'Unidirectional Obstacle', 'Bidirectional Obstacle' or 'No Obstacle'.
+    """
+    # Loose Detection, Strict Evaluation
+    if look_from_small_rate >= unidirectional_threshold and look_from_big_rate < bidirectional_threshold:
+        # If the small item has a high rate of obstacle, we consider it as an obstacle which calls "Single Obstacle"
+        return 'Unidirectional Obstacle'
+    elif look_from_big_rate >= bidirectional_threshold:
+        return 'Bidirectional Obstacle'
+    else:
+        return 'No Obstacle'
+
+def scan_rate_until(scanner: LineScanner, scan_range: int, stop) -> Tuple[float, bool]:
+    """
+    Obstacle rate of the line, scanned chunk by chunk until stop(rate so far) is True.
+
+    Parameters:
+    - scanner (LineScanner): Scanner of the line.
+    - scan_range (int): Range to scan around each point.
+    - stop (Callable[[float], bool]): Outcome proven by a lower bound of the rate.
+
+    Returns:
+    - Tuple[float, bool]: (rate, stopped early). The rate is exact when the scan did not stop early, otherwise a lower bound.
     """
+    if scan_range <= 0:
+        return 0, False
+
+    max_black_point = 0
+    for chunk_max in scanner.iter_chunk_max(scan_range):
+        max_black_point = max(max_black_point, chunk_max)
+        if stop(max_black_point / scan_range):
+            return max_black_point / scan_range, True
+    return max_black_point / scan_range, False
+
+def scan_obstacle(floor_plan: np.ndarray, points_line: np.ndarray, items: List[Item],
+                  origin: Optional[Tuple[int, int]] = None,
+                  mode: str = 'full',
+                  obstacle_threshold: float = OBSTACLE_THRESHOLD_DEFAULT,
+                  unidirectional_threshold: float = UNIDIRECTIONAL_THRESHOLD_DEFAULT,
+                  bidirectional_threshold: float = BIDIRECTIONAL_THRESHOLD_DEFAULT) -> Dict[str, any]:
+    """
+    Scans the prepared floor plan along the line in the orientation of the items.
+
+    The 'decision' mode stops each scan as soon as the window counts prove the outcome: the rate
+    is above obstacle_threshold (the pair fails filter_obstacle_rate) and the obstacle type is known.
+    The rate of a stopped scan is a lower bound ('exact' is False), pairs that pass are always
+    scanned to the end, so their rate and type are the same as in 'full' mode.
+
+    Parameters:
+    - floor_plan (np.ndarray): Floor plan from prepare_pair_floor_plan.
+    - points_line (np.ndarray): Line from prepare_pair_floor_plan.
+    - items (List[Item]): List of two items with the same orientation.
+    - origin (Optional[Tuple[int, int]]): (x, y) of floor_plan in the whole plan when it is only the corridor (ROI mode).
+                                          Default is None (floor_plan is the whole plan).
+    - mode (str): 'full' (exact rates) or 'decision' (early exit). Default is 'full'.
+    - obstacle_threshold (float): Highest rate of a clear path, only used by 'decision'. Default is OBSTACLE_THRESHOLD_DEFAULT.
+    - unidirectional_threshold (float): See classify_obstacle. Default is UNIDIRECTIONAL_THRESHOLD_DEFAULT.
+    - bidirectional_threshold (float): See classify_obstacle. Default is BIDIRECTIONAL_THRESHOLD_DEFAULT.
+
+    Returns:
+    - Dict[str, Any]: Dictionary containing the binarized image array ('bin_image_np_arrary', None when only the corridor
+                      was binarized), the scanned array and its origin ('bin_region_np_array', 'region_origin'),
+                      points line, obstacle rate and type.
+    """
+    if mode not in SCAN_MODES:
+        raise ValueError(f"Unknown scan mode '{mode}', expected one of {SCAN_MODES}.")
 
     result_dic ={
         'items' : [],
         'points_line' : [],
         'bin_image_np_arrary': None,
-        'rate': 0.0
+        'bin_region_np_array': None,
+        'region_origin': (0, 0),
+        'rate': 0.0,
+        'exact': True
     }
 
-    floor_plan = floor_plan_binarization(image_path)
-    start = items[0].get_center()
-    end = items[1].get_center()
-    points_line = bresenham_line(int(start['center_X']), int(start['center_Y']), int(end['center_X']), int(end['center_Y']))
-
     if items[0].orientation != items[1].orientation:
         raise ValueError("Items do not have the same orientation")
 
-    # Clean Items area to white"
-    floor_plan = apply_white_boxes(floor_plan=floor_plan, items=items)
-
     # Check obstacle
     # scan_range = max(items[0].get_length_value(), items[1].get_length_value())
     # max_black_point = points_check(floor_plan, points_line, scan_range, items[0].orientation)
@@ -185,34 +512,87 @@ def items_obstacle_detect(image_path: Path, items: List[Item]) -> Dict[str, any]
     # 2. The min black point in the scan range
     # Since there are two items which means we have two scan ranges from the start to end point.
     # We have to consider the two points of view from different items.(Considering one way has obstacle, the other way may not have obstacle)
-    scan_range = max(items[0].get_length_value(), items[1].get_length_value())
-    look_from_small_tiem_max_black_point = points_check(floor_plan, points_line, scan_range, items[0].orientation)
-    look_from_small_rate =  look_from_small_tiem_max_black_point  / scan_range if scan_range > 0 else 0
-    # IMPORTANT : Default rate is the look from small item
-    rate = look_from_small_rate
-
-    scan_range = min(items[0].get_length_value(), items[1].get_length_value())
-    look_from_big_tiem_max_black_point = points_check(floor_plan, points_line, scan_range, items[0].orientation)
-    look_from_big_rate =  look_from_big_tiem_max_black_point  / scan_range if scan_range > 0 else 0
-
-    # Loose Detection, Strict Evaluation
-    if look_from_small_rate >= 0.5 and look_from_big_rate < 0.5:
-        # If the small item has a high rate of obstacle, we consider it as an obstacle which calls "Single Obstacle"
-        obsticale_type = 'Unidirectional Obstacle'
-    elif look_from_big_rate >= 0.5:
-        obsticale_type = 'Bidirectional Obstacle'
+    # Both scan ranges share the prefix sums of the same line
+    region_origin = (0, 0) if origin is None else origin
+    scanner = LineScanner(floor_plan, np.asarray(points_line).reshape(-1, 2) - np.asarray(region_origin), items[0].orientation)
+    small_scan_range = max(items[0].get_length_value(), items[1].get_length_value())
+    big_scan_range = min(items[0].get_length_value(), items[1].get_length_value())
+
+    if mode == 'full':
+        look_from_small_tiem_max_black_point = scanner.max_black_points(small_scan_range)
+        look_from_small_rate =  look_from_small_tiem_max_black_point  / small_scan_range if small_scan_range > 0 else 0
+
+        look_from_big_tiem_max_black_point = scanner.max_black_points(big_scan_range)
+        look_from_big_rate =  look_from_big_tiem_max_black_point  / big_scan_range if big_scan_range > 0 else 0
+        stopped = False
     else:
-        obsticale_type = 'No Obstacle'
+        # Rates only grow while scanning, so a lower bound above a cutoff proves it
+        look_from_small_rate, stopped = scan_rate_until(scanner, small_scan_range,
+                                                        stop=lambda rate: rate > obstacle_threshold and rate >= unidirectional_threshold)
+        look_from_big_rate, _ = scan_rate_until(scanner, big_scan_range,
+                                                stop=lambda rate: rate >= bidirectional_threshold)
 
+    # IMPORTANT : Default rate is the look from small item
+    rate = look_from_small_rate
+    obsticale_type = classify_obstacle(look_from_small_rate, look_from_big_rate,
+                                       unidirectional_threshold=unidirectional_threshold,
+                                       bidirectional_threshold=bidirectional_threshold)
 
     result_dic['items'] = items
-    result_dic['bin_image_np_arrary'] = floor_plan
+    result_dic['bin_image_np_arrary'] = floor_plan if origin is None else None # Whole plan only
+    result_dic['bin_region_np_array'] = floor_plan
+    result_dic['region_origin'] = region_origin # of bin_region_np_array in the plan
     result_dic['points_line'] = points_line
     result_dic['rate'] = rate
+    inc('obstacle_scans_stopped_total', int(stopped), mode=mode)
+    result_dic['exact'] = not stopped
     result_dic['obstacle_type'] = obsticale_type
 
     return result_dic
 
+def items_obstacle_detect(image_path: Path, items: List[Item], roi: Optional[bool] = None, **scan_params) -> Dict[str, any]:
+    """
+    Detect obstacles between two items on the floor plan.
+
+    Parameters:
+    - image_path (Path): Path to the floor plan image.
+    - items (List[Item]): List of two items to check between.
+    - roi (Optional[bool]): Binarize only the corridor of the pair, 'bin_image_np_arrary' is then None.
+                            Default is None (ROI_BINARIZATION).
+    - scan_params: Mode and thresholds forwarded to scan_obstacle (default is the 'full' mode).
+
+    Returns:
+    - Dict[str, Any]: Dictionary containing the binarized image array, points line, and obstacle rate.
+    """
+    floor_plan, points_line, origin = prepare_pair_floor_plan(image_path=image_path, items=items, roi=roi)
+    return scan_obstacle(floor_plan=floor_plan, points_line=points_line, items=items, origin=origin, **scan_params)
+
+def pair_obstacle_detect(image_path: Path, items_per_orientation: List[List[Item]], roi: Optional[bool] = None,
+                         **scan_params) -> List[Dict[str, any]]:
+    """
+    Detect obstacles for the same pair (same coordinates) under several orientations.
+
+    The white boxes and the line only depend on the coordinates, so they are built once
+    and only the scan is repeated per orientation.
+
+    Parameters:
+    - image_path (Path): Path to the floor plan image.
+    - items_per_orientation (List[List[Item]]): The pair once per orientation, e.g. [[a_hor, b_hor], [a_ver, b_ver]].
+    - roi (Optional[bool]): See items_obstacle_detect. Default is None (ROI_BINARIZATION).
+    - scan_params: Mode and thresholds forwarded to scan_obstacle.
+
+    Returns:
+    - List[Dict[str, Any]]: One items_obstacle_detect dictionary per entry of items_per_orientation.
+    """
+    for items in items_per_orientation:
+        if items[0].orientation != items[1].orientation:
+            raise ValueError("Items do not have the same orientation")
+
+    floor_plan, points_line, origin = prepare_pair_floor_plan(image_path=image_path, items=items_per_orientation[0],
+                                                              items_per_orientation=items_per_orientation, roi=roi)
+    return [scan_obstacle(floor_plan=floor_plan, points_line=points_line, items=items, origin=origin, **scan_params)
+            for items in items_per_orientation]
+
 if __name__ == "__main__":
 
     path = ROOT / 'images' / 'FloorPlan (2).jpg'
@@ -1,14 +1,18 @@
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple, Union
+import heapq
 import sys  
 
+import numpy as np
+
 # Path arrangement
 FILE = Path(__file__).resolve()
 ROOT = FILE.parents[1]  
 sys.path.insert(0, str(ROOT))  # for import modules 
 
 # Fengshui class
-from fengshui.item import Item
+from fengshui.item import Item, ItemSet
+from fengshui.item import ORIENTATION_CODES, INVALID_ORIENTATION_CODE
 
 from draw.draw_item import draw_bounding_boxes
 from draw.draw_item import save_to_image
@@ -122,6 +126,242 @@ def overlap_rate(items: List[Item]) -> Dict[str, dict]:
 
     return result_dic
 
+def sweep_intersecting_pairs(intervals_a: List[Tuple[float, float]],
+                             intervals_b: Optional[List[Tuple[float, float]]] = None) -> List[Tuple[int, int]]:
+    """
+    Finds every pair of intersecting closed intervals (touching counts) with a sweep line.
+
+    Intervals are sorted by their min once; while sweeping, the active intervals are kept in a heap
+    by their max and dropped as soon as they end before the current min. The cost is
+    O(n log n + number of pairs) instead of O(n^2).
+
+    Note: the pairs are not pruned by an overlap threshold, the threshold is applied by filter_overlap_rate.
+    The candidates do not depend on the threshold, so the rules of a plan with different thresholds share
+    them (overlap_key, fengshui.rules.PlanContext.overlaps), and every pair kept has an exact rate.
+
+    Parameters:
+    - intervals_a (List[Tuple[float, float]]): (min, max) intervals.
+    - intervals_b (Optional[List[Tuple[float, float]]]): Second list, only pairs across the two lists are returned.
+                                                         Default is None (pairs inside intervals_a).
+
+    Returns:
+    - List[Tuple[int, int]]: Index pairs (i, j), i < j for one list, (index in a, index in b) for two lists. Sorted.
+    """
+    events = [(interval[0], interval[1], 0, index) for index, interval in enumerate(intervals_a)]
+    if intervals_b is not None:
+        events += [(interval[0], interval[1], 1, index) for index, interval in enumerate(intervals_b)]
+    events.sort(key=lambda event: event[0])
+
+    active = [[], []]  # Heaps of (max, index) per list
+    pairs = []
+    for value_min, value_max, list_id, index in events:
+        # Partner list: the same list when looking for pairs inside intervals_a
+        partner_id = 0 if intervals_b is None else 1 - list_id
+        for heap in active:
+            while heap and heap[0][0] < value_min:
+                heapq.heappop(heap)
+
+        for _, other_index in active[partner_id]:
+            if intervals_b is None:
+                pairs.append((min(index, other_index), max(index, other_index)))
+            elif list_id == 0:
+                pairs.append((index, other_index))
+            else:
+                pairs.append((other_index, index))
+
+        heapq.heappush(active[list_id], (value_max, index))
+
+    pairs.sort()
+    return pairs
+
+def group_by_orientation(item_list: List[Item]) -> Dict[str, List[int]]:
+    # {orientation: [index, ...]}
+    groups = {}
+    for index, item in enumerate(item_list):
+        groups.setdefault(item.orientation, []).append(index)
+    return groups
+
+def projection_intervals(item_list: List[Item], indexes: List[int]) -> List[Tuple[float, float]]:
+    intervals = []
+    for index in indexes:
+        proj_dic = item_list[index].get_projection_values()  # Raises ValueError on invalid orientation
+        intervals.append((proj_dic['min'], proj_dic['max']))
+    return intervals
+
+def overlap_candidates_one_item(item_list: List[Item]) -> List[Tuple[int, int]]:
+    """
+    Index pairs of one item list that can pass the overlap filter (any positive threshold).
+
+    A pair can only have a positive rate or full coverage when both items have the same orientation
+    and their projections intersect, every other pair has rate 0.0 and no coverage.
+    The candidates are the same for every positive threshold (see sweep_intersecting_pairs).
+
+    Parameters:
+    - item_list (List[Item]): Items to compare with each other.
+
+    Returns:
+    - List[Tuple[int, int]]: (i, j) with i < j, in the order of the nested loop over item_list.
+    """
+    pairs = []
+    for indexes in group_by_orientation(item_list).values():
+        if len(indexes) < 2:
+            continue
+        intervals = projection_intervals(item_list, indexes)
+        for i, j in sweep_intersecting_pairs(intervals):
+            pairs.append((indexes[i], indexes[j]))
+
+    pairs.sort()
+    return pairs
+
+def overlap_candidates_two_item(type_one_item_list: List[Item], type_two_item_list: List[Item]) -> List[Tuple[int, int]]:
+    """
+    Index pairs across two item lists that can pass the overlap filter (any positive threshold).
+
+    Parameters:
+    - type_one_item_list (List[Item]): First items.
+    - type_two_item_list (List[Item]): Second items.
+
+    Returns:
+    - List[Tuple[int, int]]: (index in first list, index in second list), in the order of the nested loop.
+    """
+    pairs = []
+    groups_two = group_by_orientation(type_two_item_list)
+    for orientation, indexes_one in group_by_orientation(type_one_item_list).items():
+        indexes_two = groups_two.get(orientation)
+        if indexes_two is None:
+            continue
+        intervals_one = projection_intervals(type_one_item_list, indexes_one)
+        intervals_two = projection_intervals(type_two_item_list, indexes_two)
+        for i, j in sweep_intersecting_pairs(intervals_one, intervals_two):
+            pairs.append((indexes_one[i], indexes_two[j]))
+
+    pairs.sort()
+    return pairs
+
+def items_to_arrays(item_list: Union[List[Item], ItemSet]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converts items to the inputs of the batch API.
+
+    Parameters:
+    - item_list (Union[List[Item], ItemSet]): The items.
+
+    Returns:
+    - Tuple[np.ndarray, np.ndarray]: (N, 4) float64 [x1, y1, x2, y2] boxes and (N,) int8 orientation codes.
+    """
+    if isinstance(item_list, ItemSet):
+        return item_list.coords.astype(np.float64), item_list.orientation_codes
+
+    boxes = np.array([[item.x1, item.y1, item.x2, item.y2] for item in item_list], dtype=np.float64).reshape(-1, 4)
+    codes = np.array([ORIENTATION_CODES.get(item.orientation, INVALID_ORIENTATION_CODE) for item in item_list], dtype=np.int8)
+    return boxes, codes
+
+def projection_array(boxes: np.ndarray, orientation_codes: np.ndarray) -> np.ndarray:
+    """ (..., 2) [min, max] projection per box: x range for 'vertical', y range for 'horizontal'. """
+    boxes = np.asarray(boxes, dtype=np.float64)
+    vertical = (np.asarray(orientation_codes) == ORIENTATION_CODES['vertical'])[..., None]
+    return np.where(vertical, boxes[..., [0, 2]], boxes[..., [1, 3]])
+
+def overlap_rate_arrays(boxes_a: np.ndarray, boxes_b: np.ndarray,
+                        orientation_a: np.ndarray, orientation_b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Element-wise (broadcasting) version of overlap_rate, same results as the scalar function
+    for two distinct items (see overlap_results_for_pairs for an item paired with itself).
+
+    The 4 projection values are ranked like the stable sort of order_points (ties keep the
+    order a.min, a.max, b.min, b.max), then check_full_coverage, cal_inter_rate and the
+    'rate == 1 -> full coverage' rule are applied on the ranks.
+
+    Parameters:
+    - boxes_a, boxes_b (np.ndarray): (..., 4) [x1, y1, x2, y2] boxes, broadcastable against each other.
+    - orientation_a, orientation_b (np.ndarray): (...) orientation codes (see ORIENTATION_CODES).
+
+    Returns:
+    - Tuple[np.ndarray, np.ndarray]: float64 rate and bool full coverage, with the broadcast shape.
+
+    Raises:
+    - ValueError: If a pair has the same invalid orientation (like Item.get_projection_values).
+    """
+    orientation_a = np.asarray(orientation_a)
+    orientation_b = np.asarray(orientation_b)
+    same_orientation = orientation_a == orientation_b
+    valid = (orientation_a == ORIENTATION_CODES['vertical']) | (orientation_a == ORIENTATION_CODES['horizontal'])
+    if np.any(same_orientation & ~valid):
+        raise ValueError("Invalid orientation. Orientation must be 'vertical' or 'horizontal'.")
+
+    proj_a = projection_array(boxes_a, orientation_a)
+    proj_b = projection_array(boxes_b, orientation_b)
+    proj_a, proj_b = np.broadcast_arrays(proj_a, proj_b)
+    values = np.concatenate([proj_a, proj_b], axis=-1)  # (..., 4): a.min, a.max, b.min, b.max
+
+    # Stable rank of each value: smaller values + equal values placed before it
+    smaller = values[..., None, :] < values[..., :, None]                       # [k, j]: v_j < v_k
+    equal_before = (values[..., None, :] == values[..., :, None]) & np.tri(4, k=-1, dtype=bool)
+    ranks = smaller.sum(axis=-1) + equal_before.sum(axis=-1)
+
+    owner = np.array([0, 0, 1, 1])  # Value index -> item (0: a, 1: b)
+    def item_at(rank: int) -> np.ndarray:
+        return ((ranks == rank) * owner).sum(axis=-1)
+
+    first_item, second_item, fourth_item = item_at(0), item_at(1), item_at(3)
+    ordered = np.sort(values, axis=-1)
+
+    union_range = ordered[..., 3] - ordered[..., 0]
+    inter_range = ordered[..., 2] - ordered[..., 1]
+    intersect = (first_item != second_item) & (inter_range >= 0) & (union_range > 0)
+    rate = np.where(intersect, inter_range / np.where(union_range > 0, union_range, 1.0), 0.0)
+    full_coverage = (first_item == fourth_item) | (rate == 1)
+
+    rate = np.where(same_orientation, rate, 0.0)
+    full_coverage = same_orientation & full_coverage
+    return rate, full_coverage
+
+def overlap_rate_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray,
+                        orientation_a: np.ndarray, orientation_b: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Overlap rate and full coverage of every pair (a[i], b[j]) in one call.
+
+    Parameters:
+    - boxes_a (np.ndarray): (N, 4) boxes.
+    - boxes_b (np.ndarray): (M, 4) boxes.
+    - orientation_a (np.ndarray): (N,) orientation codes.
+    - orientation_b (np.ndarray): (M,) orientation codes.
+
+    Returns:
+    - Tuple[np.ndarray, np.ndarray]: (N, M) rate and (N, M) full coverage matrices.
+    """
+    boxes_a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+    return overlap_rate_arrays(boxes_a[:, None, :], boxes_b[None, :, :],
+                               np.asarray(orientation_a)[:, None], np.asarray(orientation_b)[None, :])
+
+def overlap_results_for_pairs(items_a: List[Item], items_b: List[Item], pairs: List[Tuple[int, int]]) -> List[Dict[str, dict]]:
+    """
+    overlap_rate of many pairs with one batch call.
+
+    Parameters:
+    - items_a, items_b (List[Item]): Item lists (can be the same list).
+    - pairs (List[Tuple[int, int]]): (index in items_a, index in items_b) pairs.
+
+    Returns:
+    - List[Dict[str, dict]]: One overlap_rate style dictionary per pair, in pair order.
+    """
+    if len(pairs) == 0:
+        return []
+
+    boxes_a, codes_a = items_to_arrays(items_a)
+    boxes_b, codes_b = items_to_arrays(items_b)
+    index_a = np.array([pair[0] for pair in pairs])
+    index_b = np.array([pair[1] for pair in pairs])
+    rates, full_coverages = overlap_rate_arrays(boxes_a[index_a], boxes_b[index_b], codes_a[index_a], codes_b[index_b])
+
+    results = []
+    for (i, j), rate, full_coverage in zip(pairs, rates.tolist(), full_coverages.tolist()):
+        if items_a[i] is items_b[j]:
+            # An item compared with itself: all 4 points belong to one item (no intersection, full coverage)
+            rate, full_coverage = 0.0, True
+        results.append({'items': [items_a[i], items_b[j]], 'rate': rate, 'full_coverage': full_coverage})
+    return results
+
 if __name__ == '__main__':
     # Define the items
     items = [
@@ -0,0 +1,380 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from pathlib import Path
+import subprocess
+import platform
+import argparse
+import tempfile
+import random
+import json
+import time
+import sys
+import os
+
+import numpy as np
+import cv2
+
+# Path arrangement
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+sys.path.insert(0, str(ROOT))   # for import moduls
+
+from fengshui.item import Item
+from obstacle.obstacle import floor_plan_binarization, pair_points_line, points_check
+from obstacle.binarization import BINARIZATION_BACKENDS
+from overlap.overlap import overlap_rate, overlap_candidates_one_item, overlap_rate_matrix, items_to_arrays
+from draw.draw_item import PlanRenderer
+from draw.output_sink import make_sink
+
+try:
+    import resource  # Not on Windows
+except ImportError:
+    resource = None
+
+IMAGES_PATH = ROOT / 'test' / 'images'
+BENCHMARK_OUTPUT_PATH = ROOT / 'test' / 'benchmark_results'
+DETECT_MODEL_PATH = ROOT / 'models' / 'detect_yolov11.pt'
+CLASSIFY_MODEL_PATH = ROOT / 'models' / 'classify_yolov11.pt'
+
+SYNTHETIC_RESOLUTIONS = [(1024, 1024), (2048, 2048), (4096, 4096)]
+SYNTHETIC_ITEMS = 300 # Items per synthetic plan
+SYNTHETIC_PLANS = 2 # Plans per resolution
+BUNDLED_ITEMS = 100 # Random items placed on each bundled image (they have no labels)
+REPEATS_DEFAULT = 3 # Samples of each stage per plan
+MAX_PAIRS = 128 # Pairs of the line scan and drawing stages per plan
+
+ITEM_NAMES = ['door', 'entrance', 'kitchen', 'window']
+PERCENTILES = [50, 90, 99]
+
+
+def peak_rss_mb() -> Optional[float]:
+    """ Peak resident memory of this process so far (MB), None where the resource module is missing. """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024  # bytes on macOS, KB on Linux
+
+def random_items(width: int, height: int, count: int, rng: random.Random) -> List[Item]:
+    """ Door sized boxes spread over the plan, random class and orientation. """
+    items = []
+    for _ in range(count):
+        box_width, box_height = rng.randint(20, 90), rng.randint(20, 90)
+        x1, y1 = rng.randint(0, width - box_width - 1), rng.randint(0, height - box_height - 1)
+        items.append(Item(x1=float(x1), y1=float(y1), x2=float(x1 + box_width), y2=float(y1 + box_height),
+                          name=rng.choice(ITEM_NAMES), orientation=rng.choice(['vertical', 'horizontal'])))
+    return items
+
+def synthetic_plan(width: int, height: int, items: List[Item], rng: random.Random) -> np.ndarray:
+    """ White plan with a grid of walls (with openings) and the outline of every item. """
+    image = np.full((height, width, 3), 255, np.uint8)
+    wall = max(2, width // 400)
+    cv2.rectangle(image, (wall, wall), (width - wall - 1, height - wall - 1), (0, 0, 0), wall * 2)
+
+    room = max(width, height) // 6
+    for x in range(room, width, room):
+        for y in range(0, height, room):
+            if rng.random() > 0.25:  # Opening (door) otherwise
+                cv2.line(image, (x, y), (x, min(y + room, height - 1)), (0, 0, 0), wall)
+    for y in range(room, height, room):
+        for x in range(0, width, room):
+            if rng.random() > 0.25:
+                cv2.line(image, (x, y), (min(x + room, width - 1), y), (0, 0, 0), wall)
+
+    for item in items:
+        cv2.rectangle(image, (int(item.x1), int(item.y1)), (int(item.x2), int(item.y2)), (60, 60, 60), 1)
+    return image
+
+def build_datasets(work_dir: Path, seed: int = 0, resolutions: List[Tuple[int, int]] = SYNTHETIC_RESOLUTIONS,
+                   synthetic_items: int = SYNTHETIC_ITEMS, synthetic_plans: int = SYNTHETIC_PLANS,
+                   bundled: bool = True) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Floor plans of the benchmark, grouped by dataset ('bundled', 'synthetic_1024x1024', ...).
+
+    Returns:
+    - Dict[str, List[Dict[str, Any]]]: Per dataset, plans as {'path': Path, 'width', 'height', 'items': List[Item]}.
+    """
+    rng = random.Random(seed)
+    datasets = {}
+
+    if bundled:
+        plans = []
+        for image_path in sorted(IMAGES_PATH.glob('*.*')):
+            image = cv2.imread(str(image_path))
+            if image is None:
+                continue
+            height, width = image.shape[:2]
+            plans.append({'path': image_path, 'width': width, 'height': height,
+                          'items': random_items(width, height, BUNDLED_ITEMS, rng)})
+        datasets['bundled'] = plans
+
+    for width, height in resolutions:
+        plans = []
+        for index in range(synthetic_plans):
+            items = random_items(width, height, synthetic_items, rng)
+            image_path = work_dir / f"synthetic_{width}x{height}_{index}.png"
+            cv2.imwrite(str(image_path), synthetic_plan(width, height, items, rng))
+            plans.append({'path': image_path, 'width': width, 'height': height, 'items': items})
+        datasets[f"synthetic_{width}x{height}"] = plans
+
+    return datasets
+
+
+class StageTimer:
+    """
+    Latency samples of each (stage, dataset): one sample is one stage call on one plan,
+    units counts what the call processed (plans, pairs, crops...) for the throughput.
+    """
+    def __init__(self):
+        self.samples: Dict[str, Dict[str, List[float]]] = {}
+        self.units: Dict[str, Dict[str, int]] = {}
+        self.peak_rss: Dict[str, Optional[float]] = {}
+        self.skipped: Dict[str, str] = {}
+
+    def measure(self, stage: str, dataset: str, function: Callable, *args, units: int = 1, **kwargs) -> Any:
+        start = time.perf_counter()
+        output = function(*args, **kwargs)
+        seconds = time.perf_counter() - start
+
+        self.samples.setdefault(stage, {}).setdefault(dataset, []).append(seconds)
+        self.units.setdefault(stage, {}).setdefault(dataset, 0)
+        self.units[stage][dataset] += units
+        self.peak_rss[stage] = peak_rss_mb()
+        return output
+
+    def skip(self, stage: str, reason: str):
+        self.skipped[stage] = reason
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Returns:
+        - Dict[str, Any]: Per stage and dataset: samples, mean / percentiles / max latency (ms),
+                          throughput (units per second) and the peak RSS of the process after the stage (MB).
+        """
+        stages = {}
+        for stage, datasets in self.samples.items():
+            stages[stage] = {}
+            for dataset, samples in datasets.items():
+                milliseconds = np.array(samples) * 1000
+                total_seconds = float(np.sum(samples))
+                stats = {'samples': len(samples), 'units': self.units[stage][dataset],
+                         'mean_ms': float(milliseconds.mean()), 'max_ms': float(milliseconds.max())}
+                for percentile in PERCENTILES:
+                    stats[f"p{percentile}_ms"] = float(np.percentile(milliseconds, percentile))
+                stats['throughput'] = self.units[stage][dataset] / total_seconds if total_seconds > 0 else 0.0
+                stats['peak_rss_mb'] = self.peak_rss[stage]
+                stages[stage][dataset] = stats
+        return stages
+
+
+def plan_pairs(items: List[Item], max_pairs: int = MAX_PAIRS) -> List[List[Item]]:
+    """ Same orientation pairs with intersecting projections (the pairs the assessment scans). """
+    return [[items[i], items[j]] for i, j in overlap_candidates_one_item(items)[:max_pairs]]
+
+def bench_detection(timer: StageTimer, datasets: Dict[str, List[Dict[str, Any]]], repeats: int):
+    """ Detection, then crop and classify of every box (needs ultralytics and the weights). """
+    try:
+        from vision.detect import floor_plan_detect
+        from vision.classify import classify_orientations
+    except ImportError as e:
+        timer.skip('detection', f"ultralytics is not installed ({e})")
+        timer.skip('crop_classify', f"ultralytics is not installed ({e})")
+        return
+    if not DETECT_MODEL_PATH.exists():
+        timer.skip('detection', f"no weights at {DETECT_MODEL_PATH}")
+        timer.skip('crop_classify', 'needs the detection results')
+        return
+
+    for dataset, plans in datasets.items():
+        for plan in plans:
+            for _ in range(repeats):
+                results = timer.measure('detection', dataset, floor_plan_detect, [plan['path']],
+                                        model_path=DETECT_MODEL_PATH, save_outputs=False)
+            if results is None:
+                continue
+            crops = len(results[0].boxes)
+            for _ in range(repeats):
+                timer.measure('crop_classify', dataset, classify_orientations, results, model_path=CLASSIFY_MODEL_PATH,
+                              object_names=ITEM_NAMES, units=max(crops, 1))
+
+def bench_binarization(timer: StageTimer, datasets: Dict[str, List[Dict[str, Any]]], repeats: int,
+                       backends: List[str]) -> Dict[str, np.ndarray]:
+    """ floor_plan_binarization per backend, returns the binarized plans of the first backend by path. """
+    floor_plans = {}
+    for backend in backends:
+        for dataset, plans in datasets.items():
+            for plan in plans:
+                for _ in range(repeats):
+                    floor_plan = timer.measure(f"binarization[{backend}]", dataset, floor_plan_binarization,
+                                               plan['path'], backend=backend)
+                floor_plans.setdefault(str(plan['path']), floor_plan)
+    return floor_plans
+
+def scan_pairs(floor_plan: np.ndarray, pairs: List[List[Item]]) -> int:
+    # Both scan ranges of every pair, as scan_obstacle in 'full' mode
+    black_points = 0
+    for items in pairs:
+        points_line = pair_points_line(items)
+        for scan_range in {items[0].get_length_value(), items[1].get_length_value()}:
+            black_points += points_check(floor_plan, points_line, int(scan_range), items[0].orientation)
+    return black_points
+
+def bench_line_scan(timer: StageTimer, datasets: Dict[str, List[Dict[str, Any]]], repeats: int,
+                    floor_plans: Dict[str, np.ndarray]):
+    """ bresenham_line + points_check of the candidate pairs. """
+    for dataset, plans in datasets.items():
+        for plan in plans:
+            pairs = plan_pairs(plan['items'])
+            for _ in range(repeats):
+                timer.measure('line_scan', dataset, scan_pairs, floor_plans[str(plan['path'])], pairs, units=max(len(pairs), 1))
+
+def overlap_loop(items: List[Item]) -> int:
+    # The original nested loop of compute_overlap_results
+    overlapping = 0
+    for i in range(len(items)):
+        for j in range(i + 1, len(items)):
+            overlapping += overlap_rate([items[i], items[j]])['rate'] > 0
+    return overlapping
+
+def bench_overlap(timer: StageTimer, datasets: Dict[str, List[Dict[str, Any]]], repeats: int):
+    """ overlap_rate pair loop, candidate sweep and the vectorized matrix, on every pair of the plan items. """
+    for dataset, plans in datasets.items():
+        for plan in plans:
+            items = plan['items']
+            pairs = len(items) * (len(items) - 1) // 2
+            boxes, codes = items_to_arrays(items)
+            for _ in range(repeats):
+                timer.measure('overlap_loop', dataset, overlap_loop, items, units=pairs)
+                timer.measure('overlap_candidates', dataset, overlap_candidates_one_item, items, units=pairs)
+                timer.measure('overlap_matrix', dataset, overlap_rate_matrix, boxes, boxes, codes, codes, units=pairs)
+
+def draw_and_save(plan: Dict[str, Any], pairs: List[List[Item]], sink) -> Any:
+    # Decode once, draw every pair and its line, encode once
+    renderer = PlanRenderer(image_path=plan['path'])
+    results = [{'items': items, 'points_line': pair_points_line(items)} for items in pairs]
+    return renderer.save(renderer.render(results, draw_lines=True), 'obstacle_' + Path(plan['path']).name, sink=sink)
+
+def bench_drawing(timer: StageTimer, datasets: Dict[str, List[Dict[str, Any]]], repeats: int, sink_kind: str, work_dir: Path):
+    """ Decode, draw and encode one obstacle image per plan. """
+    sink = make_sink(sink_kind, output_dir=work_dir / 'output')
+    for dataset, plans in datasets.items():
+        for plan in plans:
+            pairs = plan_pairs(plan['items'])
+            for _ in range(repeats):
+                timer.measure('draw_save', dataset, draw_and_save, plan, pairs, sink)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark(stages: Optional[List[str]] = None, repeats: int = REPEATS_DEFAULT, seed: int = 0,
+                  resolutions: List[Tuple[int, int]] = SYNTHETIC_RESOLUTIONS, synthetic_items: int = SYNTHETIC_ITEMS,
+                  backends: Optional[List[str]] = None, sink_kind: str = 'memory', bundled: bool = True) -> Dict[str, Any]:
+    """
+    Times every stage of the assessment on the bundled and synthetic floor plans.
+
+    Parameters:
+    - stages (Optional[List[str]]): Among 'detection', 'binarization', 'line_scan', 'overlap', 'drawing'. Default is None (all).
+    - repeats (int): Samples of each stage per plan. Default is REPEATS_DEFAULT.
+    - seed (int): Seed of the synthetic plans and items. Default is 0.
+    - resolutions (List[Tuple[int, int]]): Sizes of the synthetic plans. Default is SYNTHETIC_RESOLUTIONS.
+    - synthetic_items (int): Items per synthetic plan. Default is SYNTHETIC_ITEMS.
+    - backends (Optional[List[str]]): Binarization backends. Default is None (['exact']).
+    - sink_kind (str): Output sink of the drawing stage ('memory' or 'directory'). Default is 'memory'.
+    - bundled (bool): Include the images of test/images. Default is True.
+
+    Returns:
+    - Dict[str, Any]: {'meta', 'datasets', 'stages' (see StageTimer.report), 'skipped' (stage: reason)}.
+    """
+    stages = ['detection', 'binarization', 'line_scan', 'overlap', 'drawing'] if stages is None else stages
+    backends = ['exact'] if backends is None else backends
+    timer = StageTimer()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        work_dir = Path(work_dir)
+        datasets = build_datasets(work_dir, seed=seed, resolutions=resolutions, synthetic_items=synthetic_items, bundled=bundled)
+
+        if 'detection' in stages:
+            bench_detection(timer, datasets, repeats)
+        floor_plans = {}
+        if 'binarization' in stages or 'line_scan' in stages:
+            floor_plans = bench_binarization(timer, datasets, repeats if 'binarization' in stages else 1, backends)
+        if 'line_scan' in stages:
+            bench_line_scan(timer, datasets, repeats, floor_plans)
+        if 'overlap' in stages:
+            bench_overlap(timer, datasets, repeats)
+        if 'drawing' in stages:
+            bench_drawing(timer, datasets, repeats, sink_kind, work_dir)
+
+    return {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'repeats': repeats,
+            'seed': seed,
+            'backends': backends,
+            'sink': sink_kind,
+            'peak_rss_mb': peak_rss_mb()
+        },
+        'datasets': {dataset: {'plans': len(plans), 'items': sum(len(plan['items']) for plan in plans),
+                               'sizes': sorted({f"{plan['width']}x{plan['height']}" for plan in plans})}
+                     for dataset, plans in datasets.items()},
+        'stages': timer.report(),
+        'skipped': timer.skipped
+    }
+
+def compare_reports(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """ p50 ratio (current / previous) of every stage and dataset in both reports, > 1 is slower. """
+    ratios = {}
+    for stage, datasets in current['stages'].items():
+        for dataset, stats in datasets.items():
+            before = previous['stages'].get(stage, {}).get(dataset)
+            if before is not None and before['p50_ms'] > 0:
+                ratios.setdefault(stage, {})[dataset] = stats['p50_ms'] / before['p50_ms']
+    return ratios
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Per stage latency, throughput and memory of the assessment pipeline.")
+    parser.add_argument('--stages', nargs='+', default=None, help="detection binarization line_scan overlap drawing (default: all)")
+    parser.add_argument('--repeats', type=int, default=REPEATS_DEFAULT)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--resolutions', nargs='+', default=None, help="Synthetic plan sizes, e.g. 1024x1024 4096x4096")
+    parser.add_argument('--items', type=int, default=SYNTHETIC_ITEMS, help="Items per synthetic plan")
+    parser.add_argument('--backends', nargs='+', default=None, choices=list(BINARIZATION_BACKENDS))
+    parser.add_argument('--sink', default='memory', choices=['memory', 'directory'])
+    parser.add_argument('--no-bundled', action='store_true', help="Only the synthetic plans")
+    parser.add_argument('--output', type=Path, default=None, help="JSON report (default: test/benchmark_results/<time>.json)")
+    parser.add_argument('--compare', type=Path, default=None, help="Previous JSON report to compare the p50 latencies with")
+    args = parser.parse_args()
+
+    resolutions = SYNTHETIC_RESOLUTIONS if args.resolutions is None else \
+        [tuple(int(value) for value in size.lower().split('x')) for size in args.resolutions]
+    report = run_benchmark(stages=args.stages, repeats=args.repeats, seed=args.seed, resolutions=resolutions,
+                           synthetic_items=args.items, backends=args.backends, sink_kind=args.sink, bundled=not args.no_bundled)
+
+    output_path = args.output
+    if output_path is None:
+        output_path = BENCHMARK_OUTPUT_PATH / f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(report, indent=2))
+
+    for stage, datasets in report['stages'].items():
+        for dataset, stats in datasets.items():
+            print(f"{stage:22s} {dataset:22s} p50 {stats['p50_ms']:9.2f} ms  p99 {stats['p99_ms']:9.2f} ms  "
+                  f"{stats['throughput']:12.1f}/s  rss {stats['peak_rss_mb']} MB")
+    for stage, reason in report['skipped'].items():
+        print(f"{stage:22s} skipped: {reason}")
+
+    if args.compare is not None:
+        for stage, datasets in compare_reports(json.loads(args.compare.read_text()), report).items():
+            for dataset, ratio in datasets.items():
+                print(f"{stage:22s} {dataset:22s} x{ratio:.2f} p50 vs {args.compare.name}")
+    print(f"Report: {output_path}")
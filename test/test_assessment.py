@@ -0,0 +1,299 @@
+import unittest
+from unittest import mock
+from types import SimpleNamespace
+from pathlib import Path
+import threading
+import tempfile
+import time
+import sys
+
+import numpy as np
+import cv2
+
+# Path arrangement
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+sys.path.insert(0, str(ROOT))  # for import modules
+
+from vision.plan_result import PlanResult, PlanBoxes
+from draw.output_sink import MemorySink
+from fengshui.item import Item
+from fengshui.result_cache import ResultCache
+from fengshui.workspace import Workspace
+
+try:
+    import fengshui.assessment as assessment
+except ImportError:  # ultralytics is not installed
+    assessment = None
+
+NAMES = {0: 'door', 1: 'entrance', 2: 'kitchen'}
+PLANS = 5
+
+
+def plan_boxes(index: int) -> list:
+    """ Two stacked doors, shifted per plan so that every plan has its own results. """
+    x = 20 + 15 * index
+    return [[x, 20, x + 40, 30], [x, 130, x + 40, 140]]
+
+def fake_detect_stream(images_path, model_path, batch_size, save_outputs=True, project=None):
+    """ floor_plan_detect_stream without a model: the boxes of plan_boxes, in the order of the source. """
+    image_paths = sorted(Path(images_path).iterdir()) if not isinstance(images_path, list) else images_path
+    plans = [PlanResult(path=str(image_path), names=NAMES, boxes=PlanBoxes(plan_boxes(int(Path(image_path).stem[-1])), [0, 0]))
+             for image_path in image_paths]
+    return iter([plans[start:start + batch_size] for start in range(0, len(plans), batch_size)])
+
+def fake_classify(results, model_path, object_names, batch_size=32, in_memory=True):
+    for result in results:
+        result.orientation_labels = ['vertical'] * len(result.boxes)
+
+
+class FakeModel:
+    """ Shared model stub counting the predict calls (and streams) running at the same time. """
+    def __init__(self, predict):
+        self.predict_one = predict
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def enter(self):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.02)  # Long enough for an unserialized caller to come in
+
+    def leave(self):
+        with self.lock:
+            self.active -= 1
+
+    def stream(self, source):
+        self.enter()
+        try:
+            for item in source:
+                time.sleep(0.005)
+                yield self.predict_one(item)
+        finally:
+            self.leave()
+
+    def predict(self, source, stream=False, **kwargs):
+        if stream:
+            return self.stream(source)
+        self.enter()
+        try:
+            return [self.predict_one(item) for item in source]
+        finally:
+            self.leave()
+
+def detect_file(image_path: str) -> PlanResult:
+    index = int(Path(image_path).stem.split('_')[-1])
+    return PlanResult(path=image_path, names=NAMES, boxes=PlanBoxes(plan_boxes(index), [0, 0]), orig_img=cv2.imread(image_path))
+
+def classify_crop(crop: np.ndarray):
+    return SimpleNamespace(names={0: 'vertical'}, probs=SimpleNamespace(top1=0))
+
+
+@unittest.skipIf(assessment is None, "fengshui.assessment needs ultralytics")
+class TestRunOrder(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        model_path = self.root / 'detect.pt'
+        model_path.write_bytes(b'weights')
+        # Detection and classification are stubbed in this process, the worker processes only run assess_plan
+        self.patches = [mock.patch.object(assessment, 'floor_plan_detect_stream', fake_detect_stream),
+                        mock.patch.object(assessment, 'classify_orientations', fake_classify),
+                        mock.patch.object(assessment, 'DETECT_MODEL_PATH', model_path),
+                        mock.patch.object(assessment, 'RESULT_CACHE', ResultCache(cache_dir=self.root / 'cache'))]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.temp_dir.cleanup()
+
+    def add_plans(self, images_path: Path) -> list:
+        image_paths = []
+        for index in range(PLANS):
+            image = np.full((160, 200, 3), 255, dtype=np.uint8)
+            image[159, 199 - index] = 0  # Plans of their own for the result cache
+            image_path = images_path / f"plan_{index}.png"
+            cv2.imwrite(str(image_path), image)
+            image_paths.append(image_path)
+        return image_paths
+
+    def test_iter_assessments_keeps_plan_order(self):
+        images_path = self.root / 'images'
+        images_path.mkdir()
+        image_paths = self.add_plans(images_path)
+
+        sequential = list(assessment.iter_assessments(image_paths, workers=1, stream=True, batch_size=2))
+        parallel = list(assessment.iter_assessments(image_paths, workers=2, stream=True, batch_size=2))
+
+        self.assertEqual([plan.path for plan, _, _ in parallel], [str(image_path) for image_path in image_paths])
+        self.assertEqual([summaries for _, _, summaries in parallel], [summaries for _, _, summaries in sequential])
+        for index, (_, _, summaries) in enumerate(parallel):
+            first_door = summaries['door_to_door']['obstacle'][0][0][0]
+            self.assertEqual(first_door[1:5], plan_boxes(index)[0])
+
+    def test_run_keeps_plan_order(self):
+        outputs = {}
+        for workers in (1, 2):
+            with Workspace(base_dir=self.root / 'workspaces') as workspace:
+                self.add_plans(workspace.images_path)
+                outputs[workers] = assessment.run(workers=workers, workspace=workspace, stream=True, batch_size=2)
+            assessment.RESULT_CACHE.clear()  # Assess again instead of reading the first run back
+
+        names = [image.name for image in outputs[2]['door_to_door']]
+        self.assertEqual(names, [f"obstacle_door_to_door_plan_{index}.png" for index in range(PLANS)])
+        self.assertEqual([image.data for image in outputs[2]['door_to_door']], [image.data for image in outputs[1]['door_to_door']])
+
+    def test_cached_plans_need_no_model(self):
+        with Workspace(base_dir=self.root / 'workspaces') as workspace:
+            self.add_plans(workspace.images_path)
+            first = assessment.run(workers=1, workspace=workspace, stream=True, batch_size=2)
+
+        assessment.DETECT_MODEL_PATH.unlink()  # Weights not on disk anymore
+        with Workspace(base_dir=self.root / 'workspaces') as workspace:
+            self.add_plans(workspace.images_path)
+            again = assessment.run(workers=1, workspace=workspace, stream=True, batch_size=2)
+            # A plan to detect still needs the weights
+            cv2.imwrite(str(workspace.images_path / 'new_plan.png'), np.zeros((160, 200, 3), dtype=np.uint8))
+            self.assertIsNone(assessment.run(workers=1, workspace=workspace, stream=True, batch_size=2))
+
+        self.assertEqual([image.data for image in again['door_to_door']], [image.data for image in first['door_to_door']])
+
+
+def overlap_summary(overlap_results: list) -> list:
+    return [[assessment.summarize_items(res['items']), res['rate'], res['full_coverage']] for res in overlap_results]
+
+def random_items(rng: np.random.Generator, name: str, count: int) -> list:
+    corners = rng.uniform(0, 300, size=(count, 2))
+    sizes = rng.uniform(10, 80, size=(count, 2))
+    return [Item(x, y, x + w, y + h, name, rng.choice(['vertical', 'horizontal'])) for (x, y), (w, h) in zip(corners, sizes)]
+
+
+@unittest.skipIf(assessment is None, "fengshui.assessment needs ultralytics")
+class TestFreeOrientation(unittest.TestCase):
+    """ Unchecked classes: one pass over both orientations against the former change_orientation passes. """
+    def two_passes(self, main_items, free_items=None, main_fixed=False, threshold=0.5):
+        results = []
+        for orientation in assessment.FREE_ORIENTATIONS:
+            main = main_items if main_fixed else assessment.change_orientation(main_items, orientation)
+            if free_items is None:
+                results += assessment.get_overlap_results_one_item(item_list=main, threshold=threshold)
+            else:
+                free = assessment.change_orientation(free_items, orientation)
+                results += assessment.get_overlap_results_two_item(type_one_item_list=main, type_two_item_list=free, threshold=threshold)
+        return assessment.filter_overlap_rate(results, threshold=threshold)
+
+    def test_overlap_results_match_two_passes(self):
+        rng = np.random.default_rng(12)
+        for _ in range(20):
+            kitchens, entrances = random_items(rng, 'kitchen', 8), random_items(rng, 'entrance', 5)
+            for threshold in (0.5, 0.0):
+                cases = [(kitchens, None, False), (entrances, kitchens, False), (entrances, kitchens, True)]
+                for main_items, free_items, main_fixed in cases:
+                    one_pass = assessment.get_overlap_results_free_orientation(main_item_list=main_items, free_item_list=free_items,
+                                                                               main_fixed=main_fixed, threshold=threshold)
+                    self.assertEqual(overlap_summary(assessment.filter_overlap_rate(one_pass, threshold=threshold)),
+                                     overlap_summary(self.two_passes(main_items, free_items, main_fixed, threshold)))
+
+    def test_rule_matches_forced_orientations(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            image_path = Path(temp_dir) / 'plan.png'
+            image = np.full((300, 400, 3), 255, dtype=np.uint8)
+            cv2.line(image, (230, 100), (230, 200), (0, 0, 0), 4)  # Between the side by side kitchens
+            cv2.imwrite(str(image_path), image)
+            # Stacked kitchens overlap as 'vertical', side by side ones as 'horizontal', the last two under both
+            boxes = [[20, 20, 80, 60], [20, 150, 80, 190], [150, 120, 210, 160], [250, 120, 310, 160], [250, 240, 300, 280],
+                     [340, 240, 390, 280], [100, 220, 160, 260], [110, 230, 170, 270]]
+            labels = ['vertical', 'horizontal', 'vertical', 'horizontal', 'vertical', 'vertical', 'horizontal', 'vertical']
+
+            def plan(orientation_labels):
+                return PlanResult(path=str(image_path), names={0: 'kitchen'}, boxes=PlanBoxes(boxes, [0] * len(boxes)),
+                                  orientation_labels=orientation_labels)
+
+            with mock.patch.object(assessment, 'pair_obstacle_detect', wraps=assessment.pair_obstacle_detect) as scans:
+                one_pass = assessment.total_object_to_object(['kitchen'], plan(labels), {'kitchen': False}, sink=MemorySink())
+            # Former behaviour: every kitchen forced to one orientation, then to the other
+            forced = [assessment.total_object_to_object(['kitchen'], plan([orientation] * len(boxes)), {'kitchen': True}, sink=MemorySink())
+                      for orientation in assessment.FREE_ORIENTATIONS]
+
+        self.assertTrue(all(result is not None for result in forced))
+        self.assertEqual(overlap_summary(one_pass['overlap_result']),
+                         overlap_summary(forced[0]['overlap_result'] + forced[1]['overlap_result']))
+        summary = assessment.summarize_rule_result(one_pass)
+        self.assertEqual(summary['obstacle'], assessment.summarize_rule_result(forced[0])['obstacle'] + assessment.summarize_rule_result(forced[1])['obstacle'])
+        # One preparation per pair of coordinates, whatever the number of orientations it passed under
+        pairs = {assessment.pair_key(*res['items']) for res in one_pass['overlap_result']}
+        self.assertEqual(scans.call_count, len(pairs))
+
+
+@unittest.skipIf(assessment is None, "fengshui.assessment needs ultralytics")
+class TestResultCacheKey(unittest.TestCase):
+    def test_crop_settings_change_the_key(self):
+        rules = assessment.get_rules(assessment.DEFAULT_RULE_NAMES)
+        key = assessment.result_cache_key(b'plan', rules)
+        self.assertEqual(key, assessment.result_cache_key(b'plan', rules))
+        # Orientations of in-memory slices and of the save_crop files may differ
+        with mock.patch.object(assessment, 'IN_MEMORY_CROPS', not assessment.IN_MEMORY_CROPS):
+            self.assertNotEqual(key, assessment.result_cache_key(b'plan', rules))
+        with mock.patch.object(assessment.classify_settings, 'CROP_PAD', assessment.classify_settings.CROP_PAD + 1):
+            self.assertNotEqual(key, assessment.result_cache_key(b'plan', rules))
+
+
+@unittest.skipIf(assessment is None, "fengshui.assessment needs ultralytics")
+class TestConcurrentRuns(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        model_path = self.root / 'detect.pt'
+        model_path.write_bytes(b'weights')
+        self.detector, self.classifier = FakeModel(detect_file), FakeModel(classify_crop)
+        # The real detection stream and batched classification, only the shared models are stubbed
+        self.patches = [mock.patch('vision.detect.get_model', lambda model_path, warmup=True: self.detector),
+                        mock.patch('vision.classify.get_model', lambda model_path, warmup=True: self.classifier),
+                        mock.patch.object(assessment, 'DETECT_MODEL_PATH', model_path),
+                        mock.patch.object(assessment, 'RESULT_CACHE', ResultCache(cache_dir=self.root / 'cache'))]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.temp_dir.cleanup()
+
+    def run_request(self, indexes: list) -> dict:
+        with Workspace(base_dir=self.root / 'workspaces') as workspace:
+            for index in indexes:
+                image = np.full((160, 200, 3), 255, dtype=np.uint8)
+                image[159, 199 - index] = 0  # Plans of their own for the result cache
+                cv2.imwrite(str(workspace.images_path / f"plan_{index}.png"), image)
+            return assessment.run(workers=1, workspace=workspace, stream=True, batch_size=1)
+
+    def test_two_runs_in_threads(self):
+        requests = [[0, 1, 2], [3, 4]]
+        outputs = [None] * len(requests)
+
+        def request(position):
+            outputs[position] = self.run_request(requests[position])
+
+        threads = [threading.Thread(target=request, args=(position,)) for position in range(len(requests))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # One predict call (or stream) of each shared model at a time
+        self.assertEqual(self.detector.max_active, 1)
+        self.assertEqual(self.classifier.max_active, 1)
+        assessment.RESULT_CACHE.clear()
+        for indexes, output in zip(requests, outputs):
+            self.assertEqual([image.name for image in output['door_to_door']],
+                             [f"obstacle_door_to_door_plan_{index}.png" for index in indexes])
+            self.assertEqual([image.data for image in output['door_to_door']],
+                             [image.data for image in self.run_request(indexes)['door_to_door']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from pathlib import Path
+import threading
+import time
+import sys
+
+# Path arrangement
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+sys.path.insert(0, str(ROOT))  # for import modules
+
+from vision.batching import MicroBatcher
+
+
+class TestMicroBatcher(unittest.TestCase):
+    def test_results_routed_to_callers(self):
+        calls = []
+
+        def predict(images):
+            calls.append(list(images))
+            return [image * 10 for image in images]
+
+        with MicroBatcher(predict, max_batch_size=4, max_wait_ms=50) as batcher:
+            futures = [batcher.submit(i) for i in range(10)]
+            self.assertEqual([future.result() for future in futures], [i * 10 for i in range(10)])
+            stats = batcher.stats()
+
+        self.assertTrue(all(len(images) <= 4 for images in calls))
+        self.assertLess(len(calls), 10)
+        self.assertEqual(stats['images'], 10)
+        self.assertEqual(stats['batches'], len(calls))
+
+    def test_max_wait_bounds_latency(self):
+        with MicroBatcher(lambda images: images, max_batch_size=64, max_wait_ms=20) as batcher:
+            start = time.perf_counter()
+            self.assertEqual(batcher(7), 7)
+            self.assertLess(time.perf_counter() - start, 1.0)
+
+    def test_exception_reaches_every_caller(self):
+        def predict(images):
+            raise RuntimeError("model failed")
+
+        with MicroBatcher(predict, max_batch_size=2, max_wait_ms=50) as batcher:
+            futures = [batcher.submit(i) for i in range(2)]
+            for future in futures:
+                with self.assertRaises(RuntimeError):
+                    future.result()
+
+    def test_cancelled_jobs_are_skipped(self):
+        gate = threading.Event()
+        seen = []
+
+        def predict(images):
+            gate.wait()
+            seen.extend(images)
+            return images
+
+        with MicroBatcher(predict, max_batch_size=1, max_wait_ms=0) as batcher:
+            first = batcher.submit('first')   # Blocks the worker until the gate opens
+            time.sleep(0.05)
+            cancelled = batcher.submit('cancelled')
+            self.assertTrue(cancelled.cancel())
+            gate.set()
+            self.assertEqual(first.result(), 'first')
+        self.assertEqual(seen, ['first'])
+
+
+if __name__ == "__main__":
+    unittest.main()
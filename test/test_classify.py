@@ -0,0 +1,102 @@
+import unittest
+from unittest import mock
+from types import SimpleNamespace
+from pathlib import Path
+import tempfile
+import sys
+
+import numpy as np
+import cv2
+
+# Path arrangement
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+sys.path.insert(0, str(ROOT))  # for import modules
+
+from vision.plan_result import PlanResult, PlanBoxes
+
+try:
+    import vision.classify as classify
+except ImportError:  # ultralytics is not installed
+    classify = None
+
+try:
+    from ultralytics.utils.plotting import save_one_box
+    import torch
+except ImportError:
+    save_one_box = None
+
+NAMES = {0: 'door', 1: 'window'}
+
+
+class FakeClassifier:
+    """ Orientation from the shape of the crop (a numpy crop or a crop file), no model. """
+    names = {0: 'horizontal', 1: 'vertical'}
+
+    def predict(self, source, **kwargs):
+        predictions = []
+        for crop in source:
+            image = crop if isinstance(crop, np.ndarray) else cv2.imread(str(crop))
+            height, width = image.shape[:2]
+            predictions.append(SimpleNamespace(names=self.names, probs=SimpleNamespace(top1=0 if width > height else 1)))
+        return predictions
+
+
+@unittest.skipIf(classify is None or save_one_box is None, "needs ultralytics")
+class TestCropBox(unittest.TestCase):
+    def test_same_as_save_one_box(self):
+        image = np.random.default_rng(5).integers(0, 255, size=(200, 300, 3), dtype=np.uint8)
+        boxes = [[40.5, 60.25, 120.75, 90.5],  # Inside
+                 [0, 0, 30, 20], [2.5, 150, 40, 199.5],  # Expanded past the top / left / bottom edges
+                 [280.25, 10, 300, 60], [250, 170, 300, 200],  # Right edge and corner
+                 [0, 0, 300, 200]]  # Whole plan
+        for box in boxes:
+            expected = save_one_box(torch.tensor(box), image, BGR=True, save=False)  # As save_crop
+            crop = classify.crop_box(image, np.array(box, dtype=np.float64))
+            np.testing.assert_array_equal(crop, expected)
+
+
+@unittest.skipIf(classify is None, "vision.classify needs ultralytics")
+class TestClassifyOrientations(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.save_dir = Path(self.temp_dir.name) / 'predict'
+        self.patch = mock.patch.object(classify, 'get_model', lambda model_path, warmup=True: FakeClassifier())
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.temp_dir.cleanup()
+
+    def make_plan(self) -> PlanResult:
+        # Two wide doors and a window, the save_crop files of the doors are tall (re-encoded crops may disagree)
+        boxes = PlanBoxes([[10, 10, 60, 20], [100, 10, 150, 20], [10, 100, 20, 150]], [0, 0, 1])
+        plan = PlanResult(path=str(Path(self.temp_dir.name) / 'plan.png'), names=NAMES, boxes=boxes,
+                          orig_img=np.full((200, 200, 3), 255, dtype=np.uint8), save_dir=str(self.save_dir))
+        door_crops = self.save_dir / 'crops' / 'door'
+        door_crops.mkdir(parents=True)
+        for file_name in ('plan.jpg', 'plan2.jpg'):
+            cv2.imwrite(str(door_crops / file_name), np.full((40, 10, 3), 255, dtype=np.uint8))
+        return plan
+
+    def test_crop_files_when_not_in_memory(self):
+        plan = self.make_plan()
+        classify.classify_orientations([plan], model_path=Path('classify.pt'), object_names=['door', 'window'], in_memory=False)
+        per_class = classify.object_orientation_classify(root=ROOT, model_path=Path('classify.pt'), object_name='door', result=plan)
+        self.assertEqual(classify.get_cached_orientations(plan, 'door'), per_class)
+        self.assertEqual(per_class, ['vertical', 'vertical'])
+        # No window crop file: unknown, left to the per-class path
+        self.assertIsNone(classify.get_cached_orientations(plan, 'window'))
+
+    def test_in_memory(self):
+        plan = self.make_plan()
+        classify.classify_orientations([plan], model_path=Path('classify.pt'), object_names=['door', 'window'])
+        per_class = classify.object_orientation_classify(root=ROOT, model_path=Path('classify.pt'), object_name='door',
+                                                         result=plan, in_memory=True)
+        self.assertEqual(classify.get_cached_orientations(plan, 'door'), per_class)
+        self.assertEqual(per_class, ['horizontal', 'horizontal'])
+        self.assertEqual(classify.get_cached_orientations(plan, 'window'), ['vertical'])
+
+
+if __name__ == '__main__':
+    unittest.main()
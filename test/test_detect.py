@@ -0,0 +1,92 @@
+import unittest
+from unittest import mock
+from pathlib import Path
+import tempfile
+import sys
+
+import numpy as np
+import cv2
+
+# Path arrangement
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+sys.path.insert(0, str(ROOT))  # for import modules
+
+from vision.plan_result import PlanResult, PlanBoxes
+
+try:
+    import vision.detect as detect
+    import fengshui.assessment as assessment
+except ImportError:  # ultralytics is not installed
+    detect = None
+
+PLANS = 7
+
+
+class FakeStreamModel:
+    """ predict(stream=True) without a model: one result per file, lazily, recording what was released before each result. """
+    def __init__(self):
+        self.yielded = []
+        self.held_images = []  # Earlier results still holding their image, when each result is produced
+
+    def predict(self, source, stream=False, **kwargs):
+        assert stream
+        return self.stream(source)
+
+    def stream(self, source):
+        for image_path in source:
+            self.held_images.append(sum(result.orig_img is not None for result in self.yielded))
+            result = PlanResult(path=image_path, names={0: 'door'}, boxes=PlanBoxes([[10, 10, 50, 20]], [0]),
+                                orig_img=cv2.imread(image_path))
+            self.yielded.append(result)
+            yield result
+
+
+@unittest.skipIf(detect is None, "vision.detect needs ultralytics")
+class TestDetectStream(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.model_path = self.root / 'detect.pt'
+        self.model_path.write_bytes(b'weights')
+        self.image_paths = []
+        for index in range(PLANS):
+            image_path = self.root / f"plan_{index}.png"
+            cv2.imwrite(str(image_path), np.full((60, 80, 3), 255, dtype=np.uint8))
+            self.image_paths.append(image_path)
+        self.model = FakeStreamModel()
+        self.patch = mock.patch.object(detect, 'get_model', lambda model_path, warmup=True: self.model)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.temp_dir.cleanup()
+
+    def test_batches_in_source_order(self):
+        batches = detect.floor_plan_detect_stream(self.image_paths, self.model_path, batch_size=3, save_outputs=False)
+        self.assertEqual(len(self.model.yielded), 0)  # Lazy, nothing detected before the first batch is asked for
+
+        paths = [[result.path for result in batch] for batch in batches]
+        expected = [str(image_path) for image_path in self.image_paths]
+        self.assertEqual(paths, [expected[0:3], expected[3:6], expected[6:7]])
+
+    def test_images_released_after_each_batch(self):
+        def fake_classify(results, model_path, object_names, batch_size=32, in_memory=True):
+            for result in results:
+                result.orientation_labels = ['vertical'] * len(result.boxes)
+
+        # The real stream of vision.detect (model stubbed), only the classification is stubbed
+        with mock.patch.object(assessment, 'classify_orientations', fake_classify), \
+             mock.patch.object(assessment, 'DETECT_MODEL_PATH', self.model_path):
+            assessments = assessment.iter_assessments(self.image_paths, rules=assessment.get_rules(['door_to_door']),
+                                                      workers=1, stream=True, batch_size=3)
+            plans = [plan.path for plan, _, _ in assessments]
+
+        self.assertEqual(plans, [str(image_path) for image_path in self.image_paths])
+        # Inside a batch the images of the batch are held, the earlier batches are released before the next one
+        self.assertEqual(self.model.held_images, [0, 1, 2, 0, 1, 2, 0])
+        self.assertTrue(all(result.orig_img is None for result in self.model.yielded))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+from pathlib import Path
+import tempfile
+import sys
+
+import numpy as np
+import cv2
+
+# Path arrangement
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+sys.path.insert(0, str(ROOT))   # for import moduls
+
+from draw.draw_item import draw_points_line, PlanRenderer
+from draw.output_sink import OutputSink, DirectorySink, MemorySink, EncodedImage, encode_image, make_sink
+from fengshui.item import Item
+
+
+class TestDrawPointsLine(unittest.TestCase):
+    def test_same_pixels_as_circles(self):
+        rng = np.random.default_rng(0)
+        points = rng.integers(-2, 42, size=(300, 2))  # Some dots are partly outside the image
+        expected = np.zeros((40, 40, 3), np.uint8)
+        for point in points.tolist():
+            cv2.circle(expected, tuple(point), 1, (0, 255, 0), -1)
+
+        image = draw_points_line(np.zeros((40, 40, 3), np.uint8), points)
+        np.testing.assert_array_equal(image, expected)
+
+    def test_empty_line(self):
+        image = draw_points_line(np.zeros((5, 5), np.uint8), [])
+        self.assertEqual(image.shape, (5, 5, 3))
+
+
+class TestPlanRenderer(unittest.TestCase):
+    def test_render_keeps_the_plan(self):
+        plan = np.full((60, 80, 3), 255, np.uint8)
+        renderer = PlanRenderer(image=plan)
+        pair = {'items': [Item(x1=10, y1=20, x2=20, y2=30, name='door'), Item(x1=50, y1=20, x2=60, y2=30, name='door')],
+                'points_line': np.array([[x, 25] for x in range(20, 50)])}
+
+        image = renderer.render([pair], draw_lines=True)
+        self.assertTrue(np.all(plan == 255))
+        np.testing.assert_array_equal(image[25, 30], (0, 255, 0))
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            file_path = renderer.save(image, 'obstacle.png', sink=DirectorySink(Path(output_dir)))
+            np.testing.assert_array_equal(cv2.imread(str(file_path)), image)
+
+    def test_decodes_once(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            image_path = Path(output_dir) / 'plan.png'
+            cv2.imwrite(str(image_path), np.zeros((10, 10, 3), np.uint8))
+            renderer = PlanRenderer(image_path=image_path)
+            self.assertIs(renderer.image, renderer.image)
+
+
+class TestOutputSink(unittest.TestCase):
+    def setUp(self):
+        self.image = np.random.default_rng(0).integers(0, 255, size=(32, 48, 3), dtype=np.uint8)
+
+    def test_memory_sink(self):
+        output = MemorySink(format='png').save(self.image, 'obstacle_door_to_door_plan.jpg')
+        self.assertIsInstance(output, EncodedImage)
+        self.assertEqual(output.name, 'obstacle_door_to_door_plan.png')
+        decoded = cv2.imdecode(np.frombuffer(output.data, np.uint8), cv2.IMREAD_COLOR)
+        np.testing.assert_array_equal(decoded, self.image)  # PNG is lossless
+
+    def test_quality(self):
+        low = MemorySink(format='webp', quality=10).save(self.image, 'plan.jpg')
+        high = MemorySink(format='webp', quality=90).save(self.image, 'plan.jpg')
+        self.assertLess(len(low.data), len(high.data))
+
+    def test_directory_sink_names_do_not_collide(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            sink = make_sink('directory', output_dir=Path(output_dir))
+            first = sink.save(self.image, 'plan.jpg')
+            second = sink.save(self.image, 'plan.jpg')
+            self.assertEqual([first.name, second.name], ['plan.jpg', 'plan_1.jpg'])
+            self.assertEqual(second.read_bytes(), encode_image(self.image, '.jpg'))
+
+    def test_bmp_plan(self):
+        # Plans keep their own format by default, BMP has no quality flag
+        output = MemorySink().save(self.image, 'plan.bmp')
+        self.assertEqual(output.name, 'plan.bmp')
+        np.testing.assert_array_equal(cv2.imdecode(np.frombuffer(output.data, np.uint8), cv2.IMREAD_COLOR), self.image)
+        with tempfile.TemporaryDirectory() as output_dir:
+            file_path = DirectorySink(output_dir=Path(output_dir)).save(self.image, 'plan.bmp')
+            self.assertEqual(file_path.name, 'plan.bmp')
+            np.testing.assert_array_equal(cv2.imread(str(file_path)), self.image)
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            make_sink('s3')
+        with self.assertRaises(ValueError):
+            encode_image(self.image, '.xyz')
+
+    def test_sink_without_put(self):
+        class NoPutSink(OutputSink):
+            pass
+        with self.assertRaises(TypeError):
+            NoPutSink()
+
+
+if __name__ == '__main__':
+    unittest.main()
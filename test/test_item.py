@@ -0,0 +1,74 @@
+import unittest
+from pathlib import Path
+import random
+import copy
+import sys
+
+import numpy as np
+
+# Path arrangement
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+sys.path.insert(0, str(ROOT))   # for import moduls
+
+# Fengshui
+from fengshui.item import Item, ItemSet  # Core class vary important
+from overlap.overlap import overlap_rate_matrix, items_to_arrays
+
+
+def yolo_like_items(count, seed=0):
+    # Detector boxes are float32 values
+    rng = random.Random(seed)
+    items = []
+    for _ in range(count):
+        x1, y1 = rng.uniform(0, 900), rng.uniform(0, 900)
+        coords = np.array([x1, y1, x1 + rng.uniform(1, 120), y1 + rng.uniform(1, 120)], dtype=np.float32).tolist()
+        items.append(Item(*coords, name=rng.choice(['door', 'window']), orientation=rng.choice(['vertical', 'horizontal'])))
+    return items
+
+
+class TestItem(unittest.TestCase):
+    def test_slots(self):
+        item = Item(1, 2, 3, 4, 'door', 'vertical')
+        self.assertFalse(hasattr(item, '__dict__'))
+        self.assertEqual(repr(copy.deepcopy(item)), repr(item))
+
+
+class TestItemSet(unittest.TestCase):
+    def test_round_trip(self):
+        items = yolo_like_items(50)
+        item_set = ItemSet.from_items(items)
+        self.assertEqual(item_set.coords.dtype, np.float32)
+        self.assertEqual([repr(item) for item in item_set.to_items()], [repr(item) for item in items])
+        self.assertEqual(repr(item_set[3]), repr(items[3]))
+
+    def test_precomputed_values(self):
+        items = yolo_like_items(50, seed=1)
+        item_set = ItemSet.from_items(items)
+        projections = item_set.projections()
+        for index, item in enumerate(items):
+            center = item.get_center()
+            self.assertEqual(item_set.centers[index].tolist(), [center['center_X'], center['center_Y']])
+            self.assertEqual(projections[index].tolist(), [item.get_projection_values()['min'], item.get_projection_values()['max']])
+            self.assertEqual(item_set.lengths()[index], item.get_length_value())
+
+    def test_orientation_view(self):
+        item_set = ItemSet.from_items(yolo_like_items(20, seed=2))
+        view = item_set.with_orientation('horizontal')
+        self.assertTrue(np.shares_memory(view.coords, item_set.coords))
+        self.assertTrue(np.shares_memory(view.y_range, item_set.coords))
+        self.assertTrue(all(item.orientation == 'horizontal' for item in view.to_items()))
+        self.assertEqual(len(set(item.orientation for item in item_set.to_items())), 2)  # Original unchanged
+
+    def test_overlap_from_item_set(self):
+        items = yolo_like_items(30, seed=3)
+        item_set = ItemSet.from_items(items)
+        boxes, codes = items_to_arrays(items)
+        set_boxes, set_codes = items_to_arrays(item_set)
+        self.assertTrue(np.array_equal(set_codes, codes))
+        self.assertTrue(np.array_equal(overlap_rate_matrix(set_boxes, set_boxes, set_codes, set_codes)[0],
+                                       overlap_rate_matrix(boxes, boxes, codes, codes)[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from pathlib import Path
+import json
+import sys
+
+# Path arrangement
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+sys.path.insert(0, str(ROOT))   # for import moduls
+
+from metrics.metrics import MetricsRegistry, Histogram, trace
+
+
+class TestMetrics(unittest.TestCase):
+    def test_disabled_records_nothing(self):
+        registry = MetricsRegistry(enabled=False)
+        registry.inc('pairs_evaluated_total', 3)
+        with registry.span('overlap'):
+            pass
+        self.assertIs(registry.span('a'), registry.span('b'))  # Shared no-op span
+        self.assertEqual(registry.snapshot(), {'counters': [], 'histograms': []})
+
+    def test_counters_and_labels(self):
+        registry = MetricsRegistry(enabled=True)
+        registry.inc('cache_requests_total', cache='result', result='hit')
+        registry.inc('cache_requests_total', 2, cache='result', result='hit')
+        registry.inc('cache_requests_total', cache='result', result='miss')
+        counters = {counter['labels']['result']: counter['value'] for counter in registry.snapshot()['counters']}
+        self.assertEqual(counters, {'hit': 3, 'miss': 1})
+        json.loads(registry.to_json())
+
+    def test_histogram_buckets(self):
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+        self.assertEqual([count for _, count in histogram.cumulative()], [2, 3, 4])
+        self.assertAlmostEqual(histogram.sum, 3.65)
+
+    def test_prometheus_text(self):
+        registry = MetricsRegistry(enabled=True)
+        registry.inc('pairs_passed_total', 4, stage='obstacle')
+        registry.observe('stage_seconds', 0.002, stage='binarization')
+        text = registry.to_prometheus()
+        self.assertIn('# TYPE fengshui_pairs_passed_total counter', text)
+        self.assertIn('fengshui_pairs_passed_total{stage="obstacle"} 4', text)
+        self.assertIn('fengshui_stage_seconds_bucket{stage="binarization",le="0.0025"} 1', text)
+        self.assertIn('fengshui_stage_seconds_bucket{stage="binarization",le="+Inf"} 1', text)
+        self.assertIn('fengshui_stage_seconds_count{stage="binarization"} 1', text)
+
+    def test_trace_collects_spans(self):
+        registry = MetricsRegistry(enabled=True)
+        with trace('plan.jpg') as request_trace:
+            with registry.span('overlap'):
+                pass
+            with registry.span('obstacle'):
+                pass
+        with registry.span('drawing'):  # Outside the trace
+            pass
+        self.assertEqual(sorted(request_trace.totals()), ['obstacle', 'overlap'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,234 @@
+import unittest
+from pathlib import Path
+import shutil
+import tempfile
+import sys
+import os
+
+import numpy as np
+from PIL import Image
+import cv2
+
+# Path arrangement
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+sys.path.insert(0, str(ROOT))  # for import modules
+
+from fengshui.item import Item  # Core class vary important
+from obstacle.bin_cache import BinarizationCache
+from obstacle.binarization import BINARIZATION_BACKENDS, parity_report
+from obstacle.obstacle import floor_plan_binarization
+from obstacle.obstacle import get_binarized_floor_plan
+from obstacle.obstacle import items_obstacle_detect
+from obstacle.obstacle import BIN_CACHE
+from obstacle.obstacle import bresenham_line
+from obstacle.obstacle import bresenham_line_reference
+from obstacle.obstacle import points_check
+from obstacle.obstacle import points_check_reference
+from obstacle.obstacle import LineScanner
+from obstacle.obstacle import scan_obstacle
+from obstacle.obstacle import pair_obstacle_detect
+
+TEST_IMAGE = ROOT / 'test' / 'images' / 'FloorPlan (2).jpg'
+
+
+class TestBinarizationCache(unittest.TestCase):
+    def setUp(self):
+        BIN_CACHE.clear()
+
+    def test_binarize_once(self):
+        calls = []
+
+        def loader(image_path, **params):
+            calls.append(image_path)
+            return floor_plan_binarization(image_path, **params)
+
+        cache = BinarizationCache()
+        first = cache.get(TEST_IMAGE, loader)
+        second = cache.get(TEST_IMAGE, loader)
+        self.assertIs(first, second)
+        self.assertEqual(len(calls), 1)
+        self.assertFalse(first.flags.writeable)
+
+        # Other parameters are another entry
+        cache.get(TEST_IMAGE, loader, threshold=100)
+        self.assertEqual(len(calls), 2)
+
+    def test_mtime_invalidates(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            image_path = Path(temp_dir) / TEST_IMAGE.name
+            shutil.copy(TEST_IMAGE, image_path)
+
+            cache = BinarizationCache()
+            cache.get(image_path, floor_plan_binarization)
+            stat = os.stat(image_path)
+            os.utime(image_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            cache.get(image_path, floor_plan_binarization)
+            self.assertEqual(cache.stats()['misses'], 2)
+
+    def test_lru_eviction_by_bytes(self):
+        cache = BinarizationCache(max_bytes=250)
+        loader = lambda image_path, size: np.zeros(size, np.uint8)
+        cache.get(TEST_IMAGE, loader, size=100)
+        cache.get(TEST_IMAGE, loader, size=101)
+        cache.get(TEST_IMAGE, loader, size=100)  # refresh, 101 becomes the oldest
+        cache.get(TEST_IMAGE, loader, size=102)
+        self.assertEqual(len(cache), 2)
+        self.assertLessEqual(cache.current_bytes, 250)
+        cache.get(TEST_IMAGE, loader, size=100)
+        self.assertEqual(cache.stats()['hits'], 2)
+
+    def test_copy_is_private(self):
+        floor_plan = get_binarized_floor_plan(TEST_IMAGE)
+        floor_plan[:] = 0
+        self.assertTrue(np.array_equal(get_binarized_floor_plan(TEST_IMAGE), floor_plan_binarization(TEST_IMAGE)))
+
+    def test_detect_same_as_uncached(self):
+        items = [Item(4.2847514152526855, 103.40266418457031, 83.41145324707031, 206.95797729492188, 'entrance', 'horizontal'),
+                 Item(335.0831604003906, 69.35748291015625, 541.446044921875, 300.3077392578125, 'kitchen', 'horizontal')]
+        first = items_obstacle_detect(image_path=TEST_IMAGE, items=items)
+        second = items_obstacle_detect(image_path=TEST_IMAGE, items=items)
+        self.assertEqual(first['rate'], second['rate'])
+        self.assertEqual(BIN_CACHE.stats()['misses'], 1)
+
+
+class TestBinarizationBackends(unittest.TestCase):
+    def setUp(self):
+        BIN_CACHE.clear()
+
+    def test_exact_is_original_pipeline(self):
+        image = cv2.cvtColor(np.array(Image.open(TEST_IMAGE)), cv2.COLOR_BGR2GRAY)
+        blur = cv2.bilateralFilter(image, 10, 100, 1000)
+        kernel = np.ones((3, 3), np.uint8)
+        ret, expected = cv2.threshold(cv2.dilate(cv2.erode(blur, kernel), kernel), 70, 255, cv2.THRESH_BINARY)
+        self.assertTrue(np.array_equal(floor_plan_binarization(TEST_IMAGE), expected))
+
+    def test_every_backend_is_binary(self):
+        shape = floor_plan_binarization(TEST_IMAGE).shape
+        for backend in BINARIZATION_BACKENDS:
+            with self.subTest(backend=backend):
+                bin_image = floor_plan_binarization(TEST_IMAGE, backend=backend)
+                self.assertEqual(bin_image.shape, shape)
+                self.assertEqual(bin_image.dtype, np.uint8)
+                self.assertTrue(set(np.unique(bin_image).tolist()) <= {0, 255})
+
+    def test_backend_in_cache_key(self):
+        get_binarized_floor_plan(TEST_IMAGE)
+        get_binarized_floor_plan(TEST_IMAGE, backend='exact')
+        get_binarized_floor_plan(TEST_IMAGE, backend='fast')
+        self.assertEqual(BIN_CACHE.stats()['misses'], 2)
+
+    def test_parity_report(self):
+        report = parity_report([TEST_IMAGE], backends=['fast'])
+        self.assertEqual(report['exact']['agreement'], 1.0)
+        self.assertGreater(report['fast']['agreement'], 0.95)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            floor_plan_binarization(TEST_IMAGE, backend='gpu')
+
+
+class TestRoiBinarization(unittest.TestCase):
+    def test_whole_plan_by_default(self):
+        items = [Item(100, 100, 150, 120, 'door', 'vertical'), Item(100, 300, 150, 320, 'door', 'vertical')]
+        result = items_obstacle_detect(image_path=TEST_IMAGE, items=items)
+        self.assertEqual(result['bin_image_np_arrary'].shape, get_binarized_floor_plan(TEST_IMAGE).shape)
+
+    def test_same_as_whole_plan(self):
+        rng = np.random.default_rng(3)
+        height, width = 1122, 1162
+        for _ in range(20):
+            x, y = rng.uniform(0, width - 5, 2), rng.uniform(0, height - 5, 2)
+            w, h = rng.uniform(2, 300, 2), rng.uniform(2, 300, 2)
+            pair = lambda orientation: [Item(x[i], y[i], min(x[i] + w[i], width), min(y[i] + h[i], height), 'door', orientation) for i in range(2)]
+            items_per_orientation = [pair('vertical'), pair('horizontal')]
+
+            roi_results = pair_obstacle_detect(TEST_IMAGE, items_per_orientation, roi=True)
+            full_results = pair_obstacle_detect(TEST_IMAGE, items_per_orientation, roi=False)
+
+            for roi_result, full_result in zip(roi_results, full_results):
+                self.assertEqual((roi_result['rate'], roi_result['obstacle_type']), (full_result['rate'], full_result['obstacle_type']))
+                self.assertIsNone(roi_result['bin_image_np_arrary'])  # Only the corridor was binarized
+                self.assertIs(full_result['bin_region_np_array'], full_result['bin_image_np_arrary'])
+                self.assertEqual(full_result['region_origin'], (0, 0))
+                origin_x, origin_y = roi_result['region_origin']
+                roi_height, roi_width = roi_result['bin_region_np_array'].shape
+                self.assertTrue(np.array_equal(roi_result['bin_region_np_array'],
+                                               full_result['bin_image_np_arrary'][origin_y:origin_y + roi_height, origin_x:origin_x + roi_width]))
+
+
+class TestBresenhamLine(unittest.TestCase):
+    def test_same_as_reference(self):
+        for x0, y0 in [(0, 0), (7, 3)]:
+            for x1 in range(-30, 31):
+                for y1 in range(-30, 31):
+                    points_line = bresenham_line(x0, y0, x1, y1)
+                    self.assertEqual(points_line.dtype, np.int32)
+                    self.assertEqual(points_line.tolist(), [list(point) for point in bresenham_line_reference(x0, y0, x1, y1)])
+
+    def test_single_point(self):
+        self.assertEqual(bresenham_line(5, 5, 5, 5).tolist(), [[5, 5]])
+
+
+class TestPointsCheck(unittest.TestCase):
+    def test_same_as_reference(self):
+        rng = np.random.default_rng(0)
+        floor_plan = np.where(rng.random((120, 160)) < 0.3, 0, 255).astype(np.uint8)
+        for _ in range(50):
+            # Keep the line away from the right / bottom edge (the reference raises IndexError there)
+            x0, x1 = rng.integers(0, 120, size=2)
+            y0, y1 = rng.integers(0, 85, size=2)
+            points_line = bresenham_line(int(x0), int(y0), int(x1), int(y1))
+            for orientation in ['vertical', 'horizontal']:
+                for scan_range in [0, 1, 7, 30, 60]:
+                    with self.subTest(line=(x0, y0, x1, y1), orientation=orientation, scan_range=scan_range):
+                        self.assertEqual(points_check(floor_plan, points_line, scan_range, orientation),
+                                         points_check_reference(floor_plan, points_line, scan_range, orientation))
+
+    def test_empty_line(self):
+        floor_plan = np.zeros((10, 10), np.uint8)
+        self.assertEqual(points_check(floor_plan, [], 5, 'vertical'), 0)
+
+
+class TestDecisionMode(unittest.TestCase):
+    def test_chunk_max_same_as_full(self):
+        rng = np.random.default_rng(1)
+        floor_plan = np.where(rng.random((120, 160)) < 0.3, 0, 255).astype(np.uint8)
+        for _ in range(30):
+            x0, x1 = rng.integers(0, 160, size=2)
+            y0, y1 = rng.integers(0, 120, size=2)
+            points_line = bresenham_line(int(x0), int(y0), int(x1), int(y1))
+            for orientation in ['vertical', 'horizontal']:
+                scanner = LineScanner(floor_plan, points_line, orientation)
+                for scan_range in [-4, 0, 1, 7, 60, 400]:
+                    with self.subTest(line=(x0, y0, x1, y1), orientation=orientation, scan_range=scan_range):
+                        self.assertEqual(max(scanner.iter_chunk_max(scan_range, chunk_size=16)), scanner.max_black_points(scan_range))
+
+    def test_same_decision_as_full(self):
+        rng = np.random.default_rng(2)
+        floor_plan = np.where(rng.random((300, 300)) < 0.2, 0, 255).astype(np.uint8)
+        for _ in range(40):
+            x, y = rng.integers(0, 200, size=(2, 2))
+            size = rng.integers(5, 90, size=(2, 2))
+            orientation = ['vertical', 'horizontal'][int(rng.integers(0, 2))]
+            items = [Item(x[0], y[0], x[0] + size[0][0], y[0] + size[0][1], 'door', orientation),
+                     Item(x[1], y[1], x[1] + size[1][0], y[1] + size[1][1], 'door', orientation)]
+            points_line = bresenham_line(*[int(v) for v in items[0].get_center().values()], *[int(v) for v in items[1].get_center().values()])
+            for threshold in [0.2, 0.5, 0.8]:
+                full = scan_obstacle(floor_plan, points_line, items, mode='full')
+                decision = scan_obstacle(floor_plan, points_line, items, mode='decision', obstacle_threshold=threshold)
+                self.assertEqual(decision['obstacle_type'], full['obstacle_type'])
+                self.assertEqual(decision['rate'] <= threshold, full['rate'] <= threshold)
+                if decision['exact']:
+                    self.assertEqual(decision['rate'], full['rate'])
+                else:
+                    self.assertLessEqual(decision['rate'], full['rate'])
+
+    def test_unknown_mode(self):
+        items = [Item(0, 0, 10, 10, 'door', 'vertical'), Item(20, 0, 30, 10, 'door', 'vertical')]
+        with self.assertRaises(ValueError):
+            scan_obstacle(np.zeros((40, 40), np.uint8), bresenham_line(5, 5, 25, 5), items, mode='fast')
+
+
+if __name__ == "__main__":
+    unittest.main()
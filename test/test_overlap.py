@@ -1,5 +1,6 @@
 import unittest
 from pathlib import Path
+import random
 import sys  
 
 # Path arrangement
@@ -10,6 +11,8 @@ sys.path.insert(0, str(ROOT))   # for import moduls
 # Fengshui 
 from fengshui.item import Item  # Core class vary important
 from overlap.overlap import overlap_rate
+from overlap.overlap import overlap_candidates_one_item, overlap_candidates_two_item
+from overlap.overlap import overlap_rate_matrix, overlap_results_for_pairs, items_to_arrays
 
 
 class TestOverlapeCal(unittest.TestCase):
@@ -102,5 +105,74 @@ class TestOverlapeCal(unittest.TestCase):
         with self.assertRaises(ValueError):
             overlap_rate(items=items)
 
+def random_items(rng, count, name):
+    items = []
+    for _ in range(count):
+        # Small integer grid so that touching and identical projections happen
+        x1, y1 = rng.randint(0, 60), rng.randint(0, 60)
+        items.append(Item(x1=x1, y1=y1, x2=x1 + rng.randint(0, 15), y2=y1 + rng.randint(0, 15),
+                          orientation=rng.choice(['vertical', 'horizontal']), name=name))
+    return items
+
+def passed(overlap_results, threshold=0.5):
+    return [(res['items'][0], res['items'][1], res['rate'], res['full_coverage'])
+            for res in overlap_results if res['full_coverage'] or res['rate'] >= threshold]
+
+
+class TestOverlapCandidates(unittest.TestCase):
+    def test_one_item_same_filtered_set(self):
+        rng = random.Random(0)
+        for _ in range(30):
+            items = random_items(rng, 40, 'door')
+            brute = [overlap_rate(items=[items[i], items[j]]) for i in range(len(items)) for j in range(i + 1, len(items))]
+            sweep = [overlap_rate(items=[items[i], items[j]]) for i, j in overlap_candidates_one_item(items)]
+            for threshold in [0.01, 0.5, 1.0]:
+                self.assertEqual(passed(brute, threshold), passed(sweep, threshold))
+
+    def test_two_item_same_filtered_set(self):
+        rng = random.Random(1)
+        for _ in range(30):
+            items_one = random_items(rng, 15, 'entrance')
+            items_two = random_items(rng, 25, 'kitchen')
+            brute = [overlap_rate(items=[one, two]) for one in items_one for two in items_two]
+            sweep = [overlap_rate(items=[items_one[i], items_two[j]]) for i, j in overlap_candidates_two_item(items_one, items_two)]
+            for threshold in [0.01, 0.5, 1.0]:
+                self.assertEqual(passed(brute, threshold), passed(sweep, threshold))
+
+    def test_invalid_orientation(self):
+        with self.assertRaises(ValueError):
+            overlap_candidates_one_item([Item(), Item()])
+
+
+class TestOverlapBatch(unittest.TestCase):
+    def test_matrix_same_as_scalar(self):
+        rng = random.Random(2)
+        items_one = random_items(rng, 30, 'door') + [Item(x1=100.001, y1=100.0, x2=200.3910, y2=200.0, orientation='vertical', name='door')]
+        items_two = random_items(rng, 35, 'door') + [Item(x1=150.004, y1=300.0, x2=250.3041, y2=800.0, orientation='vertical', name='door')]
+        boxes_one, codes_one = items_to_arrays(items_one)
+        boxes_two, codes_two = items_to_arrays(items_two)
+        rates, full_coverages = overlap_rate_matrix(boxes_one, boxes_two, codes_one, codes_two)
+        self.assertEqual(rates.shape, (len(items_one), len(items_two)))
+        for i, one in enumerate(items_one):
+            for j, two in enumerate(items_two):
+                result = overlap_rate(items=[one, two])
+                self.assertEqual(rates[i, j], result['rate'])
+                self.assertEqual(bool(full_coverages[i, j]), result['full_coverage'])
+
+    def test_pairs_same_as_scalar(self):
+        rng = random.Random(3)
+        items = random_items(rng, 30, 'door')
+        pairs = [(i, j) for i in range(len(items)) for j in range(len(items))]
+        for (i, j), result in zip(pairs, overlap_results_for_pairs(items, items, pairs)):
+            expected = overlap_rate(items=[items[i], items[j]])
+            self.assertEqual((result['rate'], result['full_coverage']), (expected['rate'], expected['full_coverage']))
+            self.assertIs(result['items'][0], items[i])
+
+    def test_invalid_orientation(self):
+        boxes, codes = items_to_arrays([Item(), Item()])
+        with self.assertRaises(ValueError):
+            overlap_rate_matrix(boxes, boxes, codes, codes)
+
+
 if __name__ == "__main__":
     unittest.main()
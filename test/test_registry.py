@@ -0,0 +1,79 @@
+import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import threading
+import tempfile
+import time
+import sys
+
+# Path arrangement
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+sys.path.insert(0, str(ROOT))  # for import modules
+
+try:
+    import vision.registry as registry
+except ImportError:  # ultralytics is not installed
+    registry = None
+
+
+class FakeYOLO:
+    """ Slow loader counting the loads, no weights are read. """
+    loads = 0
+    lock = threading.Lock()
+
+    def __init__(self, model_path: str):
+        time.sleep(0.05)  # Long enough for the other threads to ask for the same file
+        with FakeYOLO.lock:
+            FakeYOLO.loads += 1
+        self.model_path = model_path
+        self.predictions = 0
+
+    def predict(self, source, **kwargs):
+        self.predictions += 1
+        return []
+
+
+@unittest.skipIf(registry is None, "vision.registry needs ultralytics")
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.detect = Path(self.temp_dir.name) / 'detect.pt'
+        self.classify = Path(self.temp_dir.name) / 'classify.pt'
+        FakeYOLO.loads = 0
+        self.patch = mock.patch.object(registry, 'YOLO', FakeYOLO)
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.temp_dir.cleanup()
+
+    def test_loaded_once_under_concurrent_get(self):
+        models = registry.ModelRegistry()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            loaded = list(executor.map(lambda _: models.get(self.detect), range(16)))
+
+        self.assertEqual(FakeYOLO.loads, 1)
+        self.assertTrue(all(model is loaded[0] for model in loaded))
+        self.assertEqual(loaded[0].predictions, 1)  # Warmed up once
+        self.assertIn(self.detect, models)
+        self.assertEqual(models.loaded(), [str(self.detect.resolve())])
+
+    def test_unload(self):
+        models = registry.ModelRegistry()
+        detect = models.get(self.detect, warmup=False)
+        models.get(self.classify, warmup=False)
+
+        models.unload(self.detect)
+        self.assertNotIn(self.detect, models)
+        self.assertIn(self.classify, models)
+        self.assertIsNot(models.get(self.detect, warmup=False), detect)  # Loaded again on the next use
+        self.assertEqual(FakeYOLO.loads, 3)
+
+        models.unload()
+        self.assertEqual(models.loaded(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+from unittest import mock
+from pathlib import Path
+import tempfile
+import sys
+import os
+
+import numpy as np
+
+# Path arrangement
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+sys.path.insert(0, str(ROOT))  # for import modules
+
+from fengshui.result_cache import ResultCache, make_key
+from vision.plan_result import PlanResult, PlanBoxes
+
+TEST_IMAGE = ROOT / 'test' / 'images' / 'FloorPlan (2).jpg'
+NAMES = {0: 'door', 1: 'window'}
+
+
+def make_plan() -> PlanResult:
+    boxes = PlanBoxes(xyxy=[[0, 0, 10, 10], [20, 20, 40, 30]], cls=[0, 1], conf=[0.9, 0.8])
+    return PlanResult(str(TEST_IMAGE), NAMES, boxes, orientation_labels=['vertical', None])
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.model = self.root / 'model.pt'
+        self.model.write_bytes(b'weights')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_key_changes_with_inputs(self):
+        key = make_key(TEST_IMAGE, [self.model], {'threshold': 0.5})
+        self.assertEqual(key, make_key(TEST_IMAGE.read_bytes(), [self.model], {'threshold': 0.5}))
+        self.assertNotEqual(key, make_key(b'other image', [self.model], {'threshold': 0.5}))
+        self.assertNotEqual(key, make_key(TEST_IMAGE, [self.model], {'threshold': 0.6}))
+
+        other_model = self.root / 'other.pt'
+        other_model.write_bytes(b'other weights')
+        self.assertNotEqual(key, make_key(TEST_IMAGE, [other_model], {'threshold': 0.5}))
+
+    def test_missing_model_keeps_its_last_hash(self):
+        cache = ResultCache(cache_dir=self.root / 'cache')
+        key = make_key(TEST_IMAGE, [self.model], {}, model_hashes=cache.model_hashes([self.model]))
+        self.model.unlink()
+        # The same key without the weights, from a new instance reading the recorded hash
+        self.assertEqual(key, make_key(TEST_IMAGE, [self.model], {}, model_hashes=ResultCache(cache_dir=self.root / 'cache').model_hashes([self.model])))
+        never_seen = self.root / 'never_seen.pt'
+        self.assertEqual(cache.model_hashes([never_seen]), ['missing'])
+
+    def test_round_trip(self):
+        cache = ResultCache(cache_dir=self.root / 'cache')
+        rendered = self.root / 'obstacle_door_to_door.jpg'
+        rendered.write_bytes(b'jpeg bytes')
+        summaries = {'door_to_door': {'overlap': [], 'obstacle': [[[['door', 0, 0, 10, 10, 'vertical']] * 2, 0.1, 'No Obstacle']]},
+                     'entrance_to_kitchen': None}
+
+        key = make_key(TEST_IMAGE, [self.model], {})
+        self.assertIsNone(cache.get(key))
+        cache.put(key, make_plan(), {'door_to_door': rendered, 'entrance_to_kitchen': None}, summaries)
+
+        output_dir = self.root / 'output'
+        output_dir.mkdir()
+        cached = cache.get(key, output_dir=output_dir)
+        self.assertEqual(cached['outputs']['door_to_door'], output_dir / rendered.name)
+        self.assertEqual(cached['outputs']['door_to_door'].read_bytes(), b'jpeg bytes')
+        self.assertIsNone(cached['outputs']['entrance_to_kitchen'])
+        self.assertEqual(cached['summaries'], summaries)
+        self.assertEqual(cached['names'], NAMES)
+        self.assertEqual(cached['orientation_labels'], ['vertical', None])
+        self.assertTrue(np.array_equal(cached['boxes']['xyxy'], make_plan().boxes.xyxy))
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_entry_evicted_while_read_is_a_miss(self):
+        cache = ResultCache(cache_dir=self.root / 'cache')
+        rendered = self.root / 'obstacle_door_to_door.jpg'
+        rendered.write_bytes(b'jpeg bytes')
+        key = make_key(TEST_IMAGE, [self.model], {})
+        cache.put(key, make_plan(), {'door_to_door': rendered}, {'door_to_door': None})
+
+        cached = cache.get(key)
+        self.assertEqual(cached['outputs']['door_to_door'].data, b'jpeg bytes')  # In memory, safe from eviction
+
+        (cache.entry_dir(key) / rendered.name).unlink()
+        self.assertIsNone(cache.get(key))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_lru_eviction_by_size(self):
+        cache = ResultCache(cache_dir=self.root / 'cache')
+        rendered = self.root / 'rendered.jpg'
+        rendered.write_bytes(b'x' * 10000)
+
+        keys = [make_key(bytes([i]), [self.model], {}) for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.put(key, make_plan(), {'rule': rendered}, {'rule': None})
+            os.utime(cache.entry_dir(key) / 'meta.json', (i, i))  # Deterministic use order
+        cache.get(keys[0])  # Most recently used now
+        cache.max_bytes = cache.stats()['bytes'] - 1  # One entry has to go
+        cache.evict()
+        self.assertIsNotNone(cache.get(keys[0]))
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertIsNotNone(cache.get(keys[2]))
+
+    def test_put_keeps_a_running_total(self):
+        cache = ResultCache(cache_dir=self.root / 'cache')
+        rendered = self.root / 'rendered.jpg'
+        rendered.write_bytes(b'x' * 10000)
+
+        with mock.patch.object(cache, 'entries', wraps=cache.entries) as entries:
+            for i in range(3):
+                cache.put(make_key(bytes([i]), [self.model], {}), make_plan(), {'rule': rendered}, {'rule': None})
+            self.assertEqual(entries.call_count, 0)  # No scan while under max_bytes
+        self.assertEqual(cache._total_bytes, cache.stats()['bytes'])
+        self.assertEqual(ResultCache(cache_dir=self.root / 'cache')._total_bytes, cache.stats()['bytes'])  # Rebuilt at start
+
+        cache.max_bytes = cache._total_bytes  # The next entry goes over
+        cache.put(make_key(b'new', [self.model], {}), make_plan(), {'rule': rendered}, {'rule': None})
+        self.assertLessEqual(cache.stats()['bytes'], cache.max_bytes)
+        self.assertEqual(cache._total_bytes, cache.stats()['bytes'])
+
+
+if __name__ == "__main__":
+    unittest.main()
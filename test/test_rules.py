@@ -0,0 +1,121 @@
+import unittest
+from unittest import mock
+from pathlib import Path
+import tempfile
+import sys
+
+import numpy as np
+import cv2
+
+# Path arrangement
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+sys.path.insert(0, str(ROOT))   # for import moduls
+
+from fengshui.rules import Rule, RULE_REGISTRY, register_rule, get_rules, plan_classes, DEFAULT_RULE_NAMES
+from vision.plan_result import PlanResult, PlanBoxes
+from obstacle.bin_cache import BinarizationCache
+from draw.output_sink import MemorySink, DirectorySink
+from fengshui.result_cache import ResultCache
+
+try:
+    import fengshui.assessment as assessment
+except ImportError:  # ultralytics is not installed
+    assessment = None
+
+
+class TestRules(unittest.TestCase):
+    def tearDown(self):
+        RULE_REGISTRY.pop('bed_to_door', None)
+
+    def test_default_rules(self):
+        rules = get_rules(DEFAULT_RULE_NAMES)
+        self.assertEqual([rule.name for rule in rules], ['door_to_door', 'entrance_to_kitchen'])
+        self.assertEqual(rules[1].orient_check, {'entrance': True, 'kitchen': False})
+
+    def test_register_and_plan(self):
+        register_rule(Rule(name='bed_to_door', objects_name=['bed', 'door'], orient_check={'bed': False, 'door': True}))
+        rules = get_rules(DEFAULT_RULE_NAMES + ['bed_to_door'])
+        self.assertEqual(plan_classes(rules), ['door', 'entrance', 'kitchen', 'bed'])
+
+    def test_shared_overlap_key(self):
+        strict = Rule(name='a', objects_name=['door'], orient_check={'door': True}, overlap_threshold=0.8)
+        loose = Rule(name='b', objects_name=['door'], orient_check={'door': True}, overlap_threshold=0.3)
+        self.assertEqual(strict.overlap_key(), loose.overlap_key())
+
+    def test_invalid_rule(self):
+        with self.assertRaises(ValueError):
+            Rule(name='bad', objects_name=['door', 'window', 'bed'], orient_check={'door': True, 'window': True, 'bed': True})
+        with self.assertRaises(ValueError):
+            Rule(name='bad', objects_name=['door'], orient_check={})
+
+
+def make_plan(image_path: Path) -> PlanResult:
+    """ Three stacked doors (a wall between the 2nd and the 3rd), an entrance above a kitchen. Labels as classify_orientations caches them. """
+    boxes = [[100, 20, 140, 30], [100, 130, 140, 140], [105, 260, 140, 270], [250, 20, 290, 30], [240, 150, 300, 250]]
+    plan = PlanResult(path=str(image_path), names={0: 'door', 1: 'entrance', 2: 'kitchen'}, boxes=PlanBoxes(boxes, [0, 0, 0, 1, 2]))
+    plan.orientation_labels = ['vertical', 'vertical', 'vertical', 'vertical', 'horizontal']
+    return plan
+
+
+@unittest.skipIf(assessment is None, "fengshui.assessment needs ultralytics")
+class TestAssessPlan(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.image_path = Path(self.temp_dir.name) / 'plan.png'
+        image = np.full((300, 400, 3), 255, dtype=np.uint8)
+        cv2.line(image, (60, 200), (180, 200), (0, 0, 0), 4)
+        cv2.imwrite(str(self.image_path), image)
+        # door_to_door and door_to_door_loose share their overlap results and obstacle scans
+        self.rules = get_rules(DEFAULT_RULE_NAMES) + [Rule(name='door_to_door_loose', objects_name=['door'],
+                                                           orient_check={'door': True}, overlap_threshold=0.3)]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def assess(self, rules):
+        """ assess_plan with a fresh binarization cache, counting the overlap passes and the pair scans. """
+        with mock.patch.object(assessment.obstacle_settings, 'BIN_CACHE', BinarizationCache()) as bin_cache, \
+             mock.patch.object(assessment, 'get_overlap_results_one_item', wraps=assessment.get_overlap_results_one_item) as overlaps, \
+             mock.patch.object(assessment, 'pair_obstacle_detect', wraps=assessment.pair_obstacle_detect) as scans:
+            outputs, summaries = assessment.assess_plan(make_plan(self.image_path), rules=rules, sink=MemorySink())
+        return outputs, summaries, {'binarizations': bin_cache.misses, 'overlaps': overlaps.call_count, 'scans': scans.call_count}
+
+    def test_shared_work_matches_rule_by_rule(self):
+        outputs, summaries, counts = self.assess(self.rules)
+
+        baseline_counts = {'binarizations': 0, 'overlaps': 0, 'scans': 0}
+        for rule in self.rules:
+            rule_outputs, rule_summaries, rule_counts = self.assess([rule])
+            self.assertEqual(summaries[rule.name], rule_summaries[rule.name])
+            self.assertEqual(outputs[rule.name].data, rule_outputs[rule.name].data)
+            for name in baseline_counts:
+                baseline_counts[name] += rule_counts[name]
+
+        self.assertEqual(len(summaries['door_to_door']['overlap']), 3)
+        self.assertEqual(len(summaries['door_to_door']['obstacle']), 1)  # The wall blocks two pairs
+        self.assertEqual(counts, {'binarizations': 1, 'overlaps': 1, 'scans': 4})  # 3 door pairs, 1 entrance / kitchen pair
+        self.assertEqual(baseline_counts, {'binarizations': 3, 'overlaps': 2, 'scans': 7})
+
+    def test_overlap_images_only_for_persistent_sinks(self):
+        outputs, _, _ = self.assess(self.rules)
+        self.assertEqual(sorted(outputs), sorted(rule.name for rule in self.rules))  # Nothing rendered for nobody
+
+        output_dir = Path(self.temp_dir.name) / 'output'
+        outputs, summaries = assessment.assess_plan(make_plan(self.image_path), rules=self.rules, sink=DirectorySink(output_dir))
+        self.assertIn('door_to_door' + assessment.OVERLAP_OUTPUT_SUFFIX, outputs)
+        written = sorted(path.name for path in output_dir.iterdir())
+        self.assertEqual(written, sorted(output.name for output in outputs.values() if output is not None))
+
+        # A cache hit gives back the same files as the miss
+        cache = ResultCache(cache_dir=Path(self.temp_dir.name) / 'cache')
+        cache.put('key', make_plan(self.image_path), outputs, summaries)
+        restored_dir = Path(self.temp_dir.name) / 'restored'
+        restored_dir.mkdir()
+        cached = cache.get('key', output_dir=restored_dir)
+        self.assertEqual(sorted(cached['outputs']), sorted(outputs))
+        self.assertEqual(sorted(path.name for path in restored_dir.iterdir()), written)
+
+
+if __name__ == "__main__":
+    unittest.main()
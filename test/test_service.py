@@ -0,0 +1,128 @@
+import unittest
+from unittest import mock
+from pathlib import Path
+import tempfile
+import asyncio
+import time
+import sys
+
+import numpy as np
+import cv2
+
+# Path arrangement
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+sys.path.insert(0, str(ROOT))  # for import modules
+
+from vision.plan_result import PlanResult, PlanBoxes
+
+try:
+    import fengshui.service as service
+except ImportError:  # ultralytics is not installed
+    service = None
+
+NAMES = {0: 'door'}
+
+
+def fake_detect(images):
+    """ Detector of the MicroBatcher: one door per image, no model. """
+    time.sleep(0.01)
+    return [PlanResult(path='', names=NAMES, boxes=PlanBoxes([[10, 10, 20, 30]], [0]), orig_img=image) for image in images]
+
+def fake_classify(plan, rules):
+    plan.orientation_labels = ['vertical'] * len(plan.boxes)
+
+
+@unittest.skipIf(service is None, "fengshui.service needs ultralytics")
+class TestAssessmentService(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.base_dir = Path(self.temp_dir.name) / 'workspaces'
+        self.plan_bytes = cv2.imencode('.png', np.full((64, 64, 3), 255, dtype=np.uint8))[1].tobytes()
+        self.analysis_seconds = 0.0
+        self.workspace_during_analysis = []
+
+        def fake_analyse(plan, rules, cache_key=None):
+            time.sleep(self.analysis_seconds)
+            self.workspace_during_analysis.append(Path(plan.path).exists())  # Files not removed under a running stage
+            return {rule.name: b'image' for rule in rules}
+
+        self.patches = [mock.patch.object(service, 'detect_images', fake_detect),
+                        mock.patch.object(service, 'classify_plan', fake_classify),
+                        mock.patch.object(service, 'analyse_plan', fake_analyse),
+                        mock.patch.object(service, 'load_models', lambda: None)]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        self.temp_dir.cleanup()
+
+    def make_service(self, **kwargs) -> "service.AssessmentService":
+        return service.AssessmentService(base_dir=self.base_dir, use_cache=False, cpu_workers=2, **kwargs)
+
+    def workspaces(self) -> list:
+        return list(self.base_dir.iterdir()) if self.base_dir.exists() else []
+
+    def test_assess_and_cleanup(self):
+        async def main():
+            async with self.make_service() as assessment_service:
+                outputs = await assessment_service.assess(self.plan_bytes, 'plan.png')
+                return outputs, assessment_service.stats()
+
+        outputs, stats = asyncio.run(main())
+        self.assertEqual(outputs, {'door_to_door': b'image', 'entrance_to_kitchen': b'image'})
+        self.assertEqual(stats['completed'], 1)
+        self.assertEqual(self.workspaces(), [])
+
+    def test_busy_requests_rejected(self):
+        self.analysis_seconds = 0.2
+
+        async def main():
+            async with self.make_service(max_concurrent=1, max_pending=1) as assessment_service:
+                results = await asyncio.gather(*[assessment_service.assess(self.plan_bytes, f'plan{i}.png') for i in range(4)],
+                                               return_exceptions=True)
+                return results, assessment_service.stats()
+
+        results, stats = asyncio.run(main())
+        rejected = [result for result in results if isinstance(result, service.ServiceBusy)]
+        self.assertEqual(len(rejected), 2)  # 1 active + 1 waiting are admitted
+        self.assertEqual((stats['completed'], stats['rejected'], stats['waiting'], stats['active']), (2, 2, 0, 0))
+        self.assertEqual(self.workspaces(), [])
+
+    def test_timeout_removes_workspace_after_running_stage(self):
+        self.analysis_seconds = 0.3
+
+        async def main():
+            async with self.make_service() as assessment_service:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await assessment_service.assess(self.plan_bytes, 'plan.png', timeout=0.1)
+                self.assertEqual(len(self.workspaces()), 1)  # The analysis still reads it
+                return assessment_service.stats()
+            # Leaving the block waits for the running stage
+
+        stats = asyncio.run(main())
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(self.workspace_during_analysis, [True])
+        self.assertEqual(self.workspaces(), [])
+
+    def test_timeout_while_waiting_for_a_slot(self):
+        self.analysis_seconds = 0.3
+
+        async def main():
+            async with self.make_service(max_concurrent=1) as assessment_service:
+                first = asyncio.ensure_future(assessment_service.assess(self.plan_bytes, 'first.png'))
+                await asyncio.sleep(0.05)
+                with self.assertRaises(asyncio.TimeoutError):
+                    await assessment_service.assess(self.plan_bytes, 'second.png', timeout=0.05)
+                await first
+                return assessment_service.stats()
+
+        stats = asyncio.run(main())
+        self.assertEqual((stats['completed'], stats['timeouts']), (1, 1))
+        self.assertEqual(self.workspaces(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+from pathlib import Path
+import sys
+
+import numpy as np
+
+# Path arrangement
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+sys.path.insert(0, str(ROOT))  # for import modules
+
+from vision.tiling import tile_grid, class_aware_nms, detect_tiled
+from vision.plan_result import PlanBoxes, PlanResult
+
+NAMES = {0: 'door', 1: 'window'}
+
+
+def ground_truth_predictor(objects: np.ndarray, classes: np.ndarray, grid: np.ndarray):
+    """ Fake detector: the part of every object visible in a tile (tile coordinates), like a model cut by the tile edge. """
+    tiles_seen = iter(grid)  # detect_tiled sends the tiles in grid order
+
+    def predict(tiles):
+        results = []
+        for tile in tiles:
+            x1, y1, x2, y2 = next(tiles_seen)
+            assert tile.shape[:2] == (y2 - y1, x2 - x1)
+            clipped = np.clip(objects - [x1, y1, x1, y1], 0, [x2 - x1, y2 - y1, x2 - x1, y2 - y1])
+            visible = ((clipped[:, 2] - clipped[:, 0]) > 4) & ((clipped[:, 3] - clipped[:, 1]) > 4)
+            conf = np.full(int(visible.sum()), 0.9, dtype=np.float32)
+            results.append(PlanResult(path='', names=NAMES, boxes=PlanBoxes(clipped[visible], classes[visible], conf)))
+        return results
+    return predict
+
+
+class TestTileGrid(unittest.TestCase):
+    def test_covers_plan_with_overlap(self):
+        grid = tile_grid(height=3000, width=6000, tile_size=1280, overlap=0.2)
+        self.assertEqual(grid[:, 0].min(), 0)
+        self.assertEqual(grid[:, 1].min(), 0)
+        self.assertEqual(grid[:, 2].max(), 6000)
+        self.assertEqual(grid[:, 3].max(), 3000)
+        self.assertTrue(np.all(grid[:, 2] - grid[:, 0] == 1280))
+        xs = np.unique(grid[:, 0])
+        self.assertTrue(np.all(np.diff(xs) <= 1280 - 256))  # Neighbours share at least the overlap
+
+    def test_small_plan_is_one_tile(self):
+        np.testing.assert_array_equal(tile_grid(height=500, width=700, tile_size=1280), [[0, 0, 700, 500]])
+
+    def test_invalid_overlap(self):
+        with self.assertRaises(ValueError):
+            tile_grid(height=100, width=100, overlap=1.0)
+
+
+class TestClassAwareNms(unittest.TestCase):
+    def test_suppresses_same_class_only(self):
+        xyxy = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [0, 0, 10, 10]], dtype=np.float32)
+        cls = np.array([0, 0, 1], dtype=np.float32)
+        conf = np.array([0.8, 0.9, 0.5], dtype=np.float32)
+        self.assertEqual(class_aware_nms(xyxy, cls, conf, metric='iou').tolist(), [1, 2])
+
+    def test_whole_box_preferred_over_cut_box(self):
+        xyxy = np.array([[0, 0, 10, 20], [0, 0, 5, 20]], dtype=np.float32)
+        cls = np.zeros(2, dtype=np.float32)
+        conf = np.array([0.6, 0.9], dtype=np.float32)
+        cut = np.array([False, True])
+        self.assertEqual(class_aware_nms(xyxy, cls, conf, cut=cut).tolist(), [0])
+        # Plain IoU does not see the cut box as a duplicate (0.5 overlap)
+        self.assertEqual(class_aware_nms(xyxy, cls, conf, cut=cut, metric='iou', threshold=0.5).tolist(), [0, 1])
+
+    def test_nested_boxes_of_one_tile_are_kept(self):
+        # A small door inside a large one, both whole and from the same tile: two objects (IoS 1.0, IoU 0.25)
+        xyxy = np.array([[0, 0, 20, 20], [5, 5, 15, 15]], dtype=np.float32)
+        cls = np.zeros(2, dtype=np.float32)
+        conf = np.array([0.9, 0.8], dtype=np.float32)
+        self.assertEqual(class_aware_nms(xyxy, cls, conf, tile=np.array([0, 0])).tolist(), [0, 1])
+        # The same pair from two tiles is one object seen twice
+        self.assertEqual(class_aware_nms(xyxy, cls, conf, tile=np.array([0, 1])).tolist(), [0])
+
+    def test_empty(self):
+        empty = np.zeros((0, 4), dtype=np.float32)
+        self.assertEqual(len(class_aware_nms(empty, np.zeros(0), np.zeros(0))), 0)
+
+
+class TestDetectTiled(unittest.TestCase):
+    def test_boxes_back_in_plan_coordinates_without_duplicates(self):
+        rng = np.random.default_rng(0)
+        height, width, tile_size = 2400, 5000, 640
+        corners = rng.uniform([0, 0], [width - 100, height - 100], size=(60, 2))
+        sizes = rng.uniform(20, 100, size=(60, 2))
+        objects = np.hstack([corners, corners + sizes]).astype(np.float32)
+        classes = rng.integers(0, 2, size=60).astype(np.float32)
+        # Keep the objects apart, a duplicate here would be two real objects
+        keep = class_aware_nms(objects, classes, np.ones(60), threshold=0.0)
+        objects, classes = objects[keep], classes[keep]
+
+        image = np.zeros((height, width, 3), dtype=np.uint8)
+        grid = tile_grid(height, width, tile_size=tile_size, overlap=0.25)
+        plan = detect_tiled(image, ground_truth_predictor(objects, classes, grid), path='plan.jpg',
+                            tile_size=tile_size, overlap=0.25, batch_size=4)
+
+        self.assertIsInstance(plan, PlanResult)
+        self.assertEqual(plan.names, NAMES)
+        self.assertIs(plan.orig_img, image)
+        self.assertEqual(len(plan.boxes), len(objects))
+        order = np.lexsort((plan.boxes.xyxy[:, 1], plan.boxes.xyxy[:, 0]))
+        expected = np.lexsort((objects[:, 1], objects[:, 0]))
+        np.testing.assert_allclose(plan.boxes.xyxy[order], objects[expected], atol=1e-3)
+        np.testing.assert_array_equal(plan.boxes.cls[order], classes[expected])
+
+
+if __name__ == '__main__':
+    unittest.main()
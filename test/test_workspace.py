@@ -0,0 +1,37 @@
+import unittest
+from pathlib import Path
+import tempfile
+import sys
+
+# Path arrangement
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+sys.path.insert(0, str(ROOT))  # for import modules
+
+from fengshui.workspace import Workspace, safe_file_name
+
+
+class TestWorkspace(unittest.TestCase):
+    def test_hostile_names_stay_inside_images_path(self):
+        with tempfile.TemporaryDirectory() as base_dir, Workspace(base_dir=Path(base_dir)) as workspace:
+            for file_name in ['../../x.jpg', '/tmp/x.jpg', '..\\..\\x.jpg', 'C:\\x.jpg', 'sub/../x.jpg']:
+                file_path = workspace.add_image(b'data', file_name)
+                self.assertEqual(file_path.parent, workspace.images_path)
+                self.assertEqual(file_path.name, 'x.jpg')
+                self.assertEqual(file_path.read_bytes(), b'data')
+            self.assertEqual(list(Path(base_dir).glob('*.jpg')), [])
+
+    def test_invalid_names_rejected(self):
+        for file_name in ['', '.', '..', '/', 'a/..']:
+            with self.assertRaises(ValueError):
+                safe_file_name(file_name)
+
+    def test_cleanup_removes_root(self):
+        with tempfile.TemporaryDirectory() as base_dir:
+            with Workspace(base_dir=Path(base_dir)) as workspace:
+                workspace.add_image(b'data')
+            self.assertFalse(workspace.root.exists())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+import threading
+import queue
+import time
+
+# Largest batch of one predict call
+MAX_BATCH_SIZE_DEFAULT = 8
+# Longest time the first image of a batch waits for others (latency bound)
+MAX_WAIT_MS_DEFAULT = 10.0
+
+
+class MicroBatcher:
+    """
+    Collects single images from many callers into one batched predict call.
+
+    A batch is run as soon as it holds max_batch_size images, or max_wait_ms after its first image
+    arrived, whichever comes first. Each caller gets the result of its own image through a Future.
+    Lower max_wait_ms for tail latency (p99), raise it (and max_batch_size) for images per second.
+
+    Example:
+    batcher = MicroBatcher(lambda images: get_model(DETECT_MODEL_PATH).predict(images, verbose=False))
+    result = batcher.submit(image).result()    # or: await asyncio.wrap_future(batcher.submit(image))
+    """
+    def __init__(self,
+                 predict: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = MAX_BATCH_SIZE_DEFAULT,
+                 max_wait_ms: float = MAX_WAIT_MS_DEFAULT):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1.")
+
+        self.predict = predict
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._metrics = {'batches': 0, 'images': 0, 'max_queue_depth': 0, 'wait_ms': 0.0, 'predict_ms': 0.0}
+        self._batch_sizes: Dict[int, int] = {}
+
+        self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, image: Any) -> Future:
+        """
+        Queue one image.
+
+        Parameters:
+        - image (Any): Input of predict (numpy image, path...).
+
+        Returns:
+        - Future: Resolved with the predict output of this image.
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed.")
+            self._queue.put((image, future, time.perf_counter()))
+            self._metrics['max_queue_depth'] = max(self._metrics['max_queue_depth'], self._queue.qsize())
+        return future
+
+    def __call__(self, image: Any) -> Any:
+        """ Blocking submit. """
+        return self.submit(image).result()
+
+    def _next_batch(self) -> Optional[list]:
+        first = self._queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = first[2] + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                job = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                self._queue.put(None)  # Close after this batch
+                break
+            batch.append(job)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            # Callers that gave up (cancelled future, e.g. a request timeout) are dropped
+            batch = [job for job in batch if job[1].set_running_or_notify_cancel()]
+            if len(batch) == 0:
+                continue
+
+            start = time.perf_counter()
+            try:
+                outputs = self.predict([image for image, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                outputs = None
+            end = time.perf_counter()
+
+            if outputs is not None:
+                for (_, future, _), output in zip(batch, outputs):
+                    future.set_result(output)
+
+            with self._lock:
+                self._metrics['batches'] += 1
+                self._metrics['images'] += len(batch)
+                self._metrics['wait_ms'] += sum(start - submitted for _, _, submitted in batch) * 1000
+                self._metrics['predict_ms'] += (end - start) * 1000
+                self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Queue and batch metrics.
+
+        Returns:
+        - Dict[str, Any]: queue_depth (now), max_queue_depth, batches, images, mean_batch_size,
+                          mean_wait_ms (queue time per image), mean_predict_ms (per batch) and batch_sizes ({size: count}).
+        """
+        with self._lock:
+            batches, images = self._metrics['batches'], self._metrics['images']
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._metrics['max_queue_depth'],
+                'batches': batches,
+                'images': images,
+                'mean_batch_size': images / batches if batches > 0 else 0.0,
+                'mean_wait_ms': self._metrics['wait_ms'] / images if images > 0 else 0.0,
+                'mean_predict_ms': self._metrics['predict_ms'] / batches if batches > 0 else 0.0,
+                'batch_sizes': dict(self._batch_sizes)
+            }
+
+    def close(self):
+        """ Runs the queued images, then stops the worker thread. """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._worker.join()
+
+    def __enter__(self) -> "MicroBatcher":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
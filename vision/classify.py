@@ -1,7 +1,8 @@
 from ultralytics.engine.results import Results # type: ignore
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from ultralytics import YOLO # type: ignore
 from pathlib import Path
+import numpy as np
 import re
 import sys
 
@@ -11,9 +12,139 @@ ROOT = FILE.parents[1]
 sys.path.insert(0, str(ROOT))  
 
 from vision.resize import resize_images
+from vision.registry import get_model, model_lock
+from vision.plan_result import ORIENTATION_CACHE_ATTR, to_numpy
+from metrics.metrics import span, inc
 
+# Same box expansion as ultralytics 'save_one_box' (used by save_crop), the classifier is trained on such crops
+CROP_GAIN = 1.02
+CROP_PAD = 10
 
 
+def crop_box(image: np.ndarray, xyxy: np.ndarray) -> np.ndarray:
+    """
+    Slices one box out of the image, expanded like ultralytics 'save_one_box'.
+
+    Parameters:
+    - image (np.ndarray): The original BGR image.
+    - xyxy (np.ndarray): Box coordinates [x1, y1, x2, y2].
+
+    Returns:
+    - np.ndarray: The crop (a view of image).
+    """
+    height, width = image.shape[:2]
+
+    # xyxy -> center / size, expand, back to xyxy (truncated like 'save_one_box')
+    center_x, center_y = (xyxy[0] + xyxy[2]) / 2, (xyxy[1] + xyxy[3]) / 2
+    box_width = (xyxy[2] - xyxy[0]) * CROP_GAIN + CROP_PAD
+    box_height = (xyxy[3] - xyxy[1]) * CROP_GAIN + CROP_PAD
+    x1 = min(max(int(center_x - box_width / 2), 0), width)
+    y1 = min(max(int(center_y - box_height / 2), 0), height)
+    x2 = min(max(int(center_x + box_width / 2), 0), width)
+    y2 = min(max(int(center_y + box_height / 2), 0), height)
+    return image[y1:y2, x1:x2]
+
+def crop_boxes(result: Results, object_names: Optional[List[str]] = None) -> List[Tuple[int, np.ndarray]]:
+    """
+    Slices the detected boxes straight out of the original image, in box order.
+
+    Parameters:
+    - result (Results): The results object containing the original image and the bounding boxes.
+    - object_names (Optional[List[str]]): Only crop boxes of these classes. Default is None (every box).
+
+    Returns:
+    - List[Tuple[int, np.ndarray]]: (box index, BGR crop) pairs, same order as result.boxes.
+    """
+    xyxy_array = to_numpy(result.boxes.xyxy).astype(np.float64).reshape(-1, 4)
+    cls_array = to_numpy(result.boxes.cls).reshape(-1)
+
+    crops = []
+    for box_index, (xyxy, cls) in enumerate(zip(xyxy_array, cls_array)):
+        if object_names is None or result.names[int(cls)] in object_names:
+            crops.append((box_index, crop_box(result.orig_img, xyxy)))
+
+    return crops
+
+def crop_file_jobs(result: Results, object_names: List[str], root: Path = ROOT) -> List[Tuple[int, Path]]:
+    """
+    (box index, save_crop file) pairs of object_names, the files matched to the boxes like object_orientation_classify.
+    A class whose number of files is not its number of boxes is left out (its labels stay unknown).
+    """
+    jobs = []
+    cls_list = result.boxes.cls.tolist()
+    for object_name in object_names:
+        box_indexes = [box_index for box_index, cls in enumerate(cls_list) if result.names[int(cls)] == object_name]
+        if len(box_indexes) == 0:
+            continue
+        files = crop_files(root=root, object_name=object_name, result=result)
+        if len(files) == len(box_indexes):
+            jobs.extend(zip(box_indexes, files))
+    return jobs
+
+def classify_orientations(results: List[Results], model_path: Path, object_names: List[str], batch_size: int = 32,
+                          in_memory: bool = True):
+    """
+    Classifies every box of object_names in every result with batched classifier calls,
+    and caches the labels on each result (see get_cached_orientations).
+
+    Parameters:
+    - results (List[Results]): Detection results of one or more floor plans.
+    - model_path (Path): Path to the classify model file.
+    - object_names (List[str]): Classes that need an orientation, e.g. ['door', 'entrance', 'kitchen', 'window'].
+    - batch_size (int): Number of crops per classifier call. Default is 32.
+    - in_memory (bool): Crop from result.orig_img, otherwise read the save_crop files (same labels as
+                        object_orientation_classify with the same in_memory). A result without save_dir
+                        (nothing saved, e.g. tiled detection) is always cropped in memory. Default is True.
+    """
+    # (result index, box index, crop or crop file) of every orientation relevant detection
+    jobs = []
+    for result_index, result in enumerate(results):
+        setattr(result, ORIENTATION_CACHE_ATTR, [None] * len(result.boxes.cls))
+        if in_memory or getattr(result, 'save_dir', None) is None:
+            crops = crop_boxes(result=result, object_names=object_names)
+        else:
+            crops = crop_file_jobs(result=result, object_names=object_names)
+        for box_index, crop in crops:
+            jobs.append((result_index, box_index, crop))
+
+    if len(jobs) == 0:
+        return
+
+    model = get_model(model_path)
+    with span('classify'):
+        for start in range(0, len(jobs), batch_size):
+            batch = jobs[start:start + batch_size]
+            with model_lock(model_path):
+                predictions = model.predict([crop for _, _, crop in batch], verbose=False)
+            for (result_index, box_index, _), prediction in zip(batch, predictions):
+                getattr(results[result_index], ORIENTATION_CACHE_ATTR)[box_index] = get_class_name(prediction)
+    inc('crops_classified_total', len(jobs))
+
+def get_cached_orientations(result: Results, object_name: str) -> Optional[List[str]]:
+    """
+    Looks up the labels stored by classify_orientations.
+
+    Parameters:
+    - result (Results): The detection results of one floor plan.
+    - object_name (str): The class to look up.
+
+    Returns:
+    - Optional[List[str]]: Orientation names of the object_name boxes in box order,
+                           None if the result was not classified for this class.
+    """
+    labels = getattr(result, ORIENTATION_CACHE_ATTR, None)
+    if labels is None:
+        return None
+
+    object_orientation_list = []
+    for label, cls in zip(labels, result.boxes.cls.tolist()):
+        if result.names[int(cls)] == object_name:
+            if label is None:
+                return None
+            object_orientation_list.append(label)
+
+    return object_orientation_list if len(object_orientation_list) > 0 else None
+
 def extract_suffix(file_name):
     # Find the numeric suffix using regex
     match = re.search(r'(\d+)\.jpg$', file_name)
@@ -22,19 +153,10 @@ def extract_suffix(file_name):
 def get_class_name(result:Results):
     return result.names[result.probs.top1]
 
-def object_orientation_classify(root: Path, model_path: Path, object_name: str, result: Results) -> Optional[List]:
-
+def crop_files(root: Path, object_name: str, result: Results) -> List[Path]:
+    """ The save_crop files of object_name of the plan, in box order. """
     # To find item image crops path from YOLOv8
     item_crops_path = root / Path(result.save_dir) / 'crops' / object_name
-    
-    # Check if the object has been detected
-    not_empty = False
-    for object_id in result.boxes.cls.tolist():
-        if result.names[object_id] == object_name:
-            not_empty = True
-
-    if not_empty is False:
-        return None
 
     source_path = Path(result.path)
     image_base_name = source_path.stem  # stem gives the base name without suffix
@@ -44,15 +166,51 @@ def object_orientation_classify(root: Path, model_path: Path, object_name: str,
     matching_files = list(item_crops_path.glob(f"{image_base_name}*.jpg"))
 
     # Sort files by the numeric suffix at the end of the filename
-    matching_files_sorted = sorted(matching_files, key=lambda x: extract_suffix(x.name))
+    return sorted(matching_files, key=lambda x: extract_suffix(x.name))
+
+def object_orientation_classify(root: Path, model_path: Path, object_name: str, result: Results, in_memory: bool = False) -> Optional[List]:
+    """
+    Classifies the orientation ('vertical' / 'horizontal') of every detected object_name.
+
+    Parameters:
+    - root (Path): Project root, YOLO save_dir is relative to it.
+    - model_path (Path): Path to the classify model file.
+    - object_name (str): The class to classify.
+    - result (Results): The detection results of one floor plan.
+    - in_memory (bool): Crop from result.orig_img instead of reading the save_crop files. Default is False.
+
+    Returns:
+    - Optional[List]: Orientation names in box order, otherwise None.
+    """
+
+    if in_memory:
+        crops = [crop for _, crop in crop_boxes(result=result, object_names=[object_name])]
+        if len(crops) == 0:
+            return None
+        model = get_model(model_path)
+        with model_lock(model_path):
+            results = model.predict(crops, verbose=False)
+        return [get_class_name(item) for item in results]
+
+    # Check if the object has been detected
+    not_empty = False
+    for object_id in result.boxes.cls.tolist():
+        if result.names[object_id] == object_name:
+            not_empty = True
+
+    if not_empty is False:
+        return None
+
+    matching_files_sorted = crop_files(root=root, object_name=object_name, result=result)
 
     # Resize image
     #resize_images_files = [Path(file) for file in matching_files_sorted]
     #resize_images(image_paths=resize_images_files)
     
-    if item_crops_path.exists and not_empty:
-        model = YOLO(model_path)  # pretrained YOLOv8 cls model
-        results = model.predict(matching_files_sorted)
+    if not_empty:
+        model = get_model(model_path)  # pretrained YOLOv8 cls model (loaded once per process)
+        with model_lock(model_path):
+            results = model.predict(matching_files_sorted)
         object_orientation_list = [get_class_name(item) for item in results]
 
         return object_orientation_list
@@ -60,7 +218,8 @@ def object_orientation_classify(root: Path, model_path: Path, object_name: str,
         return None
 
 def orientation_classify(images_paths: Path, model_path: Path):
-    model = YOLO(model_path) 
-    results = model.predict(images_paths)
+    model = get_model(model_path)
+    with model_lock(model_path):
+        results = model.predict(images_paths)
     return results
     
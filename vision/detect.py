@@ -1,26 +1,172 @@
 from ultralytics.engine.results import Results # type: ignore
 from ultralytics import YOLO # type: ignore
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterable, Iterator, List, Optional, Union
+import time
+import sys
 
+import numpy as np
+import cv2
 
-def floor_plan_detect(images_path: Path, model_path: Path) -> Optional[List[Results]]:
+# Path arrangement
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+sys.path.insert(0, str(ROOT))
+
+from vision.registry import get_model, model_lock
+from vision.plan_result import PlanResult
+from vision.tiling import detect_tiled
+from vision.tiling import TILE_SIZE_DEFAULT, TILE_OVERLAP_DEFAULT, TILE_BATCH_SIZE_DEFAULT
+from metrics.metrics import METRICS, SPAN_METRIC, span, inc
+
+# Results per batch of floor_plan_detect_stream
+STREAM_BATCH_SIZE_DEFAULT = 16
+
+# Files read from an images directory in tiled mode (predict lists directories itself)
+IMAGE_SUFFIXES = ['.jpg', '.jpeg', '.png', '.bmp', '.webp']
+
+
+def source_exists(images_path: Union[Path, List[Path]]) -> bool:
+    """ The directory exists, or every image file of the list exists. """
+    if isinstance(images_path, (list, tuple)):
+        return all(Path(image_path).exists() for image_path in images_path)
+    return Path(images_path).exists()
+
+def to_source(images_path: Union[Path, List[Path]]):
+    # predict takes a directory or a list of files
+    if isinstance(images_path, (list, tuple)):
+        return [str(image_path) for image_path in images_path]
+    return images_path
+
+
+def floor_plan_detect(images_path: Union[Path, List[Path]], model_path: Path, save_outputs: bool = True, project: Optional[Path] = None) -> Optional[List[Results]]:
     """
         This function uses YOLOv8 to detect objects in the floor plan.
 
         Args:
-            images_path (str or Path): The path to the directory containing the images.
+            images_path (str or Path or List[Path]): The path to the directory containing the images, or the image files.
             model_path (str or Path): The path to the YOLOv8 model file.
+            save_outputs (bool): Save the annotated images, labels and crops under 'runs/'.
+                                 Not needed when the crops are taken in memory (see vision.classify.crop_boxes).
+            project (Optional[Path]): Directory of the saved outputs (save_dir is project / 'predict'), e.g. a request workspace.
+                                      Default is None (ultralytics 'runs/detect').
 
         Returns:
             results: The results of the YOLOv8 model's prediction, otherwise None.
     """
 
-    if model_path.exists() and images_path.exists():
-        model = YOLO(model_path)  
-        results = model.predict(images_path, save=True, save_txt=True, save_crop=True, exist_ok=True)  
+    if model_path.exists() and source_exists(images_path):
+        model = get_model(model_path)  # Loaded once per process
+        save_kwargs = {} if project is None else {'project': str(project), 'name': 'predict'}
+        with span('detection'), model_lock(model_path):
+            results = model.predict(to_source(images_path), save=save_outputs, save_txt=save_outputs, save_crop=save_outputs, exist_ok=True, **save_kwargs)
+        inc('images_detected_total', len(results))
         return results
     else:
         return None
         #raise FileNotFoundError("Model path or images path does not exist.")
         
+
+def locked(stream: Iterable[Results], model_path: Path) -> Iterator[Results]:
+    """ The results of a predict stream, with the model lock held from the first result until the stream ends or is closed. """
+    # The predictor keeps the state of the stream (source, batch) between results, another predict would overwrite it
+    with model_lock(model_path):
+        yield from stream
+
+def batched(results: Iterable[Results], batch_size: int) -> Iterator[List[Results]]:
+    """ Groups a stream of results into lists of batch_size (the last one may be shorter). """
+    # Detection time of a batch: from resuming the stream to yielding (the consumer's time is excluded)
+    batch, start = [], time.perf_counter()
+    for result in results:
+        batch.append(result)
+        if len(batch) >= batch_size:
+            METRICS.observe(SPAN_METRIC, time.perf_counter() - start, stage='detection')
+            inc('images_detected_total', len(batch))
+            yield batch
+            batch, start = [], time.perf_counter()
+    if len(batch) > 0:
+        METRICS.observe(SPAN_METRIC, time.perf_counter() - start, stage='detection')
+        inc('images_detected_total', len(batch))
+        yield batch
+
+def floor_plan_detect_stream(images_path: Union[Path, List[Path]], model_path: Path, batch_size: int = STREAM_BATCH_SIZE_DEFAULT,
+                             save_outputs: bool = True, project: Optional[Path] = None) -> Optional[Iterator[List[Results]]]:
+    """
+        Same as floor_plan_detect, but the images are detected lazily (predict stream=True) and the
+        results come in batches, so only one batch of images is in memory at a time.
+
+        Args:
+            images_path (str or Path or List[Path]): The path to the directory containing the images, or the image files.
+            model_path (str or Path): The path to the YOLOv8 model file.
+            batch_size (int): Results per yielded batch (also the inference batch). Default is STREAM_BATCH_SIZE_DEFAULT.
+            save_outputs (bool): See floor_plan_detect.
+            project (Optional[Path]): See floor_plan_detect.
+
+        Returns:
+            Optional[Iterator[List[Results]]]: Batches of results in the order of the source, otherwise None.
+    """
+    if model_path.exists() and source_exists(images_path):
+        model = get_model(model_path)  # Loaded once per process
+        save_kwargs = {} if project is None else {'project': str(project), 'name': 'predict'}
+        stream = model.predict(to_source(images_path), stream=True, batch=batch_size, verbose=False,
+                               save=save_outputs, save_txt=save_outputs, save_crop=save_outputs, exist_ok=True, **save_kwargs)
+        return batched(locked(stream, model_path), batch_size)
+    else:
+        return None
+
+def list_images(images_path: Union[Path, List[Path]]) -> List[Path]:
+    """ The image files of a directory (sorted by name), or the given files. """
+    if isinstance(images_path, (list, tuple)):
+        return [Path(image_path) for image_path in images_path]
+    images_path = Path(images_path)
+    if images_path.is_file():
+        return [images_path]
+    return sorted(path for path in images_path.iterdir() if path.suffix.lower() in IMAGE_SUFFIXES)
+
+def read_image(image_path: Path) -> np.ndarray:
+    """ Decode a floor plan (BGR, as ultralytics loads it). """
+    image = cv2.imdecode(np.fromfile(str(image_path), dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Failed to load image from {image_path}")
+    return image
+
+def tile_predictor(model_path: Path, tile_size: int = TILE_SIZE_DEFAULT):
+    """ predict function of detect_tiled: one call for a batch of tiles, at the tile resolution. """
+    model = get_model(model_path)  # Loaded once per process
+    def predict(tiles: List[np.ndarray]) -> List[Results]:
+        with model_lock(model_path):
+            return model.predict(tiles, imgsz=tile_size, verbose=False)
+    return predict
+
+def floor_plan_detect_tiled(images_path: Union[Path, List[Path]], model_path: Path, batch_size: int = STREAM_BATCH_SIZE_DEFAULT,
+                            tile_size: int = TILE_SIZE_DEFAULT, overlap: float = TILE_OVERLAP_DEFAULT,
+                            tile_batch_size: int = TILE_BATCH_SIZE_DEFAULT) -> Optional[Iterator[List[PlanResult]]]:
+    """
+        Detects large floor plans tile by tile (see vision.tiling.detect_tiled), so small doors and windows
+        are not downsampled away, and yields the results in batches like floor_plan_detect_stream.
+
+        Plans are decoded one at a time, only one batch of decoded plans is in memory. Nothing is saved
+        under 'runs/' (the orientation crops are taken from orig_img).
+
+        Args:
+            images_path (str or Path or List[Path]): The path to the directory containing the images, or the image files.
+            model_path (str or Path): The path to the YOLO model file.
+            batch_size (int): Plans per yielded batch. Default is STREAM_BATCH_SIZE_DEFAULT.
+            tile_size (int): Side of a tile, also the predict imgsz. Default is TILE_SIZE_DEFAULT.
+            overlap (float): Fraction of a tile shared with its neighbour. Default is TILE_OVERLAP_DEFAULT.
+            tile_batch_size (int): Tiles per predict call. Default is TILE_BATCH_SIZE_DEFAULT.
+
+        Returns:
+            Optional[Iterator[List[PlanResult]]]: Batches of Results-compatible plans in the order of the source, otherwise None.
+    """
+    if not (model_path.exists() and source_exists(images_path)):
+        return None
+
+    predict = tile_predictor(model_path, tile_size=tile_size)
+
+    def plans() -> Iterator[PlanResult]:
+        for image_path in list_images(images_path):
+            yield detect_tiled(read_image(image_path), predict, path=str(image_path),
+                               tile_size=tile_size, overlap=overlap, batch_size=tile_batch_size)
+
+    return batched(plans(), batch_size)
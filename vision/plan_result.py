@@ -0,0 +1,74 @@
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Attribute holding the orientation labels of vision.classify.classify_orientations (one entry per box)
+ORIENTATION_CACHE_ATTR = 'orientation_labels'
+
+
+def to_numpy(data) -> np.ndarray:
+    # Tensor (ultralytics Results) or array-like to numpy
+    return data.cpu().numpy() if hasattr(data, 'cpu') else np.asarray(data)
+
+
+class PlanBoxes:
+    """
+    Boxes of one floor plan as numpy arrays, with the same access pattern as ultralytics 'Boxes'
+    (boxes.xyxy rows support .tolist(), boxes.cls items support .item()).
+    """
+    def __init__(self, xyxy: np.ndarray, cls: np.ndarray, conf: Optional[np.ndarray] = None):
+        self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.cls = np.asarray(cls, dtype=np.float32).reshape(-1)
+        self.conf = np.ones(len(self.cls), dtype=np.float32) if conf is None else np.asarray(conf, dtype=np.float32).reshape(-1)
+
+    def __len__(self):
+        return len(self.cls)
+
+
+class PlanResult:
+    """
+    Lightweight, picklable stand-in for ultralytics 'Results' holding only what the assessment reads
+    (path, names, boxes, original image, save_dir and the cached orientation labels).
+    It can be sent to worker processes and rebuilt without the model.
+    """
+    def __init__(self,
+                 path: str,
+                 names: Dict[int, str],
+                 boxes: PlanBoxes,
+                 orig_img: Optional[np.ndarray] = None,
+                 save_dir: Optional[str] = None,
+                 orientation_labels: Optional[List[Optional[str]]] = None):
+        self.path = str(path)
+        self.names = dict(names)
+        self.boxes = boxes
+        self.orig_img = orig_img
+        self.save_dir = save_dir
+        setattr(self, ORIENTATION_CACHE_ATTR, orientation_labels)
+
+    @classmethod
+    def from_results(cls, result, keep_image: bool = True) -> "PlanResult":
+        """
+        Converts an ultralytics Results (or another PlanResult).
+
+        Parameters:
+        - result (Results): Detection results of one floor plan.
+        - keep_image (bool): Keep result.orig_img. Default is True.
+
+        Returns:
+        - PlanResult: The converted result.
+        """
+        conf = getattr(result.boxes, 'conf', None)
+        boxes = PlanBoxes(xyxy=to_numpy(result.boxes.xyxy),
+                          cls=to_numpy(result.boxes.cls),
+                          conf=None if conf is None else to_numpy(conf))
+        labels = getattr(result, ORIENTATION_CACHE_ATTR, None)
+        return cls(path=result.path,
+                   names=result.names,
+                   boxes=boxes,
+                   orig_img=result.orig_img if keep_image else None,
+                   save_dir=getattr(result, 'save_dir', None),
+                   orientation_labels=None if labels is None else list(labels))
+
+    def __repr__(self):
+        return f"PlanResult ('{Path(self.path).name}', {len(self.boxes)} boxes)"
@@ -0,0 +1,121 @@
+from ultralytics import YOLO # type: ignore
+from pathlib import Path
+from typing import Dict, List, Optional
+import threading
+import gc
+
+import numpy as np
+
+# Blank image used to run the first (slow) inference at load time
+WARMUP_IMAGE_SIZE = 64
+
+
+class ModelRegistry:
+    """
+    Process-wide store of YOLO models, loaded lazily once per weights file.
+
+    The same instance is reused by every call (and every request of a long-running server),
+    so weights are deserialized and warmed up only once. Use 'unload' to release memory.
+    Note: a YOLO predictor is not thread-safe, every 'predict' of a shared model is done under its
+    'predict_lock', so concurrent callers (threads of a server, concurrent run() calls) take turns.
+    """
+    def __init__(self):
+        self._models: Dict[str, YOLO] = {}
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._predict_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model_path: Path) -> str:
+        return str(Path(model_path).resolve())
+
+    def get(self, model_path: Path, warmup: bool = True) -> YOLO:
+        """
+        Return the model for the weights file, loading (and warming up) it on first use.
+
+        Parameters:
+        - model_path (Path): Path to the YOLO weights file.
+        - warmup (bool): Run one inference on a blank image after loading. Default is True.
+
+        Returns:
+        - YOLO: The shared model instance.
+        """
+        key = self.make_key(model_path)
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                return model
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Only one thread loads a given weights file, others wait for it
+        with load_lock:
+            with self._lock:
+                model = self._models.get(key)
+            if model is not None:
+                return model
+
+            model = YOLO(key)
+            if warmup:
+                warmup_model(model)
+
+            with self._lock:
+                self._models[key] = model
+            return model
+
+    def predict_lock(self, model_path: Path) -> threading.Lock:
+        """
+        Lock of the model of a weights file, held for the whole of each predict call (or stream).
+
+        Parameters:
+        - model_path (Path): Path to the YOLO weights file.
+
+        Returns:
+        - threading.Lock: The same lock for every caller of this weights file.
+        """
+        with self._lock:
+            return self._predict_locks.setdefault(self.make_key(model_path), threading.Lock())
+
+    def unload(self, model_path: Optional[Path] = None):
+        """
+        Drop one model (or every model when model_path is None) from the registry.
+
+        Parameters:
+        - model_path (Optional[Path]): Weights file to unload. Default is None (all models).
+        """
+        with self._lock:
+            if model_path is None:
+                self._models.clear()
+            else:
+                self._models.pop(self.make_key(model_path), None)
+        gc.collect()
+
+    def loaded(self) -> List[str]:
+        """ Paths of the weights files currently in memory. """
+        with self._lock:
+            return list(self._models.keys())
+
+    def __contains__(self, model_path: Path) -> bool:
+        with self._lock:
+            return self.make_key(model_path) in self._models
+
+
+def warmup_model(model: YOLO):
+    """ Run one inference on a blank image so the first real request does not pay for it. """
+    blank = np.full((WARMUP_IMAGE_SIZE, WARMUP_IMAGE_SIZE, 3), 255, dtype=np.uint8)
+    model.predict(blank, verbose=False)
+
+
+MODEL_REGISTRY = ModelRegistry()
+
+def get_model(model_path: Path, warmup: bool = True) -> YOLO:
+    """ Shortcut of MODEL_REGISTRY.get. """
+    return MODEL_REGISTRY.get(model_path, warmup=warmup)
+
+def model_lock(model_path: Path) -> threading.Lock:
+    """ Shortcut of MODEL_REGISTRY.predict_lock. """
+    return MODEL_REGISTRY.predict_lock(model_path)
+
+def unload_model(model_path: Optional[Path] = None):
+    """ Shortcut of MODEL_REGISTRY.unload. """
+    MODEL_REGISTRY.unload(model_path)
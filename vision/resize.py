@@ -2,6 +2,9 @@ import cv2
 import numpy as np
 from pathlib import Path
 from typing import List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
 
 def resize_images(image_paths: List[Path], target_size: Tuple[int, int] = (128, 128)):
     """
@@ -29,7 +32,7 @@ def resize_images(image_paths: List[Path], target_size: Tuple[int, int] = (128,
         
         # Check if the image was successfully loaded
         if image is None:
-            print(f"Failed to load image: {image_path}")
+            logger.warning("Failed to load image: %s", image_path)
             continue
 
         # Get the original dimensions of the image
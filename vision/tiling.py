@@ -0,0 +1,209 @@
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from pathlib import Path
+import sys
+
+import numpy as np
+
+# Path arrangement
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[1]
+sys.path.insert(0, str(ROOT))
+
+from vision.plan_result import PlanBoxes, PlanResult, to_numpy
+from metrics.metrics import span, inc
+
+# Side of a square tile in pixels, also the imgsz of the predict call (no downsampling inside a tile)
+TILE_SIZE_DEFAULT = 1280
+# Fraction of a tile shared with its neighbour, must be larger than the biggest object / TILE_SIZE
+TILE_OVERLAP_DEFAULT = 0.2
+# Tiles per predict call (only one batch of letterboxed tiles is in memory at a time)
+TILE_BATCH_SIZE_DEFAULT = 8
+# Same class boxes matching more than this are duplicates of one object
+TILE_NMS_THRESHOLD_DEFAULT = 0.5
+# 'ios' (intersection over the smaller box) also merges a box cut by a tile edge with the whole box, 'iou' is plain NMS.
+# 'ios' is only used between boxes of different tiles or cut boxes, nested objects found in one tile are compared by IoU
+TILE_NMS_METRIC_DEFAULT = 'ios'
+# A box closer than this to an inner tile edge is cut by the tile, the whole box from a neighbour tile is preferred
+TILE_EDGE_MARGIN = 2
+
+
+def tile_starts(length: int, tile_size: int, overlap: float) -> List[int]:
+    """ Start offsets of the tiles along one side, the last tile ends on the border of the plan. """
+    if length <= tile_size:
+        return [0]
+    stride = max(int(tile_size * (1 - overlap)), 1)
+    starts = list(range(0, length - tile_size, stride))
+    starts.append(length - tile_size)
+    return starts
+
+def tile_grid(height: int, width: int, tile_size: int = TILE_SIZE_DEFAULT, overlap: float = TILE_OVERLAP_DEFAULT) -> np.ndarray:
+    """
+    Overlapping tiles covering a floor plan.
+
+    Parameters:
+    - height (int): Height of the plan in pixels.
+    - width (int): Width of the plan in pixels.
+    - tile_size (int): Side of a tile. Default is TILE_SIZE_DEFAULT.
+    - overlap (float): Fraction of a tile shared with its neighbour (0 - 1). Default is TILE_OVERLAP_DEFAULT.
+
+    Returns:
+    - np.ndarray: (n, 4) int array of x1, y1, x2, y2 per tile, row by row. A plan smaller than a tile is one tile.
+    """
+    if tile_size < 1:
+        raise ValueError(f"Tile size must be positive, got {tile_size}.")
+    if not 0 <= overlap < 1:
+        raise ValueError(f"Tile overlap must be in [0, 1), got {overlap}.")
+    xs = tile_starts(width, tile_size, overlap)
+    ys = tile_starts(height, tile_size, overlap)
+    return np.array([[x, y, min(x + tile_size, width), min(y + tile_size, height)] for y in ys for x in xs], dtype=np.int64)
+
+def iter_tile_batches(image: np.ndarray, grid: np.ndarray, batch_size: int = TILE_BATCH_SIZE_DEFAULT) -> Iterator[Tuple[List[np.ndarray], np.ndarray]]:
+    """ (tile views, their rows of the grid) batch_size tiles at a time. The views share the memory of the image. """
+    for start in range(0, len(grid), batch_size):
+        rows = grid[start:start + batch_size]
+        yield [image[y1:y2, x1:x2] for x1, y1, x2, y2 in rows], rows
+
+
+def cut_by_tile(xyxy: np.ndarray, tile: np.ndarray, height: int, width: int, margin: int = TILE_EDGE_MARGIN) -> np.ndarray:
+    """ Boxes (in tile coordinates) touching an edge of the tile that is not a border of the plan. """
+    x1, y1, x2, y2 = tile
+    cut = np.zeros(len(xyxy), dtype=bool)
+    if x1 > 0:
+        cut |= xyxy[:, 0] <= margin
+    if y1 > 0:
+        cut |= xyxy[:, 1] <= margin
+    if x2 < width:
+        cut |= xyxy[:, 2] >= (x2 - x1) - margin
+    if y2 < height:
+        cut |= xyxy[:, 3] >= (y2 - y1) - margin
+    return cut
+
+def match_matrix(xyxy: np.ndarray, metric: str = TILE_NMS_METRIC_DEFAULT) -> np.ndarray:
+    """ Pairwise 'iou' or 'ios' (intersection over the smaller area) of (n, 4) boxes. """
+    if metric not in ('iou', 'ios'):
+        raise ValueError(f"Unknown NMS metric '{metric}', expected 'iou' or 'ios'.")
+    area = (xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1])
+    width = np.clip(np.minimum(xyxy[:, None, 2], xyxy[None, :, 2]) - np.maximum(xyxy[:, None, 0], xyxy[None, :, 0]), 0, None)
+    height = np.clip(np.minimum(xyxy[:, None, 3], xyxy[None, :, 3]) - np.maximum(xyxy[:, None, 1], xyxy[None, :, 1]), 0, None)
+    intersection = width * height
+    if metric == 'iou':
+        denominator = area[:, None] + area[None, :] - intersection
+    else:
+        denominator = np.minimum(area[:, None], area[None, :])
+    return intersection / np.maximum(denominator, 1e-9)
+
+def class_aware_nms(xyxy: np.ndarray, cls: np.ndarray, conf: np.ndarray, cut: Optional[np.ndarray] = None,
+                    tile: Optional[np.ndarray] = None, threshold: float = TILE_NMS_THRESHOLD_DEFAULT,
+                    metric: str = TILE_NMS_METRIC_DEFAULT) -> np.ndarray:
+    """
+    Greedy non-maximum suppression, only between boxes of the same class.
+
+    Parameters:
+    - xyxy (np.ndarray): (n, 4) boxes.
+    - cls (np.ndarray): (n,) class ids.
+    - conf (np.ndarray): (n,) confidences.
+    - cut (Optional[np.ndarray]): (n,) boxes cut by a tile edge, kept only when no whole box matches them. Default is None.
+    - tile (Optional[np.ndarray]): (n,) index of the tile of each box. Default is None (all boxes from one tile).
+    - threshold (float): Match above which the lower ranked box is dropped. Default is TILE_NMS_THRESHOLD_DEFAULT.
+    - metric (str): 'ios' or 'iou' (see match_matrix). 'ios' only applies to pairs with a cut box or boxes of
+                    different tiles, other pairs use 'iou'. Default is TILE_NMS_METRIC_DEFAULT.
+
+    Returns:
+    - np.ndarray: Sorted indices of the kept boxes.
+    """
+    cut = np.zeros(len(xyxy), dtype=bool) if cut is None else cut
+    tile = np.zeros(len(xyxy), dtype=np.int64) if tile is None else tile
+    keep = []
+    # One match matrix per class, (boxes of the class)^2 instead of (all boxes)^2
+    for class_id in np.unique(cls):
+        indices = np.flatnonzero(cls == class_id)
+        order = indices[np.lexsort((-conf[indices], cut[indices]))]  # Whole boxes first, then by confidence
+        boxes = xyxy[order].astype(np.float64)
+        matches = match_matrix(boxes, metric=metric) > threshold
+        if metric == 'ios':
+            # Duplicates made by the tiling, two nested objects of one tile are not
+            tiling_pair = cut[order][:, None] | cut[order][None, :] | (tile[order][:, None] != tile[order][None, :])
+            matches = np.where(tiling_pair, matches, match_matrix(boxes, metric='iou') > threshold)
+
+        suppressed = np.zeros(len(order), dtype=bool)
+        for rank in range(len(order)):
+            if suppressed[rank]:
+                continue
+            suppressed[rank + 1:] |= matches[rank, rank + 1:]
+        keep.append(order[~suppressed])
+    return np.sort(np.concatenate(keep)) if len(keep) > 0 else np.zeros(0, dtype=np.int64)
+
+
+def merge_tile_results(tile_results: List[Any], rows: np.ndarray, height: int,
+                       width: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """ Boxes of the tiles in plan coordinates: (xyxy, cls, conf, cut by a tile edge, tile index). """
+    xyxy, cls, conf, cut, tile_index = [], [], [], [], []
+    for index, (result, tile) in enumerate(zip(tile_results, rows)):
+        boxes = to_numpy(result.boxes.xyxy).astype(np.float32).reshape(-1, 4)
+        cut.append(cut_by_tile(boxes, tile, height, width))
+        xyxy.append(boxes + np.array([tile[0], tile[1], tile[0], tile[1]], dtype=np.float32))
+        cls.append(to_numpy(result.boxes.cls).reshape(-1))
+        tile_conf = getattr(result.boxes, 'conf', None)
+        conf.append(np.ones(len(boxes), dtype=np.float32) if tile_conf is None else to_numpy(tile_conf).reshape(-1))
+        tile_index.append(np.full(len(boxes), index, dtype=np.int64))
+    if len(xyxy) == 0:
+        return (np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.float32), np.zeros(0, bool),
+                np.zeros(0, np.int64))
+    return np.concatenate(xyxy), np.concatenate(cls), np.concatenate(conf), np.concatenate(cut), np.concatenate(tile_index)
+
+def detect_tiled(image: np.ndarray,
+                 predict: Callable[[List[np.ndarray]], List[Any]],
+                 path: str = '',
+                 tile_size: int = TILE_SIZE_DEFAULT,
+                 overlap: float = TILE_OVERLAP_DEFAULT,
+                 batch_size: int = TILE_BATCH_SIZE_DEFAULT,
+                 nms_threshold: float = TILE_NMS_THRESHOLD_DEFAULT,
+                 nms_metric: str = TILE_NMS_METRIC_DEFAULT,
+                 executor: Optional[Executor] = None,
+                 names: Optional[Dict[int, str]] = None,
+                 keep_image: bool = True) -> PlanResult:
+    """
+    Detects the objects of a large floor plan tile by tile, at the full resolution of the plan.
+
+    The plan is cut into overlapping tiles, each batch of tiles goes through one predict call, the boxes are
+    moved back to plan coordinates and the duplicates of the overlaps are merged by class_aware_nms.
+    Tiles are slices of the image (no copy), so memory grows with batch_size, not with the plan.
+
+    Parameters:
+    - image (np.ndarray): The decoded floor plan (BGR).
+    - predict (Callable[[List[np.ndarray]], List[Any]]): Detection of a list of tiles, one Results-like object
+                                                          per tile (boxes.xyxy, boxes.cls, boxes.conf, names).
+    - path (str): Path of the plan file, kept in the result. Default is ''.
+    - tile_size (int): Side of a tile. Default is TILE_SIZE_DEFAULT.
+    - overlap (float): Fraction of a tile shared with its neighbour. Default is TILE_OVERLAP_DEFAULT.
+    - batch_size (int): Tiles per predict call. Default is TILE_BATCH_SIZE_DEFAULT.
+    - nms_threshold (float): See class_aware_nms. Default is TILE_NMS_THRESHOLD_DEFAULT.
+    - nms_metric (str): See class_aware_nms. Default is TILE_NMS_METRIC_DEFAULT.
+    - executor (Optional[Executor]): Runs the predict calls of the batches in parallel, predict must then be
+                                     thread-safe (e.g. a MicroBatcher, or one model per worker). Default is None.
+    - names (Optional[Dict[int, str]]): Class names. Default is None (names of the first tile result).
+    - keep_image (bool): Keep the image as orig_img (in-memory crops and drawing). Default is True.
+
+    Returns:
+    - PlanResult: Boxes of the whole plan, usable wherever a Results is (extract_target_xyxy_data, classify...).
+    """
+    height, width = image.shape[:2]
+    grid = tile_grid(height, width, tile_size=tile_size, overlap=overlap)
+    batches = list(iter_tile_batches(image, grid, batch_size=batch_size))
+
+    if executor is None:
+        batch_results = [predict(tiles) for tiles, _ in batches]
+    else:
+        batch_results = list(executor.map(predict, [tiles for tiles, _ in batches]))
+    tile_results = [result for results in batch_results for result in results]
+    inc('tiles_detected_total', len(grid))
+
+    with span('tile_merge'):
+        xyxy, cls, conf, cut, tile = merge_tile_results(tile_results, grid, height, width)
+        keep = class_aware_nms(xyxy, cls, conf, cut=cut, tile=tile, threshold=nms_threshold, metric=nms_metric)
+
+    if names is None:
+        names = tile_results[0].names if len(tile_results) > 0 else {}
+    return PlanResult(path=path, names=names, boxes=PlanBoxes(xyxy=xyxy[keep], cls=cls[keep], conf=conf[keep]),
+                      orig_img=image if keep_image else None)